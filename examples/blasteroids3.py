@@ -65,6 +65,9 @@ class BlasteroidsEntity(grease.Entity):
 class Debris(grease.Entity):
     """Floating space junk"""
 
+    # Debris is created and swept away constantly, so reuse the objects
+    POOL_SIZE = 200
+
 
 class PlayerShip(BlasteroidsEntity):
     """Thrust ship piloted by the player"""
@@ -257,12 +260,12 @@ class Sweeper(grease.System):
 
     def step(self, dt):
         fade = dt / self.SWEEP_TIME
-        for entity in tuple(self.world[Debris].entities):
+        for entity in self.world[Debris].entities:
             color = entity.renderable.color
             if color.a > 0.2:
                 color.a = max(color.a - fade, 0)
             else:
-                entity.delete()
+                self.world.commands.delete(entity)
 
 
 class GameSystem(KeyControls):
@@ -40,7 +40,14 @@ broad-phase system are actually in collision.
 __version__ = '$Id$'
 
 from grease.geometry import Vec2d
+from grease.vecops import add_scaled, sub, normalize, dist_sqrd
 from bisect import bisect_right
+from math import floor
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 
 class Pair(tuple):
@@ -81,6 +88,15 @@ class Pair(tuple):
 		)
 
 
+def _added_entities(component):
+	"""Return the entities added to a component since the last time step
+	that are still in it. Entities created and deleted within one time 
+	step are in the component's ``new_entities``, but have been purged
+	from it.
+	"""
+	return [entity for entity in component.new_entities if entity in component]
+
+
 class BroadSweepAndPrune(object):
 	"""2D Broad-phase sweep and prune bounding box collision detector
 
@@ -148,30 +164,21 @@ class BroadSweepAndPrune(object):
 		else:
 			by_x = self._by_x
 			by_y = self._by_y
-			removed = []
+			# Removing entities is inefficient, but expected to be rare.
+			# Note this must happen before the boxes are refreshed, since
+			# the data of deleted entities may no longer be readable
+			if component.deleted_entities:
+				deleted = set(component.deleted_entities)
+				by_x[:] = [entry for entry in by_x 
+					if entry[2].entity not in deleted]
+				by_y[:] = [entry for entry in by_y 
+					if entry[2].entity not in deleted]
 			for entry in by_x:
 				entry[0] = getattr(entry[2].aabb, entry[1])
 			for entry in by_y:
 				entry[0] = getattr(entry[2].aabb, entry[1])
-			# Removing entities is inefficient, but expected to be rare
-			if component.deleted_entities:
-				deleted_entities = component.deleted_entities
-				deleted_x = []
-				deleted_y = []
-				for i, (_, _, data) in enumerate(by_x):
-					if data.entity in deleted_entities:
-						deleted_x.append(i)
-				deleted_x.reverse()
-				for i in deleted_x:
-					del by_x[i]
-				for i, (_, _, data) in enumerate(by_y):
-					if data.entity in deleted_entities:
-						deleted_y.append(i)
-				deleted_y.reverse()
-				for i in deleted_y:
-					del by_y[i]
 			# Tack on new entities
-			for entity in component.new_entities:
+			for entity in _added_entities(component):
 				data = component[entity]
 				by_x.append([data.aabb.left, LEFT, data])
 				by_x.append([data.aabb.right, RIGHT, data])
@@ -198,57 +205,66 @@ class BroadSweepAndPrune(object):
 			RIGHT = self.RIGHT_ATTR
 			TOP = self.TOP_ATTR
 			BOTTOM = self.BOTTOM_ATTR
+			# Candidates are tracked by pairs of integer keys, (low, high),
+			# rather than entity pairs, which are more expensive to hash
+			# and compare. The keys are the ids of the data objects, which
+			# are shared by the axis arrays. Pair objects are only created
+			# for collisions.
 			# Build candidates overlapping along the x-axis
-			component = getattr(self.world.components, self.collision_component)
 			xoverlaps = set()
 			add_xoverlap = xoverlaps.add
 			discard_xoverlap = xoverlaps.discard
+			candidates = {}
 			open = {}
 			for _, side, data in self._by_x:
+				data_key = id(data)
 				if side is LEFT:
-					for open_entity, (from_mask, into_mask) in open.items():
-						if data.from_mask & into_mask or from_mask & data.into_mask:
-							add_xoverlap(Pair(data.entity, open_entity))
-					open[data.entity] = (data.from_mask, data.into_mask)
+					from_mask = data.from_mask
+					into_mask = data.into_mask
+					for open_key, open_data in open.items():
+						if (from_mask & open_data.into_mask 
+							or open_data.from_mask & into_mask):
+							add_xoverlap((data_key, open_key) if data_key < open_key
+								else (open_key, data_key))
+							candidates[data_key] = data
+							candidates[open_key] = open_data
+					open[data_key] = data
 				elif side is RIGHT:
-					del open[data.entity]
+					del open[data_key]
 
 			if len(xoverlaps) <= 10 and len(xoverlaps)*4 < len(self._by_y):
 				# few candidates were found, so just scan the x overlap candidates
 				# along y. This requires an additional sort, but it should
 				# be cheaper than scanning everyone and its simpler
 				# than a separate brute-force check
-				entities = set([entity for entity, _ in xoverlaps] 
-					+ [entity for _, entity in xoverlaps])
 				by_y = []
-				for entity in entities:
-					data = component[entity]
+				for data in candidates.values():
 					# We can use tuples here, which are cheaper to create
 					by_y.append((data.aabb.bottom, BOTTOM, data))
 					by_y.append((data.aabb.top, TOP, data))
-				by_y.sort()
+				by_y.sort(key=lambda y: (y[0], y[1]))
 			else:
 				by_y = self._by_y
 
 			# Now check the candidates along the y-axis
-			open = set()
-			add_open = open.add
-			discard_open = open.discard
+			open = {}
 			self._collision_pairs = set()
 			add_pair = self._collision_pairs.add
 			for _, side, data in by_y:
+				data_key = id(data)
 				if side is BOTTOM:
-					for open_entity in open:
-						pair = Pair(data.entity, open_entity)
-						if pair in xoverlaps:
-							discard_xoverlap(pair)
-							add_pair(pair)
+					for open_key, open_data in open.items():
+						pair_key = ((data_key, open_key) if data_key < open_key
+							else (open_key, data_key))
+						if pair_key in xoverlaps:
+							discard_xoverlap(pair_key)
+							add_pair(Pair(data.entity, open_data.entity))
 							if not xoverlaps:
 								# No more candidates, bail
 								return self._collision_pairs
-					add_open(data.entity)
+					open[data_key] = data
 				elif side is TOP:
-					discard_open(data.entity)
+					open.pop(data_key, None)
 		return self._collision_pairs
 	
 	def query_point(self, x_or_point, y=None, from_mask=0xffffffff):
@@ -279,9 +295,9 @@ class BroadSweepAndPrune(object):
 		TOP = self.TOP_ATTR
 		BOTTOM = self.BOTTOM_ATTR
 		x_index = bisect_right(self._by_x, [x])
-		x_hits = set()
-		add_x_hit = x_hits.add
-		discard_x_hit = x_hits.discard
+		# Hits are keyed by the ids of the entity data objects, which
+		# are shared by the axis arrays
+		x_hits = {}
 		if x_index <= len(self._by_x) // 2:
 			# closer to the left, scan from left to right
 			while (x == self._by_x[x_index][0] 
@@ -291,18 +307,18 @@ class BroadSweepAndPrune(object):
 				x_index += 1
 			for _, side, data in self._by_x[:x_index]:
 				if side is LEFT and from_mask & data.into_mask:
-					add_x_hit(data.entity)
+					x_hits[id(data)] = data.entity
 				else:
-					discard_x_hit(data.entity)
+					x_hits.pop(id(data), None)
 		else:
 			# closer to the right
 			for _, side, data in reversed(self._by_x[x_index:]):
 				if side is RIGHT and from_mask & data.into_mask:
-					add_x_hit(data.entity)
+					x_hits[id(data)] = data.entity
 				else:
-					discard_x_hit(data.entity)
+					x_hits.pop(id(data), None)
 		if not x_hits:
-			return x_hits
+			return set()
 
 		y_index = bisect_right(self._by_y, [y])
 		y_hits = set()
@@ -317,21 +333,1017 @@ class BroadSweepAndPrune(object):
 				y_index += 1
 			for _, side, data in self._by_y[:y_index]:
 				if side is BOTTOM:
-					add_y_hit(data.entity)
+					add_y_hit(id(data))
 				else:
-					discard_y_hit(data.entity)
+					discard_y_hit(id(data))
 		else:
 			# closer to the top
 			for _, side, data in reversed(self._by_y[y_index:]):
 				if side is TOP:
-					add_y_hit(data.entity)
+					add_y_hit(id(data))
+				else:
+					discard_y_hit(id(data))
+		return set(x_hits[key] for key in y_hits if key in x_hits)
+
+
+
+class BroadSweepAndPruneArray(object):
+	"""2D Broad-phase sweep and prune bounding box collision detector
+	that keeps the bounding boxes in contiguous NumPy arrays. 
+
+	This performs the same function as :class:`BroadSweepAndPrune`, with
+	the same interface, but the boxes are sorted and swept with
+	vectorized array operations instead of Python loops, so it scales 
+	to many more bodies. The sort order of the previous time step is 
+	reused, so sorting is cheap when the bodies move little.
+
+	Candidate pairs are also available as arrays, from
+	:meth:`pair_indexes` and :meth:`pair_ids`, to avoid creating
+	:class:`Pair` objects.
+
+	Requires NumPy.
+
+	:param collision_component: Name of the collision component used by this
+		system, defaults to 'collision'. This component supplies each
+		entities' aabb and collision masks.
+	:type collision_component: str
+	"""
+	world = None
+	"""|World| object this system belongs to"""
+
+	collision_component = None
+	"""Name of world's collision component used by this system"""
+
+	entities = None
+	"""List of the entities tracked by the system, in the order of the 
+	rows of its arrays. None before the first time step.
+	"""
+
+	def __init__(self, collision_component='collision'):
+		if numpy is None:
+			raise ImportError("BroadSweepAndPruneArray requires NumPy")
+		self.collision_component = collision_component
+		self._data = None
+		self._order = None
+		self._bounds = None
+		self._from_mask = None
+		self._into_mask = None
+		self._ids = None
+		self._pair_indexes = None
+		self._collision_pairs = None
+	
+	def set_world(self, world):
+		"""Bind the system to a world"""
+		self.world = world
+	
+	def step(self, dt):
+		"""Update the system for this time step, copies the bounding
+		boxes and masks into arrays and sorts them along the x-axis
+		"""
+		component = getattr(self.world.components, self.collision_component)
+		if self._data is None:
+			data = self._data = list(component.values())
+			self.entities = [item.entity for item in data]
+			self._ids = None
+			order = None
+		else:
+			data = self._data
+			order = self._order
+			# Note this must happen before the boxes are copied, since
+			# the data of deleted entities may no longer be readable
+			if component.deleted_entities:
+				deleted = set(component.deleted_entities)
+				keep = numpy.fromiter(
+					(entity not in deleted for entity in self.entities), 
+					bool, len(self.entities))
+				if not keep.all():
+					# Preserve the sort order of the remaining rows
+					rows = numpy.cumsum(keep) - 1
+					order = rows[order[keep[order]]]
+					data[:] = [item for item, kept in zip(data, keep) if kept]
+					self.entities = [item.entity for item in data]
+					self._ids = None
+			if component.new_entities:
+				tracked = set(self.entities)
+				new = [entity for entity in _added_entities(component)
+					if entity not in tracked]
+				if new:
+					data.extend(component[entity] for entity in new)
+					self.entities.extend(new)
+					order = numpy.concatenate(
+						(order, numpy.arange(len(order), len(data))))
+					self._ids = None
+		count = len(data)
+		self._bounds = numpy.array(
+			[(item.aabb.left, item.aabb.bottom, item.aabb.right, item.aabb.top) 
+				for item in data], dtype=numpy.float64).reshape(count, 4)
+		self._from_mask = numpy.fromiter(
+			(item.from_mask for item in data), numpy.int64, count)
+		self._into_mask = numpy.fromiter(
+			(item.into_mask for item in data), numpy.int64, count)
+		if order is None:
+			order = numpy.arange(count)
+		# The stable sort is a timsort, which is highly efficient with
+		# the mostly sorted order left from the last time step
+		self._order = order[
+			numpy.argsort(self._bounds[order, 0], kind='stable')]
+		self._pair_indexes = None
+		self._collision_pairs = None
+	
+	def pair_indexes(self):
+		"""Return the candidate collision pairs for this time step as
+		two arrays of indexes into :attr:`entities`
+		"""
+		if self._pair_indexes is None:
+			order = self._order
+			if order is None or len(order) < 2:
+				empty = numpy.zeros(0, dtype=numpy.intp)
+				return empty, empty
+			bounds = self._bounds[order]
+			# Each box overlaps the boxes after it in x order
+			# whose left sides are not beyond its right side
+			ends = numpy.searchsorted(bounds[:, 0], bounds[:, 2], side='right')
+			counts = numpy.maximum(ends - numpy.arange(1, len(order) + 1), 0)
+			firsts = numpy.repeat(numpy.arange(len(order)), counts)
+			seconds = firsts + 1 + numpy.arange(len(firsts)) - numpy.repeat(
+				numpy.cumsum(counts) - counts, counts)
+			overlap = ((bounds[firsts, 1] <= bounds[seconds, 3]) 
+				& (bounds[seconds, 1] <= bounds[firsts, 3]))
+			firsts = order[firsts[overlap]]
+			seconds = order[seconds[overlap]]
+			from_mask = self._from_mask
+			into_mask = self._into_mask
+			masked = ((from_mask[firsts] & into_mask[seconds]) 
+				| (from_mask[seconds] & into_mask[firsts])) != 0
+			self._pair_indexes = (firsts[masked], seconds[masked])
+		return self._pair_indexes
+	
+	def pair_ids(self):
+		"""Return the candidate collision pairs for this time step as
+		two arrays of entity ids. Entities that are integers are their
+		own ids.
+		"""
+		firsts, seconds = self.pair_indexes()
+		if self._ids is None:
+			entities = self.entities or ()
+			self._ids = numpy.fromiter(
+				(getattr(entity, 'entity_id', entity) for entity in entities),
+				numpy.int64, len(entities))
+		return self._ids[firsts], self._ids[seconds]
+	
+	@property
+	def collision_pairs(self):
+		"""Set of candidate collision pairs for this timestep"""
+		if self._collision_pairs is None:
+			entities = self.entities
+			firsts, seconds = self.pair_indexes()
+			self._collision_pairs = set(
+				Pair(entities[first], entities[second]) 
+				for first, second in zip(firsts.tolist(), seconds.tolist()))
+		return self._collision_pairs
+	
+	def query_point(self, x_or_point, y=None, from_mask=0xffffffff):
+		"""Hit test at the point specified. 
+
+		:param x_or_point: x coordinate (float) or sequence of (x, y) floats.
+
+		:param y: y coordinate (float) if x is not a sequence
+
+		:param from_mask: Bit mask used to filter query results. This value
+			is bit ANDed with candidate entities' ``collision.into_mask``.
+			If the result is non-zero, then it is considered a hit. By
+			default all entities colliding with the input point are
+			returned.
+
+		:return: A set of entities where the point is inside their bounding
+			boxes as of the last time step.
+		"""
+		if self._bounds is None:
+			# Arrays not ready
+			return set()
+		if y is None:
+			x, y = x_or_point
+		else:
+			x = x_or_point
+		bounds = self._bounds
+		hits = numpy.flatnonzero((bounds[:, 0] <= x) & (x <= bounds[:, 2])
+			& (bounds[:, 1] <= y) & (y <= bounds[:, 3])
+			& (self._into_mask & from_mask != 0))
+		entities = self.entities
+		return set(entities[index] for index in hits.tolist())
+
+
+class BroadSpatialHash(object):
+	"""2D Broad-phase uniform grid bounding box collision detector
+
+	Space is divided into square cells, and each entity is hashed into
+	the cells its bounding box overlaps. Only entities sharing a cell are
+	tested against each other. This is efficient for bodies of similar
+	size that are spread fairly evenly, even when they are fast moving,
+	or line up along an axis, which are both costly for 
+	:class:`BroadSweepAndPrune`. It also makes point and region queries
+	cheap. 
+
+	Entities are rehashed only when their bounding box moves into 
+	different cells. The cell size should be about the size of the
+	typical body. Much larger cells put too many bodies in each cell, and
+	much smaller cells put each body in many cells.
+
+	:param cell_size: The width and height of the grid cells.
+	:type cell_size: float
+
+	:param collision_component: Name of the collision component used by this
+		system, defaults to 'collision'. This component supplies each
+		entities' aabb and collision masks.
+	:type collision_component: str
+	"""
+	world = None
+	"""|World| object this system belongs to"""
+
+	collision_component = None
+	"""Name of world's collision component used by this system"""
+
+	cell_size = None
+	"""The width and height of the grid cells"""
+
+	def __init__(self, cell_size=64.0, collision_component='collision'):
+		assert cell_size > 0, "Invalid cell size"
+		self.cell_size = float(cell_size)
+		self.collision_component = collision_component
+		self._data = None
+		self._boxes = {}
+		self._ranges = {}
+		self._cells = {}
+		self._collision_pairs = None
+	
+	def set_world(self, world):
+		"""Bind the system to a world"""
+		self.world = world
+	
+	def _cell_range(self, box):
+		"""Return the range of cells, (x0, y0, x1, y1), overlapped
+		by a box
+		"""
+		size = self.cell_size
+		left, bottom, right, top = box
+		return (int(floor(left / size)), int(floor(bottom / size)), 
+			int(floor(right / size)), int(floor(top / size)))
+	
+	def _hash(self, entity, cell_range):
+		cells = self._cells
+		x0, y0, x1, y1 = cell_range
+		for x in range(x0, x1 + 1):
+			for y in range(y0, y1 + 1):
+				try:
+					cells[x, y].add(entity)
+				except KeyError:
+					cells[x, y] = set((entity,))
+	
+	def _unhash(self, entity, cell_range):
+		cells = self._cells
+		x0, y0, x1, y1 = cell_range
+		for x in range(x0, x1 + 1):
+			for y in range(y0, y1 + 1):
+				cell = cells[x, y]
+				cell.discard(entity)
+				if not cell:
+					del cells[x, y]
+	
+	def step(self, dt):
+		"""Update the system for this time step, rehashes the entities
+		whose bounding boxes moved into different cells
+		"""
+		component = getattr(self.world.components, self.collision_component)
+		boxes = self._boxes
+		ranges = self._ranges
+		if self._data is None:
+			self._data = dict((data.entity, data) for data in component.values())
+		else:
+			if component.deleted_entities:
+				for entity in component.deleted_entities:
+					if self._data.pop(entity, None) is not None:
+						del boxes[entity]
+						self._unhash(entity, ranges.pop(entity))
+			for entity in _added_entities(component):
+				self._data[entity] = component[entity]
+		cell_range = self._cell_range
+		for entity, data in self._data.items():
+			aabb = data.aabb
+			box = (aabb.left, aabb.bottom, aabb.right, aabb.top)
+			if boxes.get(entity) != box:
+				boxes[entity] = box
+				new_range = cell_range(box)
+				old_range = ranges.get(entity)
+				if new_range != old_range:
+					if old_range is not None:
+						self._unhash(entity, old_range)
+					self._hash(entity, new_range)
+					ranges[entity] = new_range
+		self._collision_pairs = None
+	
+	@property
+	def collision_pairs(self):
+		"""Set of candidate collision pairs for this timestep"""
+		if self._collision_pairs is None:
+			if self._data is None:
+				# Grid not ready
+				return set()
+			pairs = self._collision_pairs = set()
+			add_pair = pairs.add
+			size = self.cell_size
+			boxes = self._boxes
+			data = self._data
+			for (cell_x, cell_y), entities in self._cells.items():
+				if len(entities) < 2:
+					continue
+				entities = [(entity, boxes[entity], data[entity]) 
+					for entity in entities]
+				for i, (entity1, box1, data1) in enumerate(entities):
+					left1, bottom1, right1, top1 = box1
+					from_mask1 = data1.from_mask
+					into_mask1 = data1.into_mask
+					for entity2, box2, data2 in entities[i + 1:]:
+						left2, bottom2, right2, top2 = box2
+						if (left1 <= right2 and left2 <= right1 
+							and bottom1 <= top2 and bottom2 <= top1
+							and (from_mask1 & data2.into_mask
+								or data2.from_mask & into_mask1)):
+							# Pairs sharing several cells are only added
+							# in the cell with the corner of their overlap
+							if (floor(max(left1, left2) / size) == cell_x 
+								and floor(max(bottom1, bottom2) / size) == cell_y):
+								add_pair(Pair(entity1, entity2))
+		return self._collision_pairs
+	
+	def query_point(self, x_or_point, y=None, from_mask=0xffffffff):
+		"""Hit test at the point specified. 
+
+		:param x_or_point: x coordinate (float) or sequence of (x, y) floats.
+
+		:param y: y coordinate (float) if x is not a sequence
+
+		:param from_mask: Bit mask used to filter query results. This value
+			is bit ANDed with candidate entities' ``collision.into_mask``.
+			If the result is non-zero, then it is considered a hit. By
+			default all entities colliding with the input point are
+			returned.
+
+		:return: A set of entities where the point is inside their bounding
+			boxes as of the last time step.
+		"""
+		if y is None:
+			x, y = x_or_point
+		else:
+			x = x_or_point
+		return self.query_rect(x, y, x, y, from_mask)
+	
+	def query_rect(self, rect_or_left, bottom=None, right=None, top=None,
+		from_mask=0xffffffff):
+		"""Return the entities whose bounding boxes overlap a region.
+
+		:param rect_or_left: A |Rect| or the left side of the region.
+
+		:param bottom: The bottom of the region if `rect_or_left` is not 
+			a rect. Likewise for `right` and `top`.
+
+		:param from_mask: Bit mask used to filter query results, as for
+			:meth:`query_point`.
+
+		:return: A set of entities whose bounding boxes overlap the region,
+			including its edges, as of the last time step.
+		"""
+		if bottom is None:
+			rect = rect_or_left
+			box = (rect.left, rect.bottom, rect.right, rect.top)
+		else:
+			box = (rect_or_left, bottom, right, top)
+		left, bottom, right, top = box
+		x0, y0, x1, y1 = self._cell_range(box)
+		cells = self._cells
+		boxes = self._boxes
+		data = self._data
+		hits = set()
+		for x in range(x0, x1 + 1):
+			for y in range(y0, y1 + 1):
+				for entity in cells.get((x, y), ()):
+					if entity not in hits:
+						left2, bottom2, right2, top2 = boxes[entity]
+						if (left <= right2 and left2 <= right 
+							and bottom <= top2 and bottom2 <= top
+							and from_mask & data[entity].into_mask):
+							hits.add(entity)
+		return hits
+
+
+class _TreeNode(object):
+	"""Node of a :class:`BroadAABBTree`. Leaves have an entity and no
+	children. The box of a leaf is the entity's fat bounding box,
+	the box of a branch bounds the boxes of its children.
+	"""
+
+	__slots__ = ('box', 'parent', 'child1', 'child2', 'height', 
+		'entity', 'data', 'tight')
+
+	def __init__(self, box, parent=None):
+		self.box = box
+		self.parent = parent
+		self.child1 = None
+		self.child2 = None
+		self.height = 0
+		self.entity = None
+		self.data = None
+		self.tight = None
+
+
+def _union(box1, box2):
+	return (min(box1[0], box2[0]), min(box1[1], box2[1]), 
+		max(box1[2], box2[2]), max(box1[3], box2[3]))
+
+def _perimeter(box):
+	return 2.0 * ((box[2] - box[0]) + (box[3] - box[1]))
+
+
+class BroadAABBTree(object):
+	"""2D Broad-phase dynamic bounding volume tree collision detector
+
+	Entities are kept in a balanced binary tree of axis-aligned bounding
+	boxes, where each branch bounds its children. Each entity's box is
+	enlarged by a margin (a "fat" box) when it is put in the tree, so it
+	is only reinserted when it moves outside of its fat box. Entities are
+	inserted and removed incrementally, as they are added to and removed
+	from the collision component.
+
+	This performs well for bodies of very different sizes, and for 
+	scenes with many bodies that seldom move, such as static obstacles.
+	It also supports efficient point, region and ray queries.
+
+	:param margin: Distance that entity bounding boxes are enlarged by on 
+		each side in the tree. Bodies that move further than this in a
+		time step are reinserted into the tree, so this trades the cost
+		of reinserting against the looseness of the tree.
+	:type margin: float
+
+	:param collision_component: Name of the collision component used by this
+		system, defaults to 'collision'. This component supplies each
+		entities' aabb and collision masks.
+	:type collision_component: str
+	"""
+	world = None
+	"""|World| object this system belongs to"""
+
+	collision_component = None
+	"""Name of world's collision component used by this system"""
+
+	margin = None
+	"""Distance that bounding boxes are enlarged by in the tree"""
+
+	def __init__(self, margin=2.0, collision_component='collision'):
+		assert margin >= 0, "Invalid margin"
+		self.margin = float(margin)
+		self.collision_component = collision_component
+		self._root = None
+		self._leaves = None
+		self._collision_pairs = None
+	
+	def set_world(self, world):
+		"""Bind the system to a world"""
+		self.world = world
+	
+	@property
+	def height(self):
+		"""Height of the tree, 0 for a tree of one entity or empty"""
+		if self._root is None:
+			return 0
+		return self._root.height
+	
+	def step(self, dt):
+		"""Update the system for this time step, reinserts the entities
+		that moved outside of their fat bounding boxes
+		"""
+		component = getattr(self.world.components, self.collision_component)
+		if self._leaves is None:
+			self._leaves = {}
+			for data in component.values():
+				self._insert(data.entity, data)
+		else:
+			leaves = self._leaves
+			for entity in component.deleted_entities:
+				self._remove(entity)
+			for entity in _added_entities(component):
+				if entity in leaves:
+					leaves[entity].data = component[entity]
+				else:
+					self._insert(entity, component[entity])
+		for leaf in self._leaves.values():
+			aabb = leaf.data.aabb
+			self._move_leaf(leaf, (aabb.left, aabb.bottom, aabb.right, aabb.top))
+		self._collision_pairs = None
+	
+	def _move_leaf(self, leaf, tight):
+		"""Set the bounding box of a leaf, reinserting it if the box
+		is outside of its fat box
+		"""
+		leaf.tight = tight
+		box = leaf.box
+		if not (box[0] <= tight[0] and box[1] <= tight[1] 
+			and tight[2] <= box[2] and tight[3] <= box[3]):
+			margin = self.margin
+			self._remove_leaf(leaf)
+			leaf.box = (tight[0] - margin, tight[1] - margin, 
+				tight[2] + margin, tight[3] + margin)
+			self._insert_leaf(leaf)
+	
+	def _insert(self, entity, data):
+		aabb = data.aabb
+		tight = (aabb.left, aabb.bottom, aabb.right, aabb.top)
+		margin = self.margin
+		leaf = _TreeNode((tight[0] - margin, tight[1] - margin, 
+			tight[2] + margin, tight[3] + margin))
+		leaf.entity = entity
+		leaf.data = data
+		leaf.tight = tight
+		self._leaves[entity] = leaf
+		self._insert_leaf(leaf)
+		return leaf
+	
+	def _remove(self, entity):
+		"""Remove an entity from the tree and return its leaf, or None if
+		the entity is not in the tree
+		"""
+		leaf = self._leaves.pop(entity, None)
+		if leaf is not None:
+			self._remove_leaf(leaf)
+		return leaf
+	
+	def _insert_leaf(self, leaf):
+		if self._root is None:
+			self._root = leaf
+			leaf.parent = None
+			return
+		# Find the best sibling for the leaf, using the perimeter of
+		# the boxes as the cost of a subtree
+		box = leaf.box
+		node = self._root
+		while node.child1 is not None:
+			perimeter = _perimeter(node.box)
+			combined = _perimeter(_union(node.box, box))
+			cost = 2.0 * combined
+			inherited = 2.0 * (combined - perimeter)
+			child_costs = []
+			for child in (node.child1, node.child2):
+				child_cost = _perimeter(_union(box, child.box)) + inherited
+				if child.child1 is not None:
+					child_cost -= _perimeter(child.box)
+				child_costs.append(child_cost)
+			if cost < child_costs[0] and cost < child_costs[1]:
+				break
+			if child_costs[0] < child_costs[1]:
+				node = node.child1
+			else:
+				node = node.child2
+		sibling = node
+		old_parent = sibling.parent
+		parent = _TreeNode(_union(box, sibling.box), old_parent)
+		parent.height = sibling.height + 1
+		parent.child1 = sibling
+		parent.child2 = leaf
+		sibling.parent = parent
+		leaf.parent = parent
+		if old_parent is None:
+			self._root = parent
+		elif old_parent.child1 is sibling:
+			old_parent.child1 = parent
+		else:
+			old_parent.child2 = parent
+		self._refit(parent)
+	
+	def _remove_leaf(self, leaf):
+		if leaf is self._root:
+			self._root = None
+			return
+		parent = leaf.parent
+		grandparent = parent.parent
+		if parent.child1 is leaf:
+			sibling = parent.child2
+		else:
+			sibling = parent.child1
+		sibling.parent = grandparent
+		if grandparent is None:
+			self._root = sibling
+		else:
+			if grandparent.child1 is parent:
+				grandparent.child1 = sibling
+			else:
+				grandparent.child2 = sibling
+			self._refit(grandparent)
+		leaf.parent = None
+	
+	def _refit(self, node):
+		"""Rebalance and recompute the boxes of a node and its ancestors"""
+		while node is not None:
+			node = self._balance(node)
+			child1 = node.child1
+			child2 = node.child2
+			node.height = 1 + max(child1.height, child2.height)
+			node.box = _union(child1.box, child2.box)
+			node = node.parent
+	
+	def _balance(self, a):
+		"""Rotate the higher child of node `a` above it if the heights of 
+		its children differ by more than one. Return the node now in
+		the place of `a`.
+		"""
+		if a.child1 is None or a.height < 2:
+			return a
+		b = a.child1
+		c = a.child2
+		balance = c.height - b.height
+		if balance > 1:
+			upper, lower, a_side = c, b, 'child2'
+		elif balance < -1:
+			upper, lower, a_side = b, c, 'child1'
+		else:
+			return a
+		# Swap a and upper
+		f = upper.child1
+		g = upper.child2
+		upper.child1 = a
+		upper.parent = a.parent
+		a.parent = upper
+		if upper.parent is None:
+			self._root = upper
+		elif upper.parent.child1 is a:
+			upper.parent.child1 = upper
+		else:
+			upper.parent.child2 = upper
+		# Keep the higher grandchild under upper, move the other to a
+		if f.height < g.height:
+			f, g = g, f
+		upper.child2 = f
+		setattr(a, a_side, g)
+		g.parent = a
+		a.box = _union(lower.box, g.box)
+		upper.box = _union(a.box, f.box)
+		a.height = 1 + max(lower.height, g.height)
+		upper.height = 1 + max(a.height, f.height)
+		return upper
+	
+	def _query(self, box):
+		"""Generate the leaves with fat boxes overlapping the box"""
+		if self._root is None:
+			return
+		left, bottom, right, top = box
+		stack = [self._root]
+		pop = stack.pop
+		push = stack.append
+		while stack:
+			node = pop()
+			node_box = node.box
+			if (node_box[0] <= right and left <= node_box[2] 
+				and node_box[1] <= top and bottom <= node_box[3]):
+				if node.child1 is None:
+					yield node
 				else:
-					discard_y_hit(data.entity)
-		if y_hits:
-			return x_hits & y_hits
+					push(node.child1)
+					push(node.child2)
+	
+	@property
+	def collision_pairs(self):
+		"""Set of candidate collision pairs for this timestep"""
+		if self._collision_pairs is None:
+			if self._leaves is None:
+				# Tree not ready
+				return set()
+			self._collision_pairs = set()
+			self._add_pairs(self._collision_pairs, self._leaves.values(), self)
+		return self._collision_pairs
+	
+	def _add_pairs(self, pairs, leaves, tree):
+		"""Add the pairs of leaves from an iterable that overlap leaves
+		in a tree to a set
+		"""
+		add_pair = pairs.add
+		query = tree._query
+		# If the leaves are from the tree, each pair is found from both of
+		# its leaves, so only test it from one of them
+		same_tree = tree is self
+		for leaf in leaves:
+			left, bottom, right, top = leaf.tight
+			from_mask = leaf.data.from_mask
+			into_mask = leaf.data.into_mask
+			leaf_key = id(leaf)
+			for other in query(leaf.tight):
+				if id(other) > leaf_key if same_tree else other is not leaf:
+					other_box = other.tight
+					if (other_box[0] <= right and left <= other_box[2]
+						and other_box[1] <= top and bottom <= other_box[3]
+						and (from_mask & other.data.into_mask 
+							or other.data.from_mask & into_mask)):
+						add_pair(Pair(leaf.entity, other.entity))
+	
+	def query_point(self, x_or_point, y=None, from_mask=0xffffffff):
+		"""Hit test at the point specified. 
+
+		:param x_or_point: x coordinate (float) or sequence of (x, y) floats.
+
+		:param y: y coordinate (float) if x is not a sequence
+
+		:param from_mask: Bit mask used to filter query results. This value
+			is bit ANDed with candidate entities' ``collision.into_mask``.
+			If the result is non-zero, then it is considered a hit. By
+			default all entities colliding with the input point are
+			returned.
+
+		:return: A set of entities where the point is inside their bounding
+			boxes as of the last time step.
+		"""
+		if y is None:
+			x, y = x_or_point
 		else:
-			return y_hits
+			x = x_or_point
+		return self.query_rect(x, y, x, y, from_mask)
+	
+	def query_rect(self, rect_or_left, bottom=None, right=None, top=None,
+		from_mask=0xffffffff):
+		"""Return the entities whose bounding boxes overlap a region.
+
+		:param rect_or_left: A |Rect| or the left side of the region.
+
+		:param bottom: The bottom of the region if `rect_or_left` is not 
+			a rect. Likewise for `right` and `top`.
+
+		:param from_mask: Bit mask used to filter query results, as for
+			:meth:`query_point`.
+
+		:return: A set of entities whose bounding boxes overlap the region,
+			including its edges, as of the last time step.
+		"""
+		if bottom is None:
+			rect = rect_or_left
+			box = (rect.left, rect.bottom, rect.right, rect.top)
+		else:
+			box = (rect_or_left, bottom, right, top)
+		left, bottom, right, top = box
+		hits = set()
+		for leaf in self._query(box):
+			tight = leaf.tight
+			if (tight[0] <= right and left <= tight[2] 
+				and tight[1] <= top and bottom <= tight[3]
+				and from_mask & leaf.data.into_mask):
+				hits.add(leaf.entity)
+		return hits
+	
+	def query_ray(self, start, end, from_mask=0xffffffff):
+		"""Return the entities whose bounding boxes intersect the line
+		segment from `start` to `end`, in the order they are hit.
+
+		:param start: Start point of the ray, a sequence of (x, y) floats.
+
+		:param end: End point of the ray.
 
+		:param from_mask: Bit mask used to filter query results, as for
+			:meth:`query_point`.
+
+		:return: A list of ``(fraction, entity)`` pairs, sorted by 
+			the fraction of the distance from `start` to `end` where
+			the ray enters the entity's bounding box as of the last time 
+			step. The fraction is zero for boxes containing `start`.
+		"""
+		hits = []
+		if self._root is None:
+			return hits
+		x, y = start[0], start[1]
+		dx = end[0] - x
+		dy = end[1] - y
+		stack = [self._root]
+		while stack:
+			node = stack.pop()
+			if node.child1 is None:
+				if not from_mask & node.data.into_mask:
+					continue
+				fraction = _ray_box_fraction(x, y, dx, dy, node.tight)
+				if fraction is not None:
+					hits.append((fraction, node.entity))
+			elif _ray_box_fraction(x, y, dx, dy, node.box) is not None:
+				stack.append(node.child1)
+				stack.append(node.child2)
+		hits.sort(key=lambda hit: hit[0])
+		return hits
+
+
+
+class BroadPartitioned(BroadAABBTree):
+	"""2D Broad-phase collision detector that keeps static and sleeping
+	bodies apart from moving bodies, so that they cost little each step.
+
+	Entities with a true ``collision.static`` field are put in a 
+	separate static tree, :attr:`static_tree`, when they are added, and
+	their bounding boxes are not read again. Other entities are kept in
+	a dynamic tree that is updated each time step, as for 
+	:class:`BroadAABBTree`. A dynamic entity whose bounding box has not
+	changed for `sleep_steps` time steps falls asleep, and is moved to
+	the static tree. Sleeping entities are woken, and moved back to the
+	dynamic tree, when their bounding boxes change.
+
+	Dynamic entities are tested against the entities in both trees.
+	Static entities are never tested against each other. Pairs of
+	sleeping entities with other entities in the static tree are found
+	when they fall asleep, and reported until one of them is woken or
+	removed. 
+
+	To move a static entity, call :meth:`wake` for it. Note that the
+	:class:`Circular` system only updates the bounding boxes of static
+	entities when they are added.
+
+	:param margin: Distance that entity bounding boxes are enlarged by on 
+		each side in the dynamic tree, see :class:`BroadAABBTree`.
+	:type margin: float
+
+	:param sleep_steps: Number of time steps a dynamic entity's bounding
+		box must be unchanged before it falls asleep. If zero, entities
+		never sleep.
+	:type sleep_steps: int
+
+	:param collision_component: Name of the collision component used by this
+		system, defaults to 'collision'. This component supplies each
+		entities' aabb, collision masks and static flag.
+	:type collision_component: str
+	"""
+
+	sleep_steps = None
+	"""Number of time steps before an unchanged entity falls asleep"""
+
+	static_tree = None
+	""":class:`BroadAABBTree` of the static and sleeping entities. It
+	is not stepped, and is only changed as entities are added, removed,
+	fall asleep and are woken.
+	"""
+
+	def __init__(self, margin=2.0, sleep_steps=30, collision_component='collision'):
+		BroadAABBTree.__init__(self, margin, collision_component)
+		self.sleep_steps = sleep_steps
+		self.static_tree = BroadAABBTree(0, collision_component)
+		self.static_tree._leaves = {}
+		self._still = {}
+		self._asleep = set()
+		self._static_pairs = {}
+	
+	def is_static(self, entity):
+		"""Return True if the entity is static or sleeping"""
+		return entity in self.static_tree._leaves
+	
+	def is_sleeping(self, entity):
+		"""Return True if the entity is sleeping"""
+		return entity in self._asleep
+	
+	def step(self, dt):
+		"""Update the system for this time step, wakes sleeping entities 
+		that moved, updates the dynamic tree and puts entities that did
+		not move for :attr:`sleep_steps` to sleep
+		"""
+		component = getattr(self.world.components, self.collision_component)
+		static_leaves = self.static_tree._leaves
+		if self._leaves is None:
+			self._leaves = {}
+			for data in component.values():
+				self._add(data.entity, data)
+		else:
+			for entity in component.deleted_entities:
+				if self._remove(entity) is None:
+					self._remove_static(entity)
+				self._still.pop(entity, None)
+			for entity in _added_entities(component):
+				leaf = self._leaves.get(entity) or static_leaves.get(entity)
+				if leaf is not None:
+					leaf.data = component[entity]
+				else:
+					self._add(entity, component[entity])
+		for entity in list(self._asleep):
+			leaf = static_leaves[entity]
+			aabb = leaf.data.aabb
+			if (aabb.left, aabb.bottom, aabb.right, aabb.top) != leaf.tight:
+				self.wake(entity)
+		still = self._still
+		sleep_steps = self.sleep_steps
+		sleepers = []
+		for entity, leaf in self._leaves.items():
+			aabb = leaf.data.aabb
+			tight = (aabb.left, aabb.bottom, aabb.right, aabb.top)
+			if tight == leaf.tight:
+				# Entities added or woken this step start counting next step
+				count = still[entity] = still.get(entity, -1) + 1
+				if sleep_steps and count >= sleep_steps:
+					sleepers.append(entity)
+			else:
+				still[entity] = 0
+				self._move_leaf(leaf, tight)
+		for entity in sleepers:
+			self._sleep(entity)
+		self._collision_pairs = None
+	
+	def wake(self, entity):
+		"""Move a sleeping or static entity to the dynamic tree, so that
+		its bounding box is read each time step. Do nothing if the entity
+		is already dynamic. Unless it moves, it will fall asleep again 
+		after :attr:`sleep_steps`.
+		"""
+		leaf = self._remove_static(entity)
+		if leaf is not None:
+			self._insert(entity, leaf.data)
+	
+	def _add(self, entity, data):
+		if getattr(data, 'static', False):
+			self._add_static(entity, data)
+		else:
+			self._insert(entity, data)
+	
+	def _sleep(self, entity):
+		leaf = self._remove(entity)
+		self._still.pop(entity, None)
+		self._asleep.add(entity)
+		self._add_static(entity, leaf.data)
+	
+	def _add_static(self, entity, data):
+		"""Insert an entity into the static tree, and record its pairs
+		with the entities there, unless both are static
+		"""
+		static_pairs = self._static_pairs
+		asleep = self._asleep
+		leaf = self.static_tree._insert(entity, data)
+		pairs = set()
+		self._add_pairs(pairs, [leaf], self.static_tree)
+		if entity not in asleep:
+			pairs = set(pair for pair in pairs 
+				if pair[0] in asleep or pair[1] in asleep)
+		static_pairs[entity] = pairs
+		for pair in pairs:
+			static_pairs[pair[1] if pair[0] == entity else pair[0]].add(pair)
+	
+	def _remove_static(self, entity):
+		"""Remove an entity from the static tree and return its leaf, or
+		None if it is not in the static tree
+		"""
+		leaf = self.static_tree._remove(entity)
+		if leaf is not None:
+			self._asleep.discard(entity)
+			static_pairs = self._static_pairs
+			for pair in static_pairs.pop(entity):
+				static_pairs[pair[1] if pair[0] == entity else pair[0]].discard(pair)
+		return leaf
+	
+	@property
+	def collision_pairs(self):
+		"""Set of candidate collision pairs for this timestep"""
+		if self._collision_pairs is None:
+			if self._leaves is None:
+				# Trees not ready
+				return set()
+			pairs = self._collision_pairs = set()
+			dynamic = self._leaves.values()
+			self._add_pairs(pairs, dynamic, self)
+			self._add_pairs(pairs, dynamic, self.static_tree)
+			for static_pairs in self._static_pairs.values():
+				pairs.update(static_pairs)
+		return self._collision_pairs
+	
+	def query_rect(self, rect_or_left, bottom=None, right=None, top=None,
+		from_mask=0xffffffff):
+		hits = BroadAABBTree.query_rect(
+			self, rect_or_left, bottom, right, top, from_mask)
+		hits.update(self.static_tree.query_rect(
+			rect_or_left, bottom, right, top, from_mask))
+		return hits
+	query_rect.__doc__ = BroadAABBTree.query_rect.__doc__
+	
+	def query_ray(self, start, end, from_mask=0xffffffff):
+		hits = BroadAABBTree.query_ray(self, start, end, from_mask)
+		hits.extend(self.static_tree.query_ray(start, end, from_mask))
+		hits.sort(key=lambda hit: hit[0])
+		return hits
+	query_ray.__doc__ = BroadAABBTree.query_ray.__doc__
+
+def _ray_box_fraction(x, y, dx, dy, box):
+	"""Return the fraction along the segment (x, y) + (dx, dy) where
+	it enters the box, or None if it misses the box
+	"""
+	near = 0.0
+	far = 1.0
+	for origin, delta, low, high in ((x, dx, box[0], box[2]), (y, dy, box[1], box[3])):
+		if delta == 0:
+			if origin < low or origin > high:
+				return None
+		else:
+			t1 = (low - origin) / delta
+			t2 = (high - origin) / delta
+			if t1 > t2:
+				t1, t2 = t2, t1
+			if t1 > near:
+				near = t1
+			if t2 < far:
+				far = t2
+			if near > far:
+				return None
+	return near
 
 class Circular(object):
 	"""Basic narrow-phase collision detector which treats all entities as
@@ -353,12 +1365,16 @@ class Circular(object):
 	:param update_aabbs: If True (the default), then the entities'
 		`collision.aabb` fields will be updated using their position
 		and collision radius before invoking the broad phase system. 
-		Set this False if another system updates the aabbs.
+		The aabbs of entities with a true `collision.static` field are
+		only updated when they are added. Set this False if another
+		system updates the aabbs.
 	:type update_aabbs: bool
 
 	:param broad_phase: A broad-phase collision system to use as a source
-		for collision pairs. If not specified, a :class:`BroadSweepAndPrune`
-		system will be created automatically.
+		for collision pairs, such as :class:`BroadSweepAndPruneArray`,
+		:class:`BroadSpatialHash`, :class:`BroadAABBTree` or 
+		:class:`BroadPartitioned`. If not specified, a :class:`BroadSweepAndPrune` system will be created
+		automatically.
 	"""
 	world = None
 	"""|World| object this system belongs to"""
@@ -382,6 +1398,16 @@ class Circular(object):
 	broad_phase = None
 	"""Broad phase collision system used as a source for collision pairs"""
 
+	contacts = None
+	"""Persistent table of the entity pairs in contact, mapping each
+	pair to the :class:`Pair` object reported for it. Pairs remaining in 
+	contact across time steps are reported using the same :class:`Pair`
+	object, with its collision point and normal updated. The table is
+	updated when :attr:`collision_pairs` is computed. Contacts of deleted
+	entities are removed at each time step, and reported in 
+	:attr:`end_pairs`.
+	"""
+
 	def __init__(self, handlers=(), position_component='position', 
 		collision_component='collision', update_aabbs=True, broad_phase=None):
 		self.handlers = tuple(handlers)
@@ -391,11 +1417,17 @@ class Circular(object):
 		self.position_component = position_component
 		self.update_aabbs = bool(update_aabbs)
 		self.broad_phase = broad_phase
+		self.contacts = {}
 		self._collision_pairs = None
+		self._begin_pairs = set()
+		self._end_pairs = set()
+		self._deleted_pairs = []
 	
 	def set_world(self, world):
 		"""Bind the system to a world"""
 		self.world = world
+		self.contacts = {}
+		self._deleted_pairs = []
 		self.broad_phase.set_world(world)
 		for handler in self.handlers:
 			if hasattr(handler, 'set_world'):
@@ -406,8 +1438,15 @@ class Circular(object):
 		the handlers
 		"""
 		if self.update_aabbs:
+			# The bounding boxes of static entities are set when
+			# they are added
+			new_entities = set(getattr(
+				self.world.components, self.collision_component).new_entities)
 			for position, collision in self.world.components.join(
 				self.position_component, self.collision_component):
+				if (getattr(collision, 'static', False) 
+					and collision.entity not in new_entities):
+					continue
 				aabb = collision.aabb
 				x, y = position.position
 				radius = collision.radius
@@ -415,33 +1454,93 @@ class Circular(object):
 				aabb.right = x + radius
 				aabb.bottom = y - radius
 				aabb.top = y + radius
+			collision = getattr(self.world.components, self.collision_component)
+			if hasattr(collision, 'reindex'):
+				collision.reindex('aabb')
+		self._remove_deleted_contacts()
 		self.broad_phase.step(dt)
 		self._collision_pairs = None
 		for handler in self.handlers:
 			handler(self)
 	
+	def _remove_deleted_contacts(self):
+		"""Remove the contacts of entities deleted since the last time
+		step, so they do not persist until :attr:`collision_pairs` is 
+		next computed. Deleted entities may be reused for new entities,
+		see :attr:`grease.Entity.POOL_SIZE`. The contacts removed are 
+		reported in :attr:`end_pairs` when it is next computed.
+		"""
+		contacts = self.contacts
+		deleted = getattr(self.world.components, 
+			self.collision_component).deleted_entities
+		if contacts and deleted:
+			deleted = set(deleted)
+			for pair in [pair for pair in contacts 
+				if pair[0] in deleted or pair[1] in deleted]:
+				self._deleted_pairs.append(contacts.pop(pair))
+
 	@property
 	def collision_pairs(self):
 		"""The set of entity pairs in collision in this timestep"""
 		if self._collision_pairs is None:
 			position = getattr(self.world.components, self.position_component)
 			collision = getattr(self.world.components, self.collision_component)
+			last_contacts = self.contacts
+			contacts = {}
+			begin_pairs = set()
 			pairs = self._collision_pairs = set()
 			for pair in self.broad_phase.collision_pairs:
+				contact = last_contacts.get(pair)
+				if contact is not None:
+					pair = contact
 				entity1, entity2 = pair
 				position1 = position[entity1].position
 				position2 = position[entity2].position
 				radius1 = collision[entity1].radius
 				radius2 = collision[entity2].radius
-				separation = position2 - position1
-				if separation.get_length_sqrd() <= (radius1 + radius2)**2:
-					normal = separation.normalized()
+				if dist_sqrd(position2, position1) <= (radius1 + radius2)**2:
+					normal = sub(Vec2d(position2), position1)
+					normalize(normal)
 					pair.set_point_normal(
-						normal * radius1 + position1, normal,
-						normal * -radius2 + position2, -normal)
+						add_scaled(Vec2d(position1), normal, radius1), normal,
+						add_scaled(Vec2d(position2), normal, -radius2), -normal)
 					pairs.add(pair)
+					contacts[pair] = pair
+					if contact is None:
+						begin_pairs.add(pair)
+			self._end_pairs = set(
+				pair for pair in last_contacts.values() if pair not in contacts)
+			if self._deleted_pairs:
+				self._end_pairs.update(self._deleted_pairs)
+				self._deleted_pairs = []
+			self._begin_pairs = begin_pairs
+			self.contacts = contacts
 		return self._collision_pairs
 	
+	@property
+	def begin_pairs(self):
+		"""The set of entity pairs that came into contact in this timestep"""
+		self.collision_pairs
+		return self._begin_pairs
+	
+	@property
+	def persist_pairs(self):
+		"""The set of entity pairs in contact in this timestep that were
+		also in contact the last time :attr:`collision_pairs` was
+		computed
+		"""
+		return self.collision_pairs - self._begin_pairs
+	
+	@property
+	def end_pairs(self):
+		"""The set of entity pairs that were in contact the last time 
+		:attr:`collision_pairs` was computed, but are no longer. Their
+		collision points and normals are from when they were last in 
+		contact. Entities in these pairs may have been deleted.
+		"""
+		self.collision_pairs
+		return self._end_pairs
+	
 	def query_point(self, x_or_point, y=None, from_mask=0xffffffff):
 		"""Hit test at the point specified. 
 
@@ -467,8 +1566,7 @@ class Circular(object):
 		position = getattr(self.world.components, self.position_component)
 		collision = getattr(self.world.components, self.collision_component)
 		for entity in self.broad_phase.query_point(x_or_point, y, from_mask):
-			separation = point - position[entity].position
-			if separation.get_length_sqrd() <= collision[entity].radius**2:
+			if dist_sqrd(point, position[entity].position) <= collision[entity].radius**2:
 				hits.add(entity)
 		return hits
 
@@ -499,10 +1597,56 @@ def dispatch_events(collision_system):
 
 	If a pair of entities are in collision, then the event will be dispatched
 	to both objects in arbitrary order if all of their collision masks align.
+
+	Events are dispatched each time step that the entities are in 
+	collision. To only handle new contacts, see 
+	:func:`dispatch_contact_events`.
+	"""
+	collision = getattr(collision_system.world.components, 
+		collision_system.collision_component)
+	_dispatch_pairs(collision, collision_system.collision_pairs, 'on_collide')
+
+
+def dispatch_contact_events(collision_system):
+	"""Collision handler that dispatches events to entities when they
+	come into contact, remain in contact and separate, rather than
+	every time step that they are in collision. This requires a 
+	collision system that tracks contacts, such as :class:`Circular`.
+	The event handler methods are defined by the application on the
+	desired entity classes, and are all optional::
+
+		def on_collide_begin(self, other_entity, collision_point, collision_normal):
+			'''Handle this entity coming into contact with `other_entity`'''
+
+		def on_collide_persist(self, other_entity, collision_point, collision_normal):
+			'''Handle this entity remaining in contact with `other_entity`'''
+
+		def on_collide_end(self, other_entity, collision_point, collision_normal):
+			'''Handle this entity separating from `other_entity`'''
+
+	The arguments are the same as for `on_collide()`, see 
+	:func:`dispatch_events`. For `on_collide_end()` the collision point
+	and normal are from the last time step the entities were in contact.
+	Since contacts end when an entity is deleted, `other_entity` may
+	no longer be in the world.
+
+	Entities that only handle `on_collide_begin()` are notified once per
+	contact, rather than each time step of a resting contact.
 	"""
 	collision = getattr(collision_system.world.components, 
 		collision_system.collision_component)
-	for pair in collision_system.collision_pairs:
+	_dispatch_pairs(collision, collision_system.begin_pairs, 'on_collide_begin')
+	_dispatch_pairs(collision, collision_system.end_pairs, 'on_collide_end', True)
+	_dispatch_pairs(collision, collision_system.persist_pairs, 'on_collide_persist')
+
+
+def _dispatch_pairs(collision, pairs, method_name, missing_ok=False):
+	"""Call the named method of each entity in the pairs for the other
+	entity, if their collision masks align. If `missing_ok` is true, 
+	entities missing from the collision component are treated as having
+	all mask bits set, otherwise they are skipped.
+	"""
+	for pair in pairs:
 		entity1, entity2 = pair
 		if pair.info is not None:
 			args1, args2 = pair.info
@@ -510,19 +1654,29 @@ def dispatch_events(collision_system):
 			args1 = entity1, None, None
 			args2 = entity2, None, None
 		try:
-			on_collide = entity1.on_collide
-			masks_align = collision[entity2].from_mask & collision[entity1].into_mask
-		except (AttributeError, KeyError):
+			method = getattr(entity1, method_name)
+		except AttributeError:
 			pass
 		else:
-			if masks_align:
-				on_collide(*args2)
+			if _masks_align(collision, entity2, entity1, missing_ok):
+				method(*args2)
 		try:
-			on_collide = entity2.on_collide
-			masks_align = collision[entity1].from_mask & collision[entity2].into_mask
-		except (AttributeError, KeyError):
+			method = getattr(entity2, method_name)
+		except AttributeError:
 			pass
 		else:
-			if masks_align:
-				on_collide(*args1)
+			if _masks_align(collision, entity1, entity2, missing_ok):
+				method(*args1)
+
 
+def _masks_align(collision, from_entity, into_entity, missing_ok):
+	all_bits = 0xffffffff if missing_ok else 0
+	try:
+		from_mask = collision[from_entity].from_mask
+	except (AttributeError, KeyError):
+		from_mask = all_bits
+	try:
+		into_mask = collision[into_entity].into_mask
+	except (AttributeError, KeyError):
+		into_mask = all_bits
+	return from_mask & into_mask
@@ -1,4 +1,7 @@
 
+import functools
+
+
 class RGBA(object):
 	"""Four channel color representation.
 
@@ -11,39 +14,75 @@ class RGBA(object):
 		RGBA("#333")
 		RGBA("#7F7F7F")
 	
+	Colors may also be initialized by name, see :data:`NAMED_COLORS`::
+
+		RGBA("orange")
+	
 	Individual color channels can be accessed by attribute name, or the
 	color object can be treated as a sequence of 4 floats.
 	"""
 
+	__slots__ = ('_r', '_g', '_b', '_a', '_bytes')
+
 	def __init__(self, r_or_colorstr, g=None, b=None, a=None):
+		self._bytes = None
 		if isinstance(r_or_colorstr, str):
 			assert g is b is a is None, "Ambiguous color arguments" 
-			self.r, self.g, self.b, self.a = self._parse_colorstr(r_or_colorstr)
+			self._r, self._g, self._b, self._a = parse_color(r_or_colorstr)
 		elif g is b is a is None:
 			try:
-				self.r, self.g, self.b, self.a = r_or_colorstr
+				self._r, self._g, self._b, self._a = r_or_colorstr
 			except ValueError:
-				self.r, self.g, self.b = r_or_colorstr
-				self.a = 1.0
+				self._r, self._g, self._b = r_or_colorstr
+				self._a = 1.0
 		else:
-			self.r = r_or_colorstr
-			self.g = g
-			self.b = b
-			self.a = a
-		if self.a is None:
-			self.a = 1.0
+			self._r = r_or_colorstr
+			self._g = g
+			self._b = b
+			self._a = a
+		if self._a is None:
+			self._a = 1.0
 	
-	def _parse_colorstr(self, colorstr):
-		length = len(colorstr)
-		if not colorstr.startswith("#") or length not in (4, 5, 7, 9):
-			raise ValueError("Invalid color string: " + colorstr)
-		if length <= 5:
-			parsed = [int(c*2, 16) / 255.0 for c in colorstr[1:]]
-		else:
-			parsed = [int(colorstr[i:i+2], 16) / 255.0 for i in range(1, length, 2)]
-		if len(parsed) == 3:
-			parsed.append(1.0)
-		return parsed
+	@classmethod
+	def from_packed(cls, packed):
+		"""Return a new color from a packed 32 bit integer, see 
+		:attr:`packed`
+		"""
+		color = cls(*(byte / 255.0 for byte in packed.to_bytes(4, 'big')))
+		color._bytes = packed.to_bytes(4, 'big')
+		return color
+
+	def _channel(name):
+		def get(self):
+			return getattr(self, name)
+		def set(self, value):
+			setattr(self, name, value)
+			self._bytes = None
+		return property(get, set)
+
+	r = _channel('_r')
+	g = _channel('_g')
+	b = _channel('_b')
+	a = _channel('_a')
+	del _channel
+
+	@property
+	def bytes(self):
+		"""The color as 4 unsigned bytes, in RGBA order. This is cached
+		until a channel is changed, so colors can be copied into vertex
+		buffers without converting them each time.
+		"""
+		if self._bytes is None:
+			self._bytes = _to_bytes(self)
+		return self._bytes
+	
+	@property
+	def packed(self):
+		"""The color as a 32 bit integer, 0xRRGGBBAA"""
+		return int.from_bytes(self.bytes, 'big')
+	
+	def __reduce__(self):
+		return (RGBA, tuple(self))
 	
 	def __len__(self):
 		return 4
@@ -60,5 +99,70 @@ class RGBA(object):
 	def __repr__(self):
 		return "%s(%.2f, %.2f, %.2f, %.2f)" % (self.__class__.__name__, 
 			self.r, self.g, self.b, self.a)
-			
-			
+
+
+class RGBAView(RGBA):
+	"""Base class for |RGBA| colors whose channels are stored elsewhere,
+	such as in a component column. Subclasses define the channel 
+	properties. The byte form is not cached, since the channels may
+	be changed without the view.
+	"""
+
+	__slots__ = ()
+
+	@property
+	def bytes(self):
+		return _to_bytes(self)
+
+
+def _to_bytes(color):
+	return bytes(min(max(int(channel * 255), 0), 255) for channel in color)
+
+
+NAMED_COLORS = {
+	'black': '#000',
+	'white': '#fff',
+	'gray': '#808080',
+	'grey': '#808080',
+	'silver': '#c0c0c0',
+	'red': '#f00',
+	'maroon': '#800000',
+	'orange': '#ffa500',
+	'yellow': '#ff0',
+	'olive': '#808000',
+	'lime': '#0f0',
+	'green': '#008000',
+	'cyan': '#0ff',
+	'aqua': '#0ff',
+	'teal': '#008080',
+	'blue': '#00f',
+	'navy': '#000080',
+	'magenta': '#f0f',
+	'fuchsia': '#f0f',
+	'purple': '#800080',
+	'transparent': '#0000',
+}
+"""Color names accepted by :class:`RGBA`, mapped to their color strings.
+Names may be added to this table, before they are first used.
+"""
+
+@functools.lru_cache(maxsize=1024)
+def parse_color(colorstr):
+	"""Parse a hex color string (``"#rgb"``, ``"#rgba"``, ``"#rrggbb"`` or
+	``"#rrggbbaa"``) or color name and return a tuple of 4 floats. Results
+	are cached, since the same color strings are typically parsed 
+	repeatedly.
+
+	:raises ValueError: If the string is not a valid color.
+	"""
+	colorstr = NAMED_COLORS.get(colorstr.lower(), colorstr)
+	length = len(colorstr)
+	if not colorstr.startswith("#") or length not in (4, 5, 7, 9):
+		raise ValueError("Invalid color string: " + colorstr)
+	if length <= 5:
+		parsed = [int(c*2, 16) / 255.0 for c in colorstr[1:]]
+	else:
+		parsed = [int(colorstr[i:i+2], 16) / 255.0 for i in range(1, length, 2)]
+	if len(parsed) == 3:
+		parsed.append(1.0)
+	return tuple(parsed)
@@ -29,11 +29,12 @@ See also :ref:`defining custom components in the tutorial <custom-component-exam
 
 __version__ = '$Id$'
 
-__all__ = ('Component', 'ComponentError', 'Position', 'Transform', 'Movement', 
-	'Shape', 'Renderable', 'Collision')
+__all__ = ('Component', 'ColumnarComponent', 'ComponentError', 'Position', 
+	'Transform', 'Movement', 'Shape', 'Renderable', 'Collision')
 
 from grease.component.general import Component
-from grease.geometry import Vec2d, Vec2dArray, Rect
+from grease.component.columnar import ColumnarComponent
+from grease.geometry import Vec2d, Vec2dArray, Rect, ShapeLibrary
 from grease import color
 
 
@@ -52,7 +53,7 @@ class Position(Component):
 	"""
 
 	def __init__(self):
-		Component.__init__(self, position=Vec2d, angle=float)
+		super(Position, self).__init__(position=Vec2d, angle=float)
 
 
 class Transform(Component):
@@ -68,7 +69,7 @@ class Transform(Component):
 	"""
 
 	def __init__(self):
-		Component.__init__(self, offset=Vec2d, shear=Vec2d, rotation=float, scale=float)
+		super(Transform, self).__init__(offset=Vec2d, shear=Vec2d, rotation=float, scale=float)
 		self.fields['scale'].default = lambda: 1.0
 
 
@@ -84,7 +85,7 @@ class Movement(Component):
 	"""
 
 	def __init__(self):
-		Component.__init__(self, velocity=Vec2d, accel=Vec2d, rotation=float)
+		super(Movement, self).__init__(velocity=Vec2d, accel=Vec2d, rotation=float)
 
 
 class Shape(Component):
@@ -93,11 +94,53 @@ class Shape(Component):
 	- **closed** (bool) -- If the shapes is closed implying an edge between
 	  last and first vertices.
 	- **verts** (Vec2dArray) -- Array of vertex points
+
+	Shapes used by many entities can be added to the component's
+	:attr:`library` and set for entities with :meth:`set_shape`, so that
+	their vertices are stored only once.
+
+	:param library: The :class:`~grease.geometry.ShapeLibrary` used, 
+		which may be shared with other components. By default, the
+		component has its own library.
 	"""
 
-	def __init__(self):
-		Component.__init__(self, closed=int, verts=Vec2dArray)
+	library = None
+	""":class:`~grease.geometry.ShapeLibrary` of shapes shared by 
+	entities in the component
+	"""
+
+	def __init__(self, library=None):
+		super(Shape, self).__init__(closed=int, verts=Vec2dArray)
 		self.fields['closed'].default = lambda: 1
+		if library is None:
+			library = ShapeLibrary()
+		self.library = library
+	
+	def set_shape(self, entity, shape, closed=None):
+		"""Set the vertices of an entity to a shape in the library, adding
+		the entity to the component if needed. The entity's ``verts`` are
+		a :class:`~grease.geometry.SharedVec2dArray`, which is copied if
+		it is changed or its vectors are accessed.
+
+		:param shape: The shape id or name in the library.
+		:param closed: If not None, the value for the entity's 
+			``closed`` field.
+		:return: The entity data.
+		"""
+		verts = self.library.verts(shape)
+		data = self.get(entity)
+		if data is None:
+			data = self.set(entity)
+		self.unchecked_setter('verts')(data, verts)
+		if closed is not None:
+			data.closed = closed
+		return data
+	
+	def shape_id(self, entity):
+		"""Return the id of the library shape used by an entity, or None
+		if the entity's vertices are not shared.
+		"""
+		return getattr(self[entity].verts, 'shape_id', None)
 
 
 class Renderable(Component):
@@ -111,7 +154,7 @@ class Renderable(Component):
 	"""
 
 	def __init__(self):
-		Component.__init__(self, depth=float, color=color.RGBA)
+		super(Renderable, self).__init__(depth=float, color=color.RGBA)
 		self.fields['color'].default = lambda: color.RGBA(1,1,1,1)
 
 
@@ -134,6 +177,10 @@ class Collision(Component):
 	- **into_mask** (int) -- A bitmask that determines what entities can collide
 		with this object.
 
+	- **static** (bool) -- True if the entity does not move. Collision systems
+		may treat static entities more efficiently, see 
+		:class:`grease.collision.BroadPartitioned`.
+
 	When considering an entity A for collision with entity B, A's ``from_mask`` is
 	bit ANDed with B's ``into_mask``. If the result is nonzero (meaning 1 or more
 	bits is set the same for each) then the collision test is made. Otherwise,
@@ -143,7 +190,8 @@ class Collision(Component):
 	all entities will collide with each other by default.
 	"""
 	def __init__(self):
-		Component.__init__(self, aabb=Rect, radius=float, from_mask=int, into_mask=int)
+		super(Collision, self).__init__(
+			aabb=Rect, radius=float, from_mask=int, into_mask=int, static=bool)
 		self.fields['into_mask'].default = lambda: 0xffffffff
 		self.fields['from_mask'].default = lambda: 0xffffffff
 
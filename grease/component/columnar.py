@@ -0,0 +1,481 @@
+#############################################################################
+#
+# Copyright (c) 2010 by Casey Duncan and contributors
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the MIT License
+# A copy of the license should accompany this distribution.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#
+#############################################################################
+"""Columnar (struct-of-arrays) component storage.
+
+A columnar component stores each field in its own contiguous column
+indexed by a dense row number, rather than storing a data object per
+entity. Numeric and geometric fields are kept in typed ctypes arrays,
+so a column can be handed to code that understands the buffer protocol
+without copying.
+"""
+
+__version__ = '$Id$'
+
+__all__ = ('ColumnarComponent',)
+
+import ctypes
+import types
+from grease.component.general import Component
+from grease.geometry import Vec2d, CVec2d, Rect
+from grease import color
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+class Column(object):
+	"""Storage for a single component field. The base column stores
+	arbitrary Python objects in a list and is used for field types that
+	have no fixed-size representation.
+	"""
+
+	def __init__(self, field):
+		self.field = field
+		self.data = []
+
+	def reserve(self, capacity):
+		"""Ensure the column has storage for at least `capacity` rows"""
+		if capacity > len(self.data):
+			self.data.extend([None] * (capacity - len(self.data)))
+
+	def get(self, row):
+		return self.data[row]
+
+	def set(self, row, value):
+		self.data[row] = value
+
+	def swap(self, row1, row2):
+		"""Exchange the values in two rows"""
+		data = self.data
+		data[row1], data[row2] = data[row2], data[row1]
+
+	def clear(self, row):
+		"""Release the value in a row no longer in use"""
+		self.data[row] = None
+
+
+class TypedColumn(Column):
+	"""Column stored as a contiguous ctypes array. Structure values
+	(e.g., |Vec2d| and |Rect|) are returned as views into the array
+	so they can be modified in place.
+	"""
+
+	members = ()
+	"""Names of the members of structured values, in storage order"""
+
+	def __init__(self, field, ctype):
+		self.field = field
+		self.ctype = ctype
+		self.data = (ctype * 0)()
+		self.dtype, self.members = array_types.get(ctype, (None, ()))
+
+	def array(self, rows, member=None):
+		"""Return a NumPy array view of the first `rows` values of the 
+		column, or of a single member of the values if specified. 
+		Structured values are viewed as an array with a column per member.
+		Return None if NumPy is not available or the column cannot be viewed.
+		"""
+		if numpy is None or self.dtype is None:
+			return None
+		width = len(self.members) or 1
+		array = numpy.frombuffer(memoryview(self.data).cast('B'), 
+			dtype=self.dtype, count=rows * width)
+		if member is not None:
+			if member not in self.members:
+				return None
+			return array[self.members.index(member)::width]
+		elif self.members:
+			return array.reshape(rows, width)
+		return array
+
+	def reserve(self, capacity):
+		if capacity > len(self.data):
+			capacity = max(capacity, len(self.data) * 2, 16)
+			data = (self.ctype * capacity)()
+			ctypes.memmove(data, self.data, ctypes.sizeof(self.data))
+			self.data = data
+
+	def swap(self, row1, row2):
+		size = ctypes.sizeof(self.ctype)
+		base = ctypes.addressof(self.data)
+		temp = ctypes.create_string_buffer(size)
+		ctypes.memmove(temp, base + row1 * size, size)
+		ctypes.memmove(base + row1 * size, base + row2 * size, size)
+		ctypes.memmove(base + row2 * size, temp, size)
+
+	def clear(self, row):
+		pass
+
+
+class RGBAColumn(TypedColumn):
+	"""Column storing |RGBA| colors as four contiguous doubles per row"""
+
+	def __init__(self, field):
+		TypedColumn.__init__(self, field, ctypes.c_double * 4)
+		self.dtype = 'float64'
+		self.members = ('r', 'g', 'b', 'a')
+
+	def get(self, row):
+		return RGBAView(self.data[row])
+
+	def set(self, row, value):
+		self.data[row][:] = tuple(value)
+
+
+class RGBAView(color.RGBAView):
+	"""|RGBA| color backed by a row of an :class:`RGBAColumn`"""
+
+	__slots__ = ('_channels',)
+
+	def __init__(self, channels):
+		self._channels = channels
+
+	def _channel(index):
+		def get(self):
+			return self._channels[index]
+		def set(self, value):
+			self._channels[index] = value
+		return property(get, set)
+
+	r = _channel(0)
+	g = _channel(1)
+	b = _channel(2)
+	a = _channel(3)
+	del _channel
+
+
+class Vec2dColumn(TypedColumn):
+	"""Column storing |Vec2d| values as ctypes structures when the
+	pure Python Vec2d implementation is selected. Values are still
+	returned as views into the array.
+	"""
+
+	def __init__(self, field):
+		TypedColumn.__init__(self, field, CVec2d)
+
+	def set(self, row, value):
+		vec = self.data[row]
+		vec.x = value.x
+		vec.y = value.y
+
+
+# Field type -> ctypes storage type for typed columns
+column_types = {
+	int: ctypes.c_int64,
+	float: ctypes.c_double,
+	bool: ctypes.c_bool,
+	Vec2d: CVec2d,
+	Rect: Rect,
+}
+
+# ctypes storage type -> NumPy dtype and structure members
+array_types = {
+	ctypes.c_int64: ('int64', ()),
+	ctypes.c_double: ('float64', ()),
+	ctypes.c_bool: ('bool', ()),
+	CVec2d: ('float64', tuple(name for name, _ in CVec2d._fields_)),
+	Rect: ('float64', tuple(name for name, _ in Rect._fields_)),
+}
+
+def new_column(field):
+	"""Return a new empty column suitable for the field specified"""
+	if field.type is Vec2d and Vec2d is not CVec2d:
+		return Vec2dColumn(field)
+	elif field.type in column_types:
+		return TypedColumn(field, column_types[field.type])
+	elif field.type is color.RGBA:
+		return RGBAColumn(field)
+	else:
+		return Column(field)
+
+
+class ColumnarRecord(object):
+	"""Data record view of a single entity's row in a
+	:class:`ColumnarComponent`. Record classes are generated per component
+	with a property for each field.
+	"""
+
+	__slots__ = ('entity',)
+
+	def __init__(self, entity):
+		self.entity = entity
+
+	def __repr__(self):
+		return '<%s(%r)>' % (self.__class__.__name__,
+			dict((name, getattr(self, name)) for name in self._fields))
+
+	def __lt__(self, other):
+		return id(self) < id(other)
+
+
+def _column_property(column, entities, indexes):
+	cast = column.field.cast
+	get = column.get
+	set = column.set
+	rows = entities._index
+	def fget(record):
+		return get(rows[record.entity])
+	def fset(record, value):
+		entity = record.entity
+		set(rows[entity], cast(value))
+		if indexes and entity in entities:
+			for index in indexes:
+				index.set(entity, record)
+	return property(fget, fset, doc="%s field" % column.field.name)
+
+
+class ColumnarComponent(Component):
+	"""Component with a configurable schema that stores its data in
+	columns, one per field, instead of one data object per entity.
+
+	The schema is defined the same way as for :class:`Component`. Fields
+	of type :class:`int`, :class:`float`, :class:`bool`, |Vec2d|, |Rect| and
+	|RGBA| are stored in contiguous typed arrays. Other field types
+	are stored in Python lists.
+
+	Entity data is accessed through lightweight record views that are
+	compatible with the data objects of :class:`Component`. Structured
+	field values (|Vec2d|, |Rect| and |RGBA|) are returned as views into
+	the column storage, so modifying them in place updates the component.
+	These views are only valid until the component grows its storage
+	or compacts it at the next time step, so they should not be held
+	across time steps.
+
+	Rows are aligned with the slots of the component's :attr:`entities`
+	index. When an entity is removed, its row stays in place until the
+	next time step, so the rows of other entities do not change during a
+	step. The storage is then compacted by moving the last live rows 
+	into the rows of the removed entities.
+
+	The predefined components can be made columnar by mixing in this class::
+
+		class Position(component.Position, component.ColumnarComponent):
+			pass
+	"""
+
+	def __init__(self, **fields):
+		super(ColumnarComponent, self).__init__(**fields)
+		self._records = None
+		self._capacity = 0
+		self._columns = dict(
+			(name, new_column(field)) for name, field in self.fields.items())
+		self._field_indexes = dict((name, []) for name in self.fields)
+		namespace = dict((name, _column_property(
+				column, self.entities, self._field_indexes[name]))
+			for name, column in self._columns.items())
+		namespace['__slots__'] = ()
+		namespace['_fields'] = tuple(sorted(self._columns))
+		self._record_class = type(
+			self.__class__.__name__ + 'Record', (ColumnarRecord,), namespace)
+
+	__eq__ = object.__eq__
+	__ne__ = object.__ne__
+	__hash__ = object.__hash__
+
+	def column(self, name):
+		"""Return the storage array for the named field. For typed fields
+		this is a ctypes array that supports the buffer protocol, otherwise
+		it is a list. Only the first ``len(component)`` rows are in use,
+		in the order given by :meth:`row`.
+
+		The array returned is replaced when the component grows, so it
+		should not be retained.
+		"""
+		return self._columns[name].data
+
+	def unchecked_setter(self, field_name):
+		"""Return a function ``setter(record, value)`` that stores the
+		value in the named field of a record from this component without
+		casting it to the field type. If the field is indexed, the value
+		is cast and the indexes are updated.
+		"""
+		if self._field_indexes[field_name]:
+			return self._record_class.__dict__[field_name].fset
+		column_set = self._columns[field_name].set
+		rows = self._rows
+		def setter(record, value):
+			column_set(rows[record.entity], value)
+		return setter
+
+	def array(self, name, member=None):
+		"""Return a NumPy array view of the named field for the rows of 
+		the component, in the order of :meth:`row`. If no entities were
+		removed during the current time step, this is also the order of
+		:attr:`entities`. If `member` is specified, the view is of a
+		single member of a structured field, e.g.
+		``component.array('position', 'x')``.
+
+		Return None if NumPy is not installed, or the field is not
+		stored in a typed column.
+
+		The view is only valid until the component's entities
+		are added or compacted, so it should not be retained.
+		"""
+		column = self._columns[name]
+		if isinstance(column, TypedColumn):
+			return column.array(self.entities.slots(), member)
+
+	def step(self, dt):
+		"""Update the component for the next timestep, releasing
+		the rows of deleted entities
+		"""
+		used = self.entities.slots()
+		self.entities.purge()
+		for row in range(self.entities.slots(), used):
+			for column in self._columns.values():
+				column.clear(row)
+		self.new_entities = self._added
+		self.deleted_entities = self._deleted
+		self._added = []
+		self._deleted = []
+
+	def _index_field(self, name):
+		# Record properties update the indexes
+		pass
+
+	def _swap_slots(self, slot1, slot2):
+		for column in self._columns.values():
+			column.swap(slot1, slot2)
+
+	def _new_slot(self):
+		row = self.entities.slots()
+		if row >= self._capacity:
+			self._capacity = max(row + 1, self._capacity * 2)
+			for column in self._columns.values():
+				column.reserve(self._capacity)
+
+	def set(self, entity, data=None, **data_kw):
+		"""Set the component data for an entity, adding it to the
+		component if it is not already a member. Return a record
+		view of the entity data.
+
+		Data is specified the same way as :meth:`Component.set`.
+		"""
+		assert entity.world is self.world, "Entity not in component's world"
+		row = self._add_slot(entity)
+		for name, column in self._columns.items():
+			field = column.field
+			if name in data_kw:
+				value = data_kw[name]
+			elif data is not None and hasattr(data, name):
+				value = getattr(data, name)
+			else:
+				value = field.default()
+			column.set(row, field.cast(value))
+		record = self._record_class(entity)
+		if self._indexes:
+			self._index_entity(entity, record)
+		return record
+
+	def set_many(self, entities, data=None, **columns):
+		"""Set the component data for a sequence of entities at once,
+		filling the columns in bulk. Data is specified the same way
+		as :meth:`Component.set_many`.
+
+		:return: A list of record views of the entity data.
+		"""
+		entities = list(entities)
+		for name, values in columns.items():
+			assert len(values) == len(entities), (
+				"Expected %d values for field %s" % (len(entities), name))
+		if not entities:
+			return []
+		assert entities[0].world is self.world, "Entity not in component's world"
+		needed = self.entities.slots() + len(entities)
+		if needed > self._capacity:
+			self._capacity = max(needed, self._capacity * 2)
+			for column in self._columns.values():
+				column.reserve(self._capacity)
+		add_slot = self._add_slot
+		rows = [add_slot(entity) for entity in entities]
+		for name, column in self._columns.items():
+			field = column.field
+			cast = field.cast
+			set = column.set
+			if name in columns:
+				for row, value in zip(rows, columns[name]):
+					set(row, cast(value))
+			elif isinstance(column, TypedColumn):
+				# Values are copied into the column, so can be shared
+				if data is not None and hasattr(data, name):
+					value = cast(getattr(data, name))
+				else:
+					value = cast(field.default())
+				for row in rows:
+					set(row, value)
+			elif data is not None and hasattr(data, name):
+				value = getattr(data, name)
+				for row in rows:
+					set(row, cast(value))
+			else:
+				default = field.default
+				for row in rows:
+					set(row, cast(default()))
+		record = self._record_class
+		records = [record(entity) for entity in entities]
+		if self._indexes:
+			for record in records:
+				self._index_entity(record.entity, record)
+		return records
+
+	def set_template(self, entities, template, shared=()):
+		"""Set the component data for a sequence of entities from a
+		template of field values, see :meth:`Component.set_template`.
+		Values of typed columns are always copied into the columns.
+		"""
+		entities = list(entities)
+		records = self.set_many(entities, types.SimpleNamespace(**template))
+		for name in shared:
+			column = self._columns[name]
+			if not isinstance(column, TypedColumn):
+				value = template[name]
+				slot = self.entities.slot
+				for entity in entities:
+					column.set(slot(entity), value)
+		return records
+
+	def __setitem__(self, entity, data):
+		self.set(entity, data)
+
+	def __getitem__(self, entity):
+		if entity in self._rows:
+			return self._record_class(entity)
+		raise KeyError(entity)
+
+	def get_many(self, entities):
+		rows = self._rows
+		record = self._record_class
+		entities = list(entities)
+		for entity in entities:
+			if entity not in rows:
+				raise KeyError(entity)
+		return list(map(record, entities))
+
+	def __len__(self):
+		return self.entities.slots()
+
+	def values(self):
+		record = self._record_class
+		return [record(entity) for entity in self.entities._dense]
+
+	def items(self):
+		record = self._record_class
+		return [(entity, record(entity)) for entity in self.entities._dense]
+
+	def get(self, entity, default=None):
+		if entity in self._rows:
+			return self._record_class(entity)
+		return default
+
@@ -17,6 +17,11 @@ import operator
 from grease.geometry import Vec2d, Vec2dArray, Rect
 from grease import color
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 # Allowed field types -> default values
 types = {int:lambda: 0, 
          float:lambda: 0.0, 
@@ -149,10 +154,55 @@ class FieldAccessor(object):
 				continue
 			yield getter(data)
 	
-	## batch comparison operators ##
+	def __array(self):
+		"""Return a NumPy array view of the field values and the rows
+		selected by the accessor's entities, or None if the field 
+		cannot be accessed as an array.
+		"""
+		if numpy is None or len(self.__attrs) > 1:
+			return None
+		component = self.__field.component
+		get_array = getattr(component, 'array', None)
+		if get_array is None:
+			return None
+		array = get_array(self.__field.name, *self.__attrs)
+		if array is None:
+			return None
+		entities = self.__entities
+		members = component.entities
+		if entities is members and len(members) == members.slots():
+			return array, slice(None), None
+		selected = [entity for entity in entities if entity in members]
+		rows = numpy.array(
+			[component.row(entity) for entity in selected], dtype=numpy.intp)
+		return array, rows, selected
 	
+	## batch comparison operators ##
+
 	def __match(self, value, op):
 		component = self.__field.component
+		if not isinstance(value, FieldAccessor):
+			find = getattr(component, 'find', None)
+			if find is not None:
+				matches = find((self.__field.name,) + self.__attrs, op, value)
+				if matches is not None:
+					entities = self.__entities
+					if entities is not component.entities:
+						matches.intersection_update(entities)
+					return matches
+			if op in _array_compare and numpy.ndim(value) == 0:
+				selection = self.__array()
+				if selection is not None and selection[0].ndim == 1:
+					array, rows, selected = selection
+					try:
+						mask = _array_compare[op](array[rows], value)
+					except (TypeError, ValueError):
+						pass
+					else:
+						if selected is None:
+							selected = component.entities._dense
+						return set(map(selected.__getitem__, 
+							numpy.flatnonzero(mask).tolist()))
 		getter = self.__getter
 		matches = set()
 		add = matches.add
@@ -208,6 +258,21 @@ class FieldAccessor(object):
 
 	def __mutate(self, value, op):
 		component = self.__field.component
+		if op in _array_mutate and not isinstance(value, FieldAccessor):
+			selection = self.__array()
+			if selection is not None:
+				array, rows, _ = selection
+				if not isinstance(value, str) and hasattr(value, '__len__'):
+					value = tuple(value)
+				try:
+					array[rows] = _array_mutate[op](array[rows], value)
+				except (TypeError, ValueError):
+					pass
+				else:
+					reindex = getattr(component, 'reindex', None)
+					if reindex is not None:
+						reindex(self.__field.name)
+					return self
 		if self.__attrs:
 			name = self.__attrs[-1]
 		else:
@@ -272,6 +337,34 @@ class FieldAccessor(object):
 		return self.__mutate(value, operator.ixor)
 
 
+if numpy is not None:
+	# Vectorized operators for array-backed fields
+	_array_compare = {
+		operator.eq: numpy.equal,
+		operator.ne: numpy.not_equal,
+		operator.lt: numpy.less,
+		operator.le: numpy.less_equal,
+		operator.gt: numpy.greater,
+		operator.ge: numpy.greater_equal,
+	}
+	_array_mutate = {
+		operator.iadd: numpy.add,
+		operator.isub: numpy.subtract,
+		operator.imul: numpy.multiply,
+		operator.itruediv: numpy.true_divide,
+		operator.ifloordiv: numpy.floor_divide,
+		operator.imod: numpy.mod,
+		operator.ipow: numpy.power,
+		operator.ilshift: numpy.left_shift,
+		operator.irshift: numpy.right_shift,
+		operator.iand: numpy.bitwise_and,
+		operator.ior: numpy.bitwise_or,
+		operator.ixor: numpy.bitwise_xor,
+	}
+else:
+	_array_compare = _array_mutate = {}
+
+
 class Field(object):
 	"""Component field metadata and accessor interface"""
 
@@ -279,9 +372,21 @@ class Field(object):
 		self.component = component
 		self.name = name
 		self.type = type
-		self.default = types.get(type)
+		self._default = types.get(type)
 		self.accessor_factory = accessor_factory
 	
+	def _get_default(self):
+		return self._default
+
+	def _set_default(self, default):
+		self._default = default
+		field_changed = getattr(self.component, 'field_changed', None)
+		if field_changed is not None:
+			field_changed(self)
+
+	default = property(_get_default, _set_default, 
+		doc="Function that returns the default value for the field")
+	
 	def cast(self, value):
 		"""Cast value to the appropriate type for thi field"""
 		if self.type is not object:
@@ -293,9 +398,10 @@ class Field(object):
 		"""Return the field accessor for the entities in the component,
 		or all entities in the set specified that are also in the component
 		"""
-		if entities is None or entities is self.component.entities:
+		if entities is None:
 			entities = self.component.entities
-		else:
+		elif getattr(entities, '_component', None) is not self.component:
+			# Component entity sets are already subsets of the component
 			entities = entities & self.component.entities
 		return self.accessor_factory(self, entities)
 
@@ -15,15 +15,28 @@ __version__ = '$Id$'
 
 from grease.component import base
 from grease.component import field
-from grease.entity import ComponentEntitySet
+from grease.component.index import HashIndex, SortedIndex
+from grease.entity import SparseEntitySet, EntityComponentAccessor
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
-class Component(dict):
+class Component(object):
 	"""General component with a configurable schema
 
 	The field schema is defined via keyword args where the 
 	arg name is the field name and the value is the type object.
 
+	Entity membership is stored in a :class:`~grease.entity.SparseEntitySet`
+	with the data objects kept in a list aligned to its slots. Entities
+	removed from the component remain accessible until the next time
+	step, but are no longer included in :attr:`entities`. The storage is
+	compacted at the next time step, so the rows of entities, and the 
+	data objects and views obtained from the component, remain valid
+	for the rest of the current step.
+
 	The following types are supported for fields:
 
 	- :class:`int`
@@ -43,28 +56,205 @@ class Component(dict):
 	new_entities = ()
 	"""List of entities added to the component since the last time step"""
 
+	_data_class = None
+	_membership = None
+	_membership_bit = 0
+
 	def __init__(self, **fields):
 		self.fields = {}
 		for fname, ftype in list(fields.items()):
 			assert ftype in field.types, fname + " has an illegal field type"
 			self.fields[fname] = field.Field(self, fname, ftype)
-		self.entities = ComponentEntitySet(self)
+		self.entities = SparseEntitySet(self)
+		self._rows = self.entities._index
+		self._records = []
+		self._record_pool = []
+		self._released_records = []
 		self._added = []
 		self._deleted = []
+		self._indexes = []
+		self._field_indexes = {}
+		self._accessors = {}
+		self._data_class = data_class(
+			self.__class__.__name__ + 'Data', self.fields)
 	
 	def set_world(self, world):
 		self.world = world
 	
+	def track_membership(self, listener, bit):
+		"""Register a listener to be notified when entities are added to
+		or removed from the component. This is used by the world to track
+		the components of each entity.
+
+		:param listener: Object with ``component_added(entity, bit)`` and 
+			``component_removed(entity, bit)`` methods, or None to stop 
+			notifications.
+		:param bit: Value passed to the listener methods, identifying
+			the component.
+		"""
+		self._membership = listener
+		self._membership_bit = bit
+	
+	def field_changed(self, field):
+		"""Called when the definition of a component field changes,
+		e.g., when its default is replaced. 
+		"""
+		if self._data_class is not None:
+			self._data_class.compile_defaults()
+	
+	def unchecked_setter(self, field_name):
+		"""Return a function ``setter(data, value)`` that stores the
+		value in the named field of a data object from this component
+		without casting it to the field type. 
+		
+		This is intended for trusted inner loops that already have a value
+		of the proper type. Storing a value of the wrong type will lead
+		to unpredictable results. Indexes of the field added before the 
+		setter is obtained are updated by it.
+		"""
+		return self._data_class._setters[field_name][0]
+	
+	def add_index(self, path, sorted=False):
+		"""Add an index for a component field, or an attribute of a field's
+		values. Field accessor queries use indexes automatically. For
+		example, after the following, the expression 
+		``world[...].collision.aabb.right < 0`` is evaluated using the index
+		rather than examining every entity::
+
+			world.components.collision.add_index('aabb.right', sorted=True)
+
+		Indexes are updated when entities are added or removed, and when
+		a field is assigned. Changes made in place to field values, such
+		as setting the attributes of a field's |Vec2d| or |Rect| value, are
+		not tracked. To index such values, call :meth:`reindex` after
+		modifying them.
+
+		:param path: Field name, or dotted path of an attribute of the field.
+		:type path: str
+
+		:param sorted: If False, a hash index is created that supports
+			equality queries. If True, a sorted index is
+			created that supports equality and range queries. The indexed
+			values must be orderable.
+
+		:return: The index created
+		"""
+		path = tuple(path.split('.'))
+		assert path[0] in self.fields, "No such field: " + path[0]
+		index = (SortedIndex if sorted else HashIndex)(path)
+		index.rebuild(self._index_items())
+		self._indexes.append(index)
+		self._field_indexes.setdefault(path[0], []).append(index)
+		if len(self._field_indexes[path[0]]) == 1:
+			self._index_field(path[0])
+		return index
+	
+	def reindex(self, field_name=None):
+		"""Update the component's indexes from the current field values.
+		If a field name is specified, only the indexes of that field are
+		updated. Only the entities whose indexed values changed are 
+		reindexed.
+		"""
+		if field_name is None:
+			indexes = self._indexes
+		else:
+			indexes = self._field_indexes.get(field_name)
+		if indexes:
+			items = self._index_items()
+			for index in indexes:
+				index.update(items)
+	
+	def find_ids(self, path, op, value):
+		"""Use an index to find the ids of the entities where 
+		``op(field_value, value)`` is true for the field path specified,
+		see :meth:`add_index`. The ids are read from the index without
+		creating a set of entities, see :meth:`ids`.
+
+		:param path: Tuple of the field name and attribute names of the
+			indexed value, e.g., ``('aabb', 'right')``.
+
+		:return: A NumPy integer array if NumPy is installed, otherwise
+			a list. Return None if there is no suitable index.
+		"""
+		index = self._find_index(path, op)
+		if index is not None:
+			return index.find_ids(op, value)
+
+	def find(self, path, op, value):
+		"""Use an index to find the entities where ``op(field_value, value)``
+		is true for the field path specified, like :meth:`find_ids`, 
+		but return a set of the entities. Return None if there is no 
+		suitable index.
+		"""
+		index = self._find_index(path, op)
+		if index is not None:
+			return index.find(op, value)
+	
+	def _find_index(self, path, op):
+		indexes = self._field_indexes.get(path[0])
+		if indexes:
+			for index in indexes:
+				if index.path == path and op in index.ops:
+					return index
+	
+	def _index_items(self):
+		entities = list(self.entities)
+		return list(zip(entities, self.get_many(entities)))
+	
+	def _index_field(self, name):
+		"""Update the field's indexes when it is assigned"""
+		entities = self.entities
+		rows = self._rows
+		records = self._records
+		indexes = self._field_indexes[name]
+		def update(data):
+			entity = data.entity
+			if entity in entities and records[rows[entity]] is data:
+				for index in indexes:
+					index.set(entity, data)
+		self._data_class.hook_setter(name, update)
+	
+	def _index_entity(self, entity, data):
+		for index in self._indexes:
+			index.set(entity, data)
+	
 	def step(self, dt):
 		"""Update the component for the next timestep"""
-		delitem = super(Component, self).__delitem__
-		for entity in self._deleted:
-			delitem(entity)
+		self.entities.purge()
+		slots = self.entities.slots()
+		if self._released_records:
+			self._record_pool.extend(self._released_records)
+			self._released_records = []
+		if len(self._records) > slots:
+			self._release_records(self._records[slots:])
+			del self._records[slots:]
 		self.new_entities = self._added
 		self.deleted_entities = self._deleted
 		self._added = []
 		self._deleted = []
 	
+	def _release_records(self, records):
+		"""Keep the data records of purged entities of pooled entity 
+		classes to be reused after the next time step. See 
+		:attr:`grease.Entity.POOL_SIZE`.
+		"""
+		data_class = self._data_class
+		pool_size = len(self._record_pool) + len(self._released_records)
+		for data in records:
+			if data.__class__ is data_class:
+				max_size = getattr(data.entity, 'POOL_SIZE', 0)
+				if pool_size < max_size:
+					self._released_records.append(data)
+					pool_size += 1
+
+	def _new_record(self, entity, data_kw):
+		"""Return a new data record, reusing a pooled record if available"""
+		if self._record_pool:
+			data = self._record_pool.pop()
+			data.__init__(entity, **data_kw)
+			return data
+		return self._data_class(entity, **data_kw)
+	
 	def set(self, entity, data=None, **data_kw):
 		"""Set the component data for an entity, adding it to the
 		component if it is not already a member.
@@ -79,22 +269,231 @@ class Component(dict):
 			for fname, field in list(self.fields.items()):
 				if fname not in data_kw and hasattr(data, fname):
 					data_kw[fname] = getattr(data, fname)
-		data = self[entity] = Data(self.fields, entity, **data_kw)
+		data = self[entity] = self._new_record(entity, data_kw)
 		return data
 	
+	def set_many(self, entities, data=None, **columns):
+		"""Set the component data for a sequence of entities at once,
+		adding them to the component as needed. This is more efficient than
+		calling :meth:`set` for each entity.
+
+		If data is specified, its field attributes are copied for all 
+		of the entities, as in :meth:`set`. Keyword arguments map field names
+		to sequences of values, one for each entity in order. Values from
+		the keyword arguments take precedence over the data template.
+
+		:return: A list of the entity data objects.
+		"""
+		entities = list(entities)
+		template = {}
+		if data is not None:
+			for fname in self.fields:
+				if fname not in columns and hasattr(data, fname):
+					template[fname] = getattr(data, fname)
+		for fname, values in columns.items():
+			assert len(values) == len(entities), (
+				"Expected %d values for field %s" % (len(entities), fname))
+		if entities:
+			assert entities[0].world is self.world, (
+				"Entity not in component's world")
+		new_record = self._new_record
+		add_slot = self._add_slot
+		records = self._records
+		result = []
+		append = result.append
+		for i, entity in enumerate(entities):
+			if columns:
+				data_kw = dict(template)
+				for fname, values in columns.items():
+					data_kw[fname] = values[i]
+			else:
+				data_kw = template
+			data = records[add_slot(entity)] = new_record(entity, data_kw)
+			append(data)
+		if self._indexes:
+			for data in result:
+				self._index_entity(data.entity, data)
+		return result
+
+	def set_template(self, entities, template, shared=()):
+		"""Set the component data for a sequence of entities from a 
+		template of field values, as used by :class:`grease.world.Prefab`.
+		This is faster than :meth:`set_many` with a template data object,
+		since the values are not cast for each entity.
+
+		:param template: Dict mapping field names to values already cast
+			to the field types. Fields not in the template are set to 
+			their defaults.
+
+		:param shared: Names of fields whose template values are stored
+			by reference for all of the entities, rather than copied for
+			each. Values of immutable field types are always shared. 
+			Shared values must not be changed in place.
+
+		:return: A list of the entity data objects.
+		"""
+		shared_values = []
+		copied_values = []
+		created_values = []
+		for name, setter, cast, value, factory in self._data_class._defaults:
+			if name in template:
+				value = template[name]
+				if name in shared or value.__class__ in _immutable_types:
+					shared_values.append((setter, value))
+				else:
+					copied_values.append((setter, cast, value))
+			elif factory is None:
+				shared_values.append((setter, value))
+			else:
+				created_values.append((setter, factory))
+		new = object.__new__
+		data_class = self._data_class
+		pool = self._record_pool
+		add_slot = self._add_slot
+		records = self._records
+		result = []
+		append = result.append
+		for entity in entities:
+			data = pool.pop() if pool else new(data_class)
+			_set_entity(data, entity)
+			for setter, value in shared_values:
+				setter(data, value)
+			for setter, cast, value in copied_values:
+				setter(data, cast(value))
+			for setter, factory in created_values:
+				setter(data, factory())
+			records[add_slot(entity)] = data
+			append(data)
+		if result:
+			assert result[0].entity.world is self.world, (
+				"Entity not in component's world")
+		if self._indexes:
+			for data in result:
+				self._index_entity(data.entity, data)
+		return result
+
+	def ids(self):
+		"""Return the ids of the entities in the component, in the order
+		of their storage rows. Bulk code can work with the ids and only 
+		look up entity objects as needed using 
+		:meth:`grease.World.entity`.
+
+		:return: A NumPy integer array if NumPy is installed, otherwise
+			a list.
+		"""
+		ids = [entity.entity_id for entity in self.entities]
+		if numpy is not None:
+			return numpy.array(ids, dtype=numpy.int64)
+		return ids
+
+	def row(self, entity):
+		"""Return the storage row index of the entity's data. Rows are
+		the slots of the entity in :attr:`entities`. Rows do not change 
+		during a time step, but may change at the next time step when the
+		storage of removed entities is compacted, so should not be 
+		retained across steps.
+		"""
+		return self._rows[entity]
+
+	def _swap_slots(self, slot1, slot2):
+		"""Exchange the data stored in two entity slots"""
+		records = self._records
+		records[slot1], records[slot2] = records[slot2], records[slot1]
+	
+	def _add_slot(self, entity):
+		"""Add the entity to the entity index, extending the data storage
+		as needed, and return its slot
+		"""
+		entities = self.entities
+		slot = self._rows.get(entity)
+		if slot is not None:
+			if entity in entities:
+				# The accessor may have cached the data being replaced
+				self._accessors.pop(entity, None)
+				return slot
+			self._deleted.remove(entity)
+		else:
+			self._new_slot()
+		self._added.append(entity)
+		if self._membership is not None:
+			self._membership.component_added(entity, self._membership_bit)
+		return entities.add(entity)
+	
+	def _new_slot(self):
+		"""Extend the data storage by one slot for a new entity"""
+		self._records.append(None)
+
 	def __setitem__(self, entity, data):
 		assert entity.world is self.world, "Entity not in component's world"
-		if entity not in self.entities:
-			self._added.append(entity)
-			self.entities.add(entity)
-		super(Component, self).__setitem__(entity, data)
+		self._records[self._add_slot(entity)] = data
+		if self._indexes:
+			self._index_entity(entity, data)
+	
+	def __getitem__(self, entity):
+		return self._records[self._rows[entity]]
+	
+	def get_many(self, entities):
+		"""Return a list of the data of a sequence of entities, in order.
+		This is more efficient than getting the data of each entity
+		individually.
+
+		:raises KeyError: If any of the entities are not in the component.
+		"""
+		records = self._records
+		rows = self._rows
+		return [records[rows[entity]] for entity in entities]
+	
+	def __contains__(self, entity):
+		return entity in self._rows
+	
+	def __len__(self):
+		return len(self._records)
+	
+	def __iter__(self):
+		return iter(self.entities._dense[:])
+	
+	def keys(self):
+		return self.entities._dense[:]
+	
+	def values(self):
+		return self._records[:]
+	
+	def items(self):
+		return list(zip(self.entities._dense, self._records))
+	
+	def get(self, entity, default=None):
+		slot = self._rows.get(entity)
+		if slot is not None:
+			return self._records[slot]
+		return default
+	
+	def accessor(self, entity):
+		"""Return an :class:`grease.entity.EntityComponentAccessor` for
+		the entity. Accessors of member entities are kept and returned
+		again until the entity's data is replaced or it is removed, so
+		repeated entity attribute access does not create new accessors.
+		"""
+		try:
+			return self._accessors[entity]
+		except KeyError:
+			accessor = EntityComponentAccessor(self, entity)
+			if entity in self.entities:
+				self._accessors[entity] = accessor
+			return accessor
 	
 	def remove(self, entity):
-		if entity in self.entities:
-			self._deleted.append(entity)
+		try:
 			self.entities.remove(entity)
-			return True
-		return False
+		except KeyError:
+			return False
+		self._accessors.pop(entity, None)
+		self._deleted.append(entity)
+		if self._indexes:
+			for index in self._indexes:
+				index.discard(entity)
+		if self._membership is not None:
+			self._membership.component_removed(entity, self._membership_bit)
+		return True
 	
 	__delitem__ = remove
 
@@ -119,27 +518,93 @@ class Singleton(Component):
 			return self.manager[list(self._data.keys())[0]]
 	
 class Data(object):
+	"""Base class for component data objects. A data class with a slot
+	for each field is generated from this for each component. Assigning
+	a field casts the value to the field type, assigning any other
+	attribute raises :class:`AttributeError`.
+	"""
 
-	def __init__(self, fields, entity, **data):
-		self.__dict__['_Data__fields'] = fields
-		self.__dict__['entity'] = entity
-		for field in list(fields.values()):
-			if field.name in data:
-				setattr(self, field.name, data[field.name])
-			else:
-				setattr(self, field.name, field.default())
+	__slots__ = ('entity',)
+
+	_fields = {}
+	_setters = {}
+	_defaults = ()
+
+	def __init__(self, entity, **data):
+		_set_entity(self, entity)
+		if data:
+			for name in data:
+				if name not in self._setters:
+					raise AttributeError("Invalid data field: " + name)
+			for name, setter, cast, value, factory in self._defaults:
+				if name in data:
+					setter(self, cast(data[name]))
+				elif factory is None:
+					setter(self, value)
+				else:
+					setter(self, factory())
+		else:
+			for name, setter, cast, value, factory in self._defaults:
+				if factory is None:
+					setter(self, value)
+				else:
+					setter(self, factory())
 	
 	def __setattr__(self, name, value):
-		if name in self.__fields:
-			self.__dict__[name] = self.__fields[name].cast(value)
-		else:
+		try:
+			setter, cast = self._setters[name]
+		except KeyError:
 			raise AttributeError("Invalid data field: " + name)
+		setter(self, cast(value))
+	
+	@classmethod
+	def compile_defaults(cls):
+		"""Precompute the field defaults used to initialize new data objects.
+		Default values of immutable field types are computed once, others
+		are created for each data object.
+		"""
+		defaults = []
+		for name, field in sorted(cls._fields.items()):
+			setter = cls.__dict__[name].__set__
+			cast = cls._setters[name][1]
+			if field.type in _immutable_types or (
+				field.type is object and field.default is _object_default):
+				defaults.append((name, setter, cast, field.default(), None))
+			else:
+				defaults.append((name, setter, cast, None, field.default))
+		cls._defaults = tuple(defaults)
+	
+	@classmethod
+	def hook_setter(cls, name, hook):
+		"""Call ``hook(data)`` after the named field is assigned"""
+		slot_set = cls.__dict__[name].__set__
+		cast = cls._setters[name][1]
+		def set_hooked(data, value):
+			slot_set(data, value)
+			hook(data)
+		cls._setters[name] = (set_hooked, cast)
 	
 	def __repr__(self):
-		return '<%s(%r)>' % (self.__class__.__name__, self.__dict__)
+		return '<%s(%r)>' % (self.__class__.__name__, 
+			dict((name, getattr(self, name)) for name in self._fields))
 
 	def __lt__(self, other):
 		return id(self) < id(other)
 
-			
+_set_entity = Data.entity.__set__
+_immutable_types = (int, float, bool, str)
+_object_default = field.types[object]
+
+def _identity(value):
+	return value
 
+def data_class(name, fields):
+	"""Return a new :class:`Data` subclass for the fields specified"""
+	cls = type(name, (Data,), {'__slots__': tuple(sorted(fields))})
+	cls._fields = dict(fields)
+	cls._setters = dict(
+		(fname, (cls.__dict__[fname].__set__, 
+			_identity if f.type is object else f.type))
+		for fname, f in fields.items())
+	cls.compile_defaults()
+	return cls
@@ -0,0 +1,273 @@
+#############################################################################
+#
+# Copyright (c) 2010 by Casey Duncan and contributors
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the MIT License
+# A copy of the license should accompany this distribution.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#
+#############################################################################
+"""Component field indexes.
+
+Indexes map the values of a component field, or an attribute of a field
+value, to the entities having them. They are created with
+:meth:`grease.component.Component.add_index` and used automatically by
+field accessor queries, such as ``world[...].gun.firing == True``.
+"""
+
+__version__ = '$Id$'
+
+import operator
+import bisect
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+def id_array(ids):
+	"""Return a sequence of entity ids as a NumPy integer array if
+	NumPy is installed, otherwise as a list
+	"""
+	if numpy is not None:
+		return numpy.fromiter(ids, dtype=numpy.int64)
+	return list(ids)
+
+
+def _entity_id(entity):
+	"""Return the id of an entity. Plain hashable objects may be used as
+	entities as well, their hash is used as their id.
+	"""
+	try:
+		return entity.entity_id
+	except AttributeError:
+		return hash(entity)
+
+
+class HashIndex(object):
+	"""Index supporting equality queries. Field values that are not
+	hashable, such as vectors, are indexed as tuples.
+	"""
+
+	ops = (operator.eq,)
+	"""Comparison operators supported by the index"""
+
+	def __init__(self, path):
+		self.path = path
+		self.getter = operator.attrgetter('.'.join(path))
+		self._keys = {}
+		self._entities = {}
+
+	@staticmethod
+	def key(value):
+		try:
+			hash(value)
+		except TypeError:
+			return tuple(value)
+		return value
+
+	def set(self, entity, data):
+		"""Index the value for an entity from its data, replacing any
+		prior value indexed
+		"""
+		key = self.key(self.getter(data))
+		old_key = self._keys.get(entity, self)
+		if old_key is not self:
+			if old_key == key:
+				return
+			self._remove(entity, old_key)
+		self._keys[entity] = key
+		try:
+			self._entities[key][entity] = _entity_id(entity)
+		except KeyError:
+			self._entities[key] = {entity: _entity_id(entity)}
+
+	def discard(self, entity):
+		"""Remove an entity from the index if present"""
+		key = self._keys.pop(entity, self)
+		if key is not self:
+			self._remove(entity, key)
+
+	def _remove(self, entity, key):
+		entities = self._entities[key]
+		del entities[entity]
+		if not entities:
+			del self._entities[key]
+
+	def rebuild(self, items):
+		"""Rebuild the index from scratch from an iterable of
+		(entity, data) pairs
+		"""
+		self._keys.clear()
+		self._entities.clear()
+		for entity, data in items:
+			self.set(entity, data)
+
+	def update(self, items):
+		"""Update the index from an iterable of (entity, data) pairs
+		for all of the entities indexed
+		"""
+		for entity, data in items:
+			self.set(entity, data)
+
+	def _matching(self, op, value):
+		if op is operator.eq:
+			return self._entities.get(self.key(value), {})
+		raise ValueError("Unsupported index operator %r" % op)
+
+	def find(self, op, value):
+		"""Return the set of entities where ``op(field_value, value)``
+		is true
+		"""
+		return set(self._matching(op, value))
+
+	def find_ids(self, op, value):
+		"""Return the ids of the entities where ``op(field_value, value)``
+		is true, see :func:`id_array`
+		"""
+		return id_array(self._matching(op, value).values())
+
+	def __len__(self):
+		return len(self._keys)
+
+
+class SortedIndex(object):
+	"""Index supporting range comparisons and equality queries.
+	Field values indexed must be orderable.
+
+	Entities are kept sorted by keys of their value and entity id, so 
+	the position of any entity can be found by bisection without
+	comparing entities, and the ids of the entities in a range of values
+	can be read from the keys.
+	"""
+
+	ops = (operator.eq, operator.lt, operator.le, operator.gt, operator.ge)
+	"""Comparison operators supported by the index"""
+
+	bulk_ratio = 0.125
+	"""Fraction of the entities indexed that must change in an
+	:meth:`update` for the index to be resorted at once rather than 
+	updated entity by entity
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self.getter = operator.attrgetter('.'.join(path))
+		self._keys = {}
+		self._sorted = []
+		self._entities = []
+
+	def set(self, entity, data):
+		"""Index the value for an entity from its data, replacing any
+		prior value indexed
+		"""
+		value = self.getter(data)
+		old_key = self._keys.get(entity)
+		if old_key is not None:
+			if old_key[0] == value:
+				return
+			self._remove(old_key)
+		self._insert(entity, (value, _entity_id(entity)))
+
+	def discard(self, entity):
+		"""Remove an entity from the index if present"""
+		key = self._keys.pop(entity, None)
+		if key is not None:
+			self._remove(key)
+
+	def _insert(self, entity, key):
+		self._keys[entity] = key
+		i = bisect.bisect_left(self._sorted, key)
+		self._sorted.insert(i, key)
+		self._entities.insert(i, entity)
+
+	def _remove(self, key):
+		keys = self._sorted
+		i = bisect.bisect_left(keys, key)
+		if i == len(keys) or keys[i] is not key:
+			# Values were changed in place since they were indexed
+			i = keys.index(key)
+		del keys[i]
+		del self._entities[i]
+
+	def update(self, items):
+		"""Update the index from an iterable of (entity, data) pairs
+		for all of the entities indexed. Entities whose values have not
+		changed are not moved, so this is much faster than 
+		:meth:`rebuild` when few values change.
+		"""
+		getter = self.getter
+		keys = self._keys
+		changed = []
+		for entity, data in items:
+			value = getter(data)
+			key = keys.get(entity)
+			if key is None or key[0] != value:
+				changed.append((entity, value))
+		if len(changed) > len(keys) * self.bulk_ratio:
+			entities = self._entities
+			for entity, value in changed:
+				if entity not in keys:
+					entities.append(entity)
+				keys[entity] = (value, _entity_id(entity))
+			# Sorting is close to linear when the order changed little
+			entities.sort(key=keys.__getitem__)
+			self._sorted = list(map(keys.__getitem__, entities))
+		else:
+			for entity, value in changed:
+				key = keys.get(entity)
+				if key is not None:
+					self._remove(key)
+				self._insert(entity, (value, _entity_id(entity)))
+
+	def rebuild(self, items):
+		"""Rebuild the index from scratch from an iterable of
+		(entity, data) pairs
+		"""
+		getter = self.getter
+		keys = self._keys = dict(
+			(entity, (getter(data), _entity_id(entity))) for entity, data in items)
+		self._entities = sorted(keys, key=keys.__getitem__)
+		self._sorted = list(map(keys.__getitem__, self._entities))
+
+	def _range(self, op, value):
+		"""Return the slice of the sorted entities where 
+		``op(field_value, value)`` is true
+		"""
+		keys = self._sorted
+		if op is operator.eq:
+			return slice(bisect.bisect_left(keys, (value,)),
+				bisect.bisect_right(keys, (value, _max_id)))
+		elif op is operator.lt:
+			return slice(0, bisect.bisect_left(keys, (value,)))
+		elif op is operator.le:
+			return slice(0, bisect.bisect_right(keys, (value, _max_id)))
+		elif op is operator.gt:
+			return slice(bisect.bisect_right(keys, (value, _max_id)), None)
+		elif op is operator.ge:
+			return slice(bisect.bisect_left(keys, (value,)), None)
+		raise ValueError("Unsupported index operator %r" % op)
+
+	def find(self, op, value):
+		"""Return the set of entities where ``op(field_value, value)``
+		is true
+		"""
+		return set(self._entities[self._range(op, value)])
+
+	def find_ids(self, op, value):
+		"""Return the ids of the entities where ``op(field_value, value)``
+		is true, in order of their field values, see :func:`id_array`
+		"""
+		return id_array(map(_key_id, self._sorted[self._range(op, value)]))
+
+	def __len__(self):
+		return len(self._keys)
+
+_key_id = operator.itemgetter(1)
+
+# Compares greater than the entity id in any index key
+_max_id = float('inf')
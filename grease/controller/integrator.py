@@ -13,6 +13,8 @@
 
 __version__ = '$Id$'
 
+from grease.vecops import add_scaled
+
 
 class EulerMovement(object):
 	"""System that applies entity movement to position using Euler's method
@@ -36,7 +38,13 @@ class EulerMovement(object):
 		assert self.world is not None, "Cannot run with no world set"
 		for position, movement in self.world.components.join(
 			self.position_component, self.movement_component):
-			movement.velocity += movement.accel * dt
-			position.position += movement.velocity * dt
+			velocity = add_scaled(movement.velocity, movement.accel, dt)
+			add_scaled(position.position, velocity, dt)
 			position.angle += movement.rotation * dt
+		# Vectors are updated in place, bypassing the field setters
+		for name, field in ((self.movement_component, 'velocity'),
+			(self.position_component, 'position')):
+			component = getattr(self.world.components, name)
+			if hasattr(component, 'reindex'):
+				component.reindex(field)
 
@@ -30,7 +30,32 @@ See :ref:`an example entity class in the tutorial <tut-entity-example>`.
 
 __version__ = '$Id$'
 
-__all__ = ('Entity', 'EntityComponentAccessor', 'ComponentEntitySet')
+__all__ = ('Entity', 'EntityComponentAccessor', 'ComponentAttribute',
+	'ComponentEntitySet', 'SparseEntitySet', 'entity_index', 'entity_generation')
+
+import itertools
+
+ENTITY_INDEX_BITS = 32
+"""Number of low bits of an entity id that hold the entity's index. The
+remaining high bits hold the generation of the index.
+"""
+
+ENTITY_INDEX_MASK = (1 << ENTITY_INDEX_BITS) - 1
+
+
+def entity_index(entity_id):
+	"""Return the index part of an entity id. Indexes are reused for
+	new entities after entities are deleted, so the indexes of a world's
+	entities remain dense.
+	"""
+	return entity_id & ENTITY_INDEX_MASK
+
+def entity_generation(entity_id):
+	"""Return the generation part of an entity id. The generation is
+	incremented each time an index is reused, so an entity id held after
+	its entity is deleted never matches a newer entity.
+	"""
+	return entity_id >> ENTITY_INDEX_BITS
 
 
 class EntityMeta(type):
@@ -70,9 +95,23 @@ class Entity(object, metaclass=EntityMeta):
 	specified arbitarily by the subclass.
 	"""
 
+	POOL_SIZE = 0
+	"""Maximum number of deleted entity objects of the class that each world
+	keeps to reuse for new entities, along with their component data objects.
+	Set this in subclasses of short-lived entities that are created and
+	deleted frequently to reduce allocation. Reused entities get a new
+	entity id, but references to deleted entities of pooled classes, 
+	including scheduled callbacks, must not be retained, since the entity
+	object may be reused.
+	"""
+
 	def __new__(cls, world, *args, **kw):
 		"""Create a new entity and add it to the world"""
-		entity = object.__new__(cls)
+		entity = None
+		if cls.POOL_SIZE:
+			entity = world.reuse_entity(cls)
+		if entity is None:
+			entity = object.__new__(cls)
 		entity.world = world
 		entity.entity_id = world.new_entity_id()
 		world.entities.add(entity)
@@ -155,12 +194,12 @@ class EntityComponentAccessor(object):
 	
 	# beware, name mangling ahead. We want to avoid clashing with any
 	# user-configured component field names
-	__data = None
+	__slots__ = ('__component', '__entity', '__data')
 
 	def __init__(self, component, entity):
-		clsname = self.__class__.__name__
-		self.__dict__['_%s__component' % clsname] = component
-		self.__dict__['_%s__entity' % clsname] = entity
+		_set_accessor_component(self, component)
+		_set_accessor_entity(self, entity)
+		_set_accessor_data(self, None)
 	
 	def __bool__(self):
 		"""The accessor is True if the entity is in the component,
@@ -170,24 +209,81 @@ class EntityComponentAccessor(object):
 	
 	def __getattr__(self, name):
 		"""Return the data for the specified field of the entity's component"""
-		if self.__data is None:
+		data = self.__data
+		if data is None:
 			try:
 				data = self.__component[self.__entity]
 			except KeyError:
 				raise AttributeError(name)
-			clsname = self.__class__.__name__
-			self.__dict__['_%s__data' % clsname] = data
-		return getattr(self.__data, name)
+			_set_accessor_data(self, data)
+		return getattr(data, name)
 	
 	def __setattr__(self, name, value):
 		"""Set the data for the specified field of the entity's component"""
-		if self.__data is None:
-			clsname = self.__class__.__name__
+		data = self.__data
+		if data is None:
 			if self.__entity in self.__component:
-				self.__dict__['_%s__data' % clsname] = self.__component[self.__entity]
+				data = self.__component[self.__entity]
 			else:
-				self.__dict__['_%s__data' % clsname] = self.__component.set(self.__entity)
-		setattr(self.__data, name, value)
+				data = self.__component.set(self.__entity)
+			_set_accessor_data(self, data)
+		setattr(data, name, value)
+
+_set_accessor_component = EntityComponentAccessor._EntityComponentAccessor__component.__set__
+_set_accessor_entity = EntityComponentAccessor._EntityComponentAccessor__entity.__set__
+_set_accessor_data = EntityComponentAccessor._EntityComponentAccessor__data.__set__
+
+
+class ComponentAttribute(object):
+	"""Descriptor providing entity attribute access to a world component, 
+	see :meth:`Entity.__getattr__`. Worlds install a descriptor on 
+	:class:`Entity` for each component name, so that accessing a component
+	via an entity does not need to fall back to :meth:`Entity.__getattr__`.
+	Accessors are reused for components that keep them, see
+	:meth:`grease.component.Component.accessor`.
+
+	The descriptors are shared by the entities of all worlds. For entities
+	of a world without the component, the descriptor raises 
+	:class:`AttributeError`, as if the attribute did not exist.
+
+	:param name: The component name.
+	"""
+
+	__slots__ = ('name',)
+
+	def __init__(self, name):
+		self.name = name
+	
+	def __get__(self, entity, cls=None):
+		if entity is None:
+			return self
+		try:
+			component = getattr(entity.world.components, self.name)
+		except AttributeError:
+			raise AttributeError("%r object has no attribute %r" 
+				% (entity.__class__.__name__, self.name))
+		try:
+			return component._accessors[entity]
+		except KeyError:
+			return component.accessor(entity)
+		except AttributeError:
+			return EntityComponentAccessor(component, entity)
+	
+	@classmethod
+	def install(cls, name):
+		"""Install a descriptor for the component name on :class:`Entity`.
+		Names of other existing entity attributes, such as 
+		:meth:`Entity.delete`, are never replaced. Entities of worlds with
+		a component by such a name must access it via the world.
+
+		:return: True if a descriptor for the name is installed, False if
+			the name is taken by another entity attribute.
+		"""
+		attr = getattr(Entity, name, None)
+		if attr is None and not hasattr(Entity, name):
+			setattr(Entity, name, cls(name))
+			return True
+		return isinstance(attr, cls)
 
 
 class ComponentEntitySet(set):
@@ -209,3 +305,127 @@ class ComponentEntitySet(set):
 			self._component.fields[name].accessor(self).__set__(value)
 		raise AttributeError(name)
 
+
+class SparseEntitySet(set):
+	"""Entity index used by components to store their entity membership.
+
+	The set itself contains the component's live entities, so membership
+	tests and :func:`len` cost the same as for a plain :class:`set`. 
+	Entities are also kept in a dense array of slots in insertion order, 
+	with a mapping of entity to its slot. Adding and removing entities 
+	are O(1). Removed entities keep their slots until the set is purged at
+	the next time step, so the slots of entities, and any storage aligned
+	with them, do not change during a time step. Purging fills the freed
+	slots with the last live entities, notifying the owning component of
+	the swaps so that it may keep its data storage aligned with the slots.
+
+	Like :class:`ComponentEntitySet`, the set can be queried by component
+	fields. Iteration order is deterministic, and it is safe to modify the
+	set while iterating it. The set must only be modified by its component.
+	"""
+
+	__slots__ = ('_component', '_dense', '_index', '_flags', '_removed')
+
+	def __init__(self, component):
+		object.__setattr__(self, '_component', component)
+		object.__setattr__(self, '_dense', [])
+		object.__setattr__(self, '_index', {})
+		object.__setattr__(self, '_flags', bytearray())
+		object.__setattr__(self, '_removed', [])
+
+	def __iter__(self):
+		if len(self._dense) == len(self):
+			return iter(self._dense[:])
+		return iter(list(itertools.compress(self._dense, self._flags)))
+
+	def slot(self, entity):
+		"""Return the slot index of the entity in the dense array. 
+		Entities pending purge are included. Raise :class:`KeyError` 
+		if the entity is not in the set.
+		"""
+		return self._index[entity]
+	
+	def slots(self):
+		"""Return the total number of occupied slots, including pending
+		entities that have been removed but not yet purged
+		"""
+		return len(self._dense)
+	
+	def pending(self, entity):
+		"""Return True if the entity was removed but not yet purged"""
+		slot = self._index.get(entity)
+		return slot is not None and not self._flags[slot]
+
+	def add(self, entity):
+		"""Add the entity to the set, return its slot. If the entity is new,
+		the owning component must have already extended its storage by one
+		slot for it. If the entity is pending purge it is restored to
+		its slot.
+		"""
+		index = self._index
+		slot = index.get(entity)
+		if slot is None:
+			slot = index[entity] = len(self._dense)
+			self._dense.append(entity)
+			self._flags.append(1)
+		else:
+			self._flags[slot] = 1
+		set.add(self, entity)
+		return slot
+
+	def remove(self, entity):
+		"""Remove the entity from the set. Its slot remains occupied until
+		the next purge. Raise :class:`KeyError` if the entity is not in
+		the set.
+		"""
+		set.remove(self, entity)
+		self._flags[self._index[entity]] = 0
+		self._removed.append(entity)
+	
+	def discard(self, entity):
+		"""Remove the entity from the set if present"""
+		if entity in self:
+			self.remove(entity)
+	
+	def purge(self):
+		"""Drop the pending entities removed since the last purge, 
+		moving the last live entities into their slots. Slots at and past
+		``len(self)`` are no longer occupied afterward.
+		"""
+		removed = self._removed
+		if not removed:
+			return
+		dense = self._dense
+		index = self._index
+		flags = self._flags
+		end = len(self)
+		holes = set()
+		for entity in removed:
+			slot = index.get(entity)
+			if slot is not None and not flags[slot]:
+				holes.add(slot)
+				del index[entity]
+		del removed[:]
+		moved = [slot for slot in range(end, len(dense)) if flags[slot]]
+		swap_slots = self._component._swap_slots
+		for hole, slot in zip(sorted(hole for hole in holes if hole < end), moved):
+			entity = dense[hole] = dense[slot]
+			index[entity] = hole
+			flags[hole] = 1
+			swap_slots(hole, slot)
+		del dense[end:]
+		del flags[end:]
+
+	def __getattr__(self, name):
+		if not name.startswith('_') and name in self._component.fields:
+			return self._component.fields[name].accessor(self)
+		raise AttributeError(name)
+	
+	def __setattr__(self, name, value):
+		if name in self._component.fields:
+			self._component.fields[name].accessor(self).__set__(value)
+		else:
+			raise AttributeError(name)
+	
+	def __repr__(self):
+		return '%s(%r)' % (self.__class__.__name__, list(self))
@@ -1,23 +1,26 @@
 __version__ = "$Id$"
 __docformat__ = "reStructuredText"
 
+import os
 import operator
 import math
 import ctypes 
+import collections.abc
 
-class Vec2d(ctypes.Structure):
-    """2d vector class, supports vector and scalar operators,
-       and also provides a bunch of high level functions
-       """
-    __slots__ = ['x', 'y']
-    
-    @classmethod
-    def from_param(cls, arg):
-        return cls(arg)
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class _Vec2dBase(object):
+    """Vector operations shared by the Vec2d implementations. The
+    results of operations are of the selected :class:`Vec2d` class.
+    """
+    __slots__ = ()
         
     def __init__(self, x_or_pair, y = None):
         
-        if y == None:
+        if y is None:
             self.x = x_or_pair[0]
             self.y = x_or_pair[1]
         else:
@@ -27,6 +30,10 @@ class Vec2d(ctypes.Structure):
     def __len__(self):
         return 2
  
+    def __iter__(self):
+        yield self.x
+        yield self.y
+ 
     def __getitem__(self, key):
         if key == 0:
             return self.x
@@ -61,12 +68,12 @@ class Vec2d(ctypes.Structure):
             return True
  
     def __bool__(self):
-        return self.x or self.y
+        return bool(self.x or self.y)
  
     # Generic operator handlers
     def _o2(self, other, f):
         "Any two-operator operation where the left operand is a Vec2d"
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             return Vec2d(f(self.x, other.x),
                          f(self.y, other.y))
         elif (hasattr(other, "__getitem__")):
@@ -97,7 +104,7 @@ class Vec2d(ctypes.Structure):
  
     # Addition
     def __add__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             return Vec2d(self.x + other.x, self.y + other.y)
         elif hasattr(other, "__getitem__"):
             return Vec2d(self.x + other[0], self.y + other[1])
@@ -106,7 +113,7 @@ class Vec2d(ctypes.Structure):
     __radd__ = __add__
     
     def __iadd__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             self.x += other.x
             self.y += other.y
         elif hasattr(other, "__getitem__"):
@@ -119,21 +126,21 @@ class Vec2d(ctypes.Structure):
  
     # Subtraction
     def __sub__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             return Vec2d(self.x - other.x, self.y - other.y)
         elif (hasattr(other, "__getitem__")):
             return Vec2d(self.x - other[0], self.y - other[1])
         else:
             return Vec2d(self.x - other, self.y - other)
     def __rsub__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             return Vec2d(other.x - self.x, other.y - self.y)
         if (hasattr(other, "__getitem__")):
             return Vec2d(other[0] - self.x, other[1] - self.y)
         else:
             return Vec2d(other - self.x, other - self.y)
     def __isub__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             self.x -= other.x
             self.y -= other.y
         elif (hasattr(other, "__getitem__")):
@@ -146,8 +153,8 @@ class Vec2d(ctypes.Structure):
  
     # Multiplication
     def __mul__(self, other):
-        if isinstance(other, Vec2d):
-            return Vec2d(self.x*other.y, self.y*other.y)
+        if isinstance(other, _Vec2dBase):
+            return Vec2d(self.x*other.x, self.y*other.y)
         if (hasattr(other, "__getitem__")):
             return Vec2d(self.x*other[0], self.y*other[1])
         else:
@@ -155,7 +162,7 @@ class Vec2d(ctypes.Structure):
     __rmul__ = __mul__
     
     def __imul__(self, other):
-        if isinstance(other, Vec2d):
+        if isinstance(other, _Vec2dBase):
             self.x *= other.x
             self.y *= other.y
         elif (hasattr(other, "__getitem__")):
@@ -186,7 +193,7 @@ class Vec2d(ctypes.Structure):
     def __rtruediv__(self, other):
         return self._r_o2(other, operator.truediv)
     def __itruediv__(self, other):
-        return self._io(other, operator.floordiv)
+        return self._io(other, operator.truediv)
  
     # Modulo
     def __mod__(self, other):
@@ -384,61 +391,481 @@ class Vec2d(ctypes.Structure):
     def cpvunrotate(self, other):
         return Vec2d(self.x*other.x + self.y*other.y, self.y*other.x - self.x*other.y)
     
-    # Pickle, does not work atm.
-    def __getstate__(self):
-        return [self.x, self.y]
-        
-    def __setstate__(self, dict):
-        self.x, self.y = dict
-    def __newobj__(cls, *args):
-        return cls.__new__(cls, *args)    
-Vec2d._fields_ = [
+    # Pickle as a new vector, even if this is a view of an array
+    def __reduce__(self):
+        return (self.__class__, (self.x, self.y))
+
+
+class _PyVec2dType(type):
+    """Metaclass of :class:`PyVec2d`, so that vectors of either
+    implementation, such as array views, are instances of it
+    """
+
+    def __instancecheck__(cls, instance):
+        return isinstance(instance, _Vec2dBase)
+
+
+class PyVec2d(_Vec2dBase, metaclass=_PyVec2dType):
+    """2d vector class, supports vector and scalar operators,
+       and also provides a bunch of high level functions.
+
+       This implementation stores the coordinates in slots, which are
+       faster to create and access than ctypes structures.
+       """
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x_or_pair, y = None):
+        if y is None:
+            self.x, self.y = x_or_pair[0], x_or_pair[1]
+        else:
+            self.x = x_or_pair
+            self.y = y
+
+
+class CVec2d(_Vec2dBase, ctypes.Structure):
+    """2d vector class, supports vector and scalar operators,
+       and also provides a bunch of high level functions.
+
+       This implementation is a ctypes structure of two doubles, so
+       vectors can be viewed in contiguous arrays, e.g., by
+       :class:`Vec2dArray`.
+       """
+    
+    @classmethod
+    def from_param(cls, arg):
+        return cls(arg)
+CVec2d._fields_ = [
             ('x', ctypes.c_double),
             ('y', ctypes.c_double),
         ]
 
+VEC2D_IMPLEMENTATION = os.environ.get('GREASE_VEC2D', 'ctypes')
+"""Vec2d implementation selected by the ``GREASE_VEC2D`` environment
+variable when this module is imported: ``'ctypes'`` (the default) for
+:class:`CVec2d`, or ``'python'`` for the faster :class:`PyVec2d`
+"""
 
-class Vec2dArray(list):
+if VEC2D_IMPLEMENTATION == 'python':
+    Vec2d = PyVec2d
+elif VEC2D_IMPLEMENTATION == 'ctypes':
+    Vec2d = CVec2d
+else:
+    raise ImportError(
+        "Unknown GREASE_VEC2D implementation %r" % VEC2D_IMPLEMENTATION)
 
-	def __init__(self, iterable=()):
-		list.__init__(self, (Vec2d(i) for i in iterable))
 
+def _double_buffer(count):
+	"""Return a zeroed ctypes buffer for count vectors"""
+	return (ctypes.c_double * (count * 2))()
+
+
+class Vec2dArray(collections.abc.MutableSequence):
+	"""Array of 2D vectors stored in a single contiguous buffer of doubles,
+	as (x, y) pairs. The array supports the list interface. Items are 
+	|Vec2d| views of the buffer, so changing an item's attributes changes
+	the array. Views may no longer refer to the array after vectors are
+	added to it, since its buffer may be reallocated.
+
+	The buffer is accessible via :meth:`buffer`, or :meth:`array` when
+	NumPy is installed.
+	"""
+
+	__slots__ = ('_buffer', '_len')
+
+	VECTORIZE_THRESHOLD = 32
+	"""Minimum number of vectors for which :meth:`transform` uses NumPy,
+	if installed. Smaller arrays are faster to transform without it.
+	"""
+
+	def __init__(self, iterable=()):
+		if isinstance(iterable, Vec2dArray):
+			count = iterable._len
+			self._buffer = _double_buffer(count)
+			ctypes.memmove(self._buffer, iterable._buffer, count * 16)
+		else:
+			coords = []
+			append = coords.append
+			for vec in iterable:
+				append(vec[0])
+				append(vec[1])
+			count = len(coords) // 2
+			self._buffer = (ctypes.c_double * len(coords))(*coords)
+		self._len = count
+	
+	def _reserve(self, count):
+		"""Ensure the buffer has capacity for count vectors"""
+		if len(self._buffer) < count * 2:
+			buf = _double_buffer(max(count, self._len * 2, 4))
+			ctypes.memmove(buf, self._buffer, self._len * 16)
+			self._buffer = buf
+	
+	def _set_pairs(self, pairs):
+		"""Replace the array contents with a list of (x, y) pairs"""
+		coords = [coord for pair in pairs for coord in (pair[0], pair[1])]
+		self._buffer = (ctypes.c_double * len(coords))(*coords)
+		self._len = len(pairs)
+	
+	def _index(self, index):
+		if index < 0:
+			index += self._len
+		if not 0 <= index < self._len:
+			raise IndexError("Vec2dArray index out of range")
+		return index
+	
+	def __len__(self):
+		return self._len
+	
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(self._len)
+			if step == 1:
+				array = Vec2dArray()
+				if stop > start:
+					array._buffer = (ctypes.c_double * ((stop - start) * 2))(
+						*self._buffer[start * 2:stop * 2])
+					array._len = stop - start
+				return array
+			return Vec2dArray(self.tolist()[index])
+		return CVec2d.from_buffer(self._buffer, self._index(index) * 16)
+	
 	def __setitem__(self, index, value):
-		list.__setitem__(self, index, Vec2d(value))
+		if isinstance(index, slice):
+			pairs = self.tolist()
+			pairs[index] = [(vec[0], vec[1]) for vec in value]
+			self._set_pairs(pairs)
+		else:
+			i = self._index(index) * 2
+			x, y = value[0], value[1]
+			self._buffer[i] = x
+			self._buffer[i + 1] = y
+	
+	def __delitem__(self, index):
+		if isinstance(index, slice):
+			pairs = self.tolist()
+			del pairs[index]
+			self._set_pairs(pairs)
+		else:
+			index = self._index(index)
+			address = ctypes.addressof(self._buffer)
+			ctypes.memmove(address + index * 16, address + (index + 1) * 16, 
+				(self._len - index - 1) * 16)
+			self._len -= 1
+	
+	def __iter__(self):
+		buf = self._buffer
+		from_buffer = CVec2d.from_buffer
+		for i in range(self._len):
+			yield from_buffer(buf, i * 16)
+	
+	def __eq__(self, other):
+		try:
+			if len(other) != self._len:
+				return False
+		except TypeError:
+			return NotImplemented
+		if isinstance(other, Vec2dArray):
+			return self.tolist() == other.tolist()
+		for vec, other_vec in zip(self.tolist(), other):
+			if vec[0] != other_vec[0] or vec[1] != other_vec[1]:
+				return False
+		return True
+
+	__hash__ = None
+	
+	def __repr__(self):
+		return '%s([%s])' % (self.__class__.__name__, 
+			', '.join('Vec2d(%s, %s)' % pair for pair in self.tolist()))
+	
+	def __reduce__(self):
+		return (Vec2dArray, (self.tolist(),))
+
+	def __add__(self, other):
+		array = Vec2dArray(self)
+		array.extend(other)
+		return array
+	
+	def __iadd__(self, other):
+		self.extend(other)
+		return self
 	
 	def append(self, value):
 		"""Append a vector to the array"""
-		list.append(self, Vec2d(value))
+		count = self._len
+		self._reserve(count + 1)
+		x, y = value[0], value[1]
+		self._buffer[count * 2] = x
+		self._buffer[count * 2 + 1] = y
+		self._len = count + 1
 	
 	def insert(self, index, value):
 		"""Insert a vector into the array"""
-		list.insert(self, index, Vec2d(value))
+		count = self._len
+		if index < 0:
+			index = max(index + count, 0)
+		index = min(index, count)
+		x, y = value[0], value[1]
+		self._reserve(count + 1)
+		address = ctypes.addressof(self._buffer)
+		ctypes.memmove(address + (index + 1) * 16, address + index * 16, 
+			(count - index) * 16)
+		self._buffer[index * 2] = x
+		self._buffer[index * 2 + 1] = y
+		self._len = count + 1
+	
+	def extend(self, values):
+		"""Append a sequence of vectors to the array"""
+		if isinstance(values, Vec2dArray):
+			count = values._len
+			if count:
+				self._reserve(self._len + count)
+				ctypes.memmove(ctypes.addressof(self._buffer) + self._len * 16,
+					values._buffer, count * 16)
+				self._len += count
+		else:
+			for value in list(values):
+				self.append(value)
+	
+	def pop(self, index=-1):
+		"""Remove and return the vector at index, the last by default"""
+		vec = Vec2d(self[index])
+		del self[index]
+		return vec
+	
+	def clear(self):
+		"""Remove all vectors from the array"""
+		self._len = 0
+	
+	def reverse(self):
+		"""Reverse the array in place"""
+		self._set_pairs(self.tolist()[::-1])
+	
+	def sort(self, key=None, reverse=False):
+		"""Sort the array in place. If key is not specified, the vectors are
+		sorted by x, then y.
+		"""
+		if key is None:
+			pairs = sorted(self.tolist(), reverse=reverse)
+		else:
+			pairs = [(vec.x, vec.y) for vec in 
+				sorted((Vec2d(pair) for pair in self.tolist()), 
+					key=key, reverse=reverse)]
+		self._set_pairs(pairs)
+	
+	def copy(self):
+		"""Return a copy of the array"""
+		return Vec2dArray(self)
+	
+	def tolist(self):
+		"""Return a list of the (x, y) coordinates in the array"""
+		coords = self._buffer[:self._len * 2]
+		return list(zip(coords[0::2], coords[1::2]))
+	
+	def buffer(self):
+		"""Return a memoryview of the array's buffer of doubles,
+		(x, y) pairs for each vector.
+		"""
+		return memoryview(self._buffer)[:self._len * 2]
+	
+	def array(self):
+		"""Return a NumPy array view of shape (n, 2) of the vectors. Changes
+		to the view change the vectors. Requires NumPy.
+		"""
+		return numpy.frombuffer(self._buffer, dtype=numpy.float64, 
+			count=self._len * 2).reshape(self._len, 2)
 	
 	def transform(self, offset=Vec2d(0,0), angle=0, scale=1.0):
 		"""Return a new transformed Vec2dArray"""
-		offset = Vec2d(offset)
+		offset_x, offset_y = offset[0], offset[1]
 		angle = math.radians(-angle)
-		rot_vec = Vec2d(math.cos(angle), math.sin(angle))
+		cos_a = math.cos(angle) * scale
+		sin_a = math.sin(angle) * scale
+		count = self._len
 		xformed = Vec2dArray()
-		for vec in self:
-			xformed.append(vec.cpvrotate(rot_vec) * scale + offset)
+		if not count:
+			return xformed
+		xformed._buffer = buf = _double_buffer(count)
+		xformed._len = count
+		if numpy is not None and count >= self.VECTORIZE_THRESHOLD:
+			xformed.array()[:] = numpy.dot(self.array(), 
+				numpy.array([[cos_a, sin_a], [-sin_a, cos_a]])) + (offset_x, offset_y)
+		else:
+			coords = self._buffer[:count * 2]
+			xs = coords[0::2]
+			ys = coords[1::2]
+			buf[0::2] = [x * cos_a - y * sin_a + offset_x for x, y in zip(xs, ys)]
+			buf[1::2] = [x * sin_a + y * cos_a + offset_y for x, y in zip(xs, ys)]
 		return xformed
 	
 	def segments(self, closed=True):
 		"""Generate arrays of line segments connecting adjacent vetices
 		in this array, exploding the shape into it's constituent segments
 		"""
-		if len(self) >= 2:
-			last = self[0]
-			for vert in self[1:]:
+		pairs = self.tolist()
+		if len(pairs) >= 2:
+			last = pairs[0]
+			for vert in pairs[1:]:
 				yield Vec2dArray((last, vert))
 				last = vert
 			if closed:
-				yield Vec2dArray((last, self[0]))
-		elif self and closed:
-			yield Vec2dArray((self[0], self[0]))
+				yield Vec2dArray((last, pairs[0]))
+		elif pairs and closed:
+			yield Vec2dArray((pairs[0], pairs[0]))
+	
+	def bounds(self):
+		"""Return the bounding |Rect| of the vectors in the array
+
+		:raises ValueError: If the array is empty.
+		"""
+		if not self._len:
+			raise ValueError("Empty Vec2dArray has no bounds")
+		coords = self._buffer[:self._len * 2]
+		xs = coords[0::2]
+		ys = coords[1::2]
+		return Rect(min(xs), min(ys), max(xs), max(ys))
+	
+	def centroid(self):
+		"""Return the average position of the vectors in the array
+
+		:raises ValueError: If the array is empty.
+		"""
+		if not self._len:
+			raise ValueError("Empty Vec2dArray has no centroid")
+		coords = self._buffer[:self._len * 2]
+		return Vec2d(math.fsum(coords[0::2]) / self._len, 
+			math.fsum(coords[1::2]) / self._len)
 
 
+class SharedVec2dArray(Vec2dArray):
+	"""Vertex array of a shape in a :class:`ShapeLibrary`. The array 
+	shares the library's buffer for the shape with all other arrays of
+	that shape. Changing the array, by item assignment or its list 
+	methods, first copies the buffer (copy on write), detaching the array
+	from the library. 
+	
+	Getting items of the array, by index or iteration, also detaches it, 
+	since items are |Vec2d| views that can change the vectors in place.
+	Use :meth:`tolist` or :attr:`coords` to read the vectors of a shared
+	array without copying them. The views returned by :meth:`buffer` and
+	:meth:`array` are read-only while the array is shared, call
+	:meth:`detach` first to change the vectors through them.
+	"""
+
+	__slots__ = ('shape_id', 'coords')
+
+	def __init__(self, shape_id, array, coords):
+		self._buffer = array._buffer
+		self._len = array._len
+		self.shape_id = shape_id
+		self.coords = coords
+	
+	def detach(self):
+		"""Copy the vectors from the shared buffer, if the array is
+		still shared, so that changing them does not affect the library
+		shape or other arrays.
+		"""
+		if self.shape_id is not None:
+			buf = _double_buffer(self._len)
+			ctypes.memmove(buf, self._buffer, self._len * 16)
+			self._buffer = buf
+			self.shape_id = None
+			self.coords = None
+	
+	def _copy_on_write(name):
+		method = getattr(Vec2dArray, name)
+		def write(self, *args, **kw):
+			self.detach()
+			return method(self, *args, **kw)
+		write.__name__ = name
+		write.__doc__ = method.__doc__
+		return write
+
+	for _name in ('__iter__', '__setitem__', '__delitem__', '__iadd__',
+		'append', 'insert', 'extend', 'pop', 'remove', 'reverse', 'sort',
+		'clear'):
+		locals()[_name] = _copy_on_write(_name)
+	del _name, _copy_on_write
+
+	def __getitem__(self, index):
+		if not isinstance(index, slice):
+			self.detach()
+		return Vec2dArray.__getitem__(self, index)
+
+	def buffer(self):
+		"""Return a memoryview of the array's buffer of doubles, read-only
+		while the array is shared
+		"""
+		view = Vec2dArray.buffer(self)
+		if self.shape_id is not None:
+			view = view.toreadonly()
+		return view
+	
+	def array(self):
+		"""Return a NumPy array view of shape (n, 2) of the vectors,
+		read-only while the array is shared. Requires NumPy.
+		"""
+		array = Vec2dArray.array(self)
+		if self.shape_id is not None:
+			array.flags.writeable = False
+		return array
+
+
+class ShapeLibrary(object):
+	"""Registry of shapes shared by many entities. Each shape's vertices
+	are stored once, in a contiguous array, and entities reference them
+	with :class:`SharedVec2dArray` objects. See 
+	:meth:`grease.component.Shape.set_shape`.
+	"""
+
+	def __init__(self):
+		self._shapes = []
+		self._names = {}
+	
+	def add(self, verts, name=None):
+		"""Add a shape to the library and return its id.
+
+		:param verts: Sequence of vertex points for the shape.
+		:param name: Optional name for the shape, which may be used in
+			place of its id.
+		"""
+		array = Vec2dArray(verts)
+		shape_id = len(self._shapes)
+		self._shapes.append((array, tuple(array.tolist())))
+		if name is not None:
+			self._names[name] = shape_id
+		return shape_id
+	
+	def shape_id(self, shape):
+		"""Return the id of a shape specified by id or name"""
+		if shape in self._names:
+			return self._names[shape]
+		if isinstance(shape, int) and 0 <= shape < len(self._shapes):
+			return shape
+		raise KeyError(shape)
+	
+	def verts(self, shape):
+		"""Return a new :class:`SharedVec2dArray` for a shape specified by
+		id or name.
+		"""
+		shape_id = self.shape_id(shape)
+		array, coords = self._shapes[shape_id]
+		return SharedVec2dArray(shape_id, array, coords)
+	
+	def coords(self, shape):
+		"""Return a tuple of the (x, y) coordinates of a shape's vertices,
+		e.g., for renderers to cache geometry per shape.
+		"""
+		return self._shapes[self.shape_id(shape)][1]
+	
+	def __contains__(self, shape):
+		try:
+			self.shape_id(shape)
+		except KeyError:
+			return False
+		return True
+	
+	def __len__(self):
+		return len(self._shapes)
+
 
 class Rect(ctypes.Structure):
 	"""Simple rectangle. Will gain more functionality as needed"""
@@ -589,7 +1016,6 @@ if __name__ == "__main__":
             self.assertEqual(inplace_vec, alternate)
         
         def testPickle(self):
-            return # pickling does not work atm
             testvec = Vec2d(5, .3)
             testvec_str = pickle.dumps(testvec)
             loaded_vec = pickle.loads(testvec_str)
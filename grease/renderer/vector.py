@@ -94,18 +94,21 @@ class Vector(object):
 			angle = radians(-position.angle)
 			rot_vec.x = cos(angle)
 			rot_vec.y = sin(angle)
-			r = int(renderable.color.r * 255)
-			g = int(renderable.color.g * 255)
-			b = int(renderable.color.b * 255)
-			a = int(renderable.color.a * 255)
-			for vert in shape.verts:
-				vert = vert.cpvrotate(rot_vec) * scale + position.position
-				v_array[v_index].vert.x = vert.x
-				v_array[v_index].vert.y = vert.y
-				v_array[v_index].color.r = r
-				v_array[v_index].color.g = g
-				v_array[v_index].color.b = b
-				v_array[v_index].color.a = a
+			vert_color = CColor.from_buffer_copy(renderable.color.bytes)
+			coords = getattr(shape.verts, 'coords', None)
+			if coords is None:
+				coords = shape.verts.tolist()
+			# Coordinates are transformed as floats, without creating 
+			# vectors. Library shapes have them cached
+			cos_a = rot_vec.x * scale
+			sin_a = rot_vec.y * scale
+			pos_x = position.position.x
+			pos_y = position.position.y
+			for x, y in coords:
+				vert = v_array[v_index]
+				vert.vert.x = x * cos_a - y * sin_a + pos_x
+				vert.vert.y = x * sin_a + y * cos_a + pos_y
+				vert.color = vert_color
 				if v_index > shape_start:
 					i_array[i_index] = v_index - 1
 					i_index += 1
@@ -0,0 +1,102 @@
+#############################################################################
+#
+# Copyright (c) 2010 by Casey Duncan and contributors
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the MIT License
+# A copy of the license should accompany this distribution.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#
+#############################################################################
+"""In-place vector operations for inner loops.
+
+Vector operators return a new |Vec2d| for each result. The functions here
+instead store their result in an existing vector, the `out` argument,
+which defaults to the first vector argument. They work with vectors of
+either Vec2d implementation, including views into component columns and
+vector arrays, or any object with mutable ``x`` and ``y`` attributes.
+
+Modifying a component field value in place does not update indexes of
+that field, see :meth:`grease.component.Component.reindex`.
+"""
+
+__version__ = '$Id$'
+
+import math
+
+
+def add_scaled(vec, other, scale, out=None):
+	"""Store ``vec + other * scale`` in `out`, or `vec` if not specified,
+	and return it
+	"""
+	if out is None:
+		out = vec
+	out.x = vec.x + other.x * scale
+	out.y = vec.y + other.y * scale
+	return out
+
+def sub(vec, other, out=None):
+	"""Store ``vec - other`` in `out`, or `vec` if not specified,
+	and return it
+	"""
+	if out is None:
+		out = vec
+	out.x = vec.x - other.x
+	out.y = vec.y - other.y
+	return out
+
+def scale(vec, factor, out=None):
+	"""Store ``vec * factor`` in `out`, or `vec` if not specified,
+	and return it
+	"""
+	if out is None:
+		out = vec
+	out.x = vec.x * factor
+	out.y = vec.y * factor
+	return out
+
+def rotate(vec, angle_degrees, out=None):
+	"""Store `vec` rotated clockwise by `angle_degrees` in `out`, or
+	`vec` if not specified, and return it
+	"""
+	radians = -math.radians(angle_degrees)
+	return rotate_unit(vec, math.cos(radians), math.sin(radians), out)
+
+def rotate_unit(vec, cos, sin, out=None):
+	"""Store `vec` rotated by the angle with the cosine and sine
+	specified in `out`, or `vec` if not specified, and return it. Use
+	this to rotate many vectors by the same angle.
+	"""
+	if out is None:
+		out = vec
+	x = vec.x
+	y = vec.y
+	out.x = x * cos - y * sin
+	out.y = x * sin + y * cos
+	return out
+
+def normalize(vec, out=None):
+	"""Store `vec` scaled to unit length in `out`, or `vec` if not
+	specified, and return the length of `vec`. A zero length vector is 
+	stored unchanged.
+	"""
+	if out is None:
+		out = vec
+	x = vec.x
+	y = vec.y
+	length = math.sqrt(x * x + y * y)
+	if length != 0:
+		out.x = x / length
+		out.y = y / length
+	else:
+		out.x = x
+		out.y = y
+	return length
+
+def dist_sqrd(vec, other):
+	"""Return the squared distance between two vectors"""
+	dx = vec.x - other.x
+	dy = vec.y - other.y
+	return dx * dx + dy * dy
@@ -23,12 +23,19 @@ See :ref:`an example of world configuration in the tutorial <tut-world-example>`
 
 __version__ = '$Id$'
 
-import itertools
+import collections
+import types
 import pyglet
 from pyglet import gl
 from grease import mode
 from grease.component import ComponentError
-from grease.entity import Entity, ComponentEntitySet
+from grease.entity import Entity, ComponentEntitySet, ComponentAttribute
+from grease.entity import ENTITY_INDEX_BITS, ENTITY_INDEX_MASK
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 
 class World(mode.Mode):
@@ -62,6 +69,16 @@ class World(mode.Mode):
 	entities = None
 	"""Set of all entities that exist in the world"""
 
+	commands = None
+	""":class:`CommandBuffer` for deferring changes to the world's entities
+	until the end of the current time step
+	"""
+
+	prefabs = None
+	"""Dict mapping names to the world's :class:`Prefab` entity templates,
+	see :meth:`add_prefab`
+	"""
+
 	clock = None
 	""":class:`pyglet.clock` interface for use by constituents
 	of the world for scheduling
@@ -83,11 +100,17 @@ class World(mode.Mode):
 		self.components = ComponentParts(self)
 		self.systems = Parts(self)
 		self.renderers = Parts(self)
-		self.new_entity_id = itertools.count().__next__
-		self.new_entity_id() # skip id 0
+		self._generations = [0] # skip id 0
+		self._free_indexes = collections.deque()
+		self._released_indexes = []
+		self._entity_pools = {}
+		self._released_entities = []
+		self._expired_entities = []
 		self.entities = WorldEntitySet(self)
 		self._full_extent = EntityExtent(self, self.entities)
 		self._extents = {}
+		self.commands = CommandBuffer(self)
+		self.prefabs = {}
 		self.configure()
 
 	def configure(self):
@@ -99,6 +122,184 @@ class World(mode.Mode):
 		The default implementation does nothing.
 		"""
 	
+	def new_entity_id(self):
+		"""Allocate a unique entity id. 
+		
+		Entity ids combine an index, in the low bits, with the generation
+		of the index (see :func:`grease.entity.entity_index` and 
+		:func:`grease.entity.entity_generation`). The indexes of deleted
+		entities are reused with the next generation, so the ids of stale
+		entity references never match new entities.
+		"""
+		if self._free_indexes:
+			index = self._free_indexes.popleft()
+			generation = self._generations[index] = self._generations[index] + 1
+			return generation << ENTITY_INDEX_BITS | index
+		index = len(self._generations)
+		self._generations.append(0)
+		return index
+
+	def new_entity_ids(self, count):
+		"""Allocate a block of unique entity ids
+
+		:param count: The number of ids to allocate.
+		:rtype: list
+		"""
+		ids = []
+		free = self._free_indexes
+		generations = self._generations
+		while free and len(ids) < count:
+			index = free.popleft()
+			generation = generations[index] = generations[index] + 1
+			ids.append(generation << ENTITY_INDEX_BITS | index)
+		if len(ids) < count:
+			start = len(generations)
+			generations.extend([0] * (count - len(ids)))
+			ids.extend(range(start, len(generations)))
+		return ids
+	
+	def entity(self, entity_id):
+		"""Return the entity with the id specified. 
+		
+		:raises KeyError: If no entity with the id exists in the world, 
+			e.g., if the id is of an entity that has been deleted.
+		"""
+		entity = self.entities.by_index(entity_id & ENTITY_INDEX_MASK)
+		if entity is None or entity.entity_id != entity_id:
+			raise KeyError(entity_id)
+		return entity
+	
+	def entities_for(self, entity_ids):
+		"""Return a list of the entities for a sequence of ids, 
+		such as a NumPy array of ids returned by 
+		:meth:`grease.component.Component.ids`. 
+
+		:raises KeyError: If any of the ids are not of entities that exist 
+			in the world.
+		"""
+		by_index = self.entities._by_index
+		entities = []
+		append = entities.append
+		for entity_id in entity_ids:
+			entity_id = int(entity_id)
+			index = entity_id & ENTITY_INDEX_MASK
+			entity = by_index[index] if index < len(by_index) else None
+			if entity is None or entity.entity_id != entity_id:
+				raise KeyError(entity_id)
+			append(entity)
+		return entities
+
+	def reuse_entity(self, entity_class):
+		"""Return a pooled entity object of the class specified to reuse
+		for a new entity, or None if none are available. See 
+		:attr:`grease.Entity.POOL_SIZE`.
+		"""
+		pool = self._entity_pools.get(entity_class)
+		if pool:
+			return pool.pop()
+		return None
+
+	def release_entity(self, entity):
+		"""Release a deleted entity. Its id is released, and if its class
+		is pooled, the entity object is kept to be reused after the time
+		step following the next one. The entity object is not reused 
+		during the next time step, when the components and systems still
+		report its deletion. This is called by the world entity set when
+		an entity is deleted.
+		"""
+		self.release_entity_id(entity.entity_id)
+		if entity.POOL_SIZE:
+			self._released_entities.append(entity)
+
+	def release_entity_id(self, entity_id):
+		"""Release the id of a deleted entity. Its index is reused for
+		new entities after the next time step, once the world components 
+		have purged the deleted entity. This is called by the world entity
+		set when an entity is deleted.
+		"""
+		self._released_indexes.append(entity_id & ENTITY_INDEX_MASK)
+	
+	def spawn(self, entity_class, count, **component_data):
+		"""Create many entities of the same class at once, and set their
+		component data in bulk. This is much more efficient than creating
+		the entities individually. Note that the entity class's
+		:meth:`__init__` method is not called for spawned entities.
+
+		Example::
+
+			debris = world.spawn(Debris, 100, 
+				position={'position': positions},
+				movement={'velocity': velocities},
+				renderable=template)
+
+		:param entity_class: The :class:`grease.Entity` subclass to create.
+
+		:param count: The number of entities to create.
+		:type count: int
+
+		:param component_data: Keyword arguments naming components
+			to set the entity data of. The values may be a dict mapping
+			field names to sequences of values, one per entity, or a
+			data object used as a template for all of the entities. See
+			:meth:`grease.component.Component.set_many`.
+
+		:return: A list of the new entities, in the order of their component
+			data.
+		"""
+		new = object.__new__
+		set_world = entity_class.world.__set__
+		set_id = entity_class.entity_id.__set__
+		pool = self._entity_pools.get(entity_class) if entity_class.POOL_SIZE else None
+		entities = []
+		append = entities.append
+		for entity_id in self.new_entity_ids(count):
+			entity = pool.pop() if pool else new(entity_class)
+			set_world(entity, self)
+			set_id(entity, entity_id)
+			append(entity)
+		self.entities.add_many(entities)
+		for name, data in component_data.items():
+			component = getattr(self.components, name)
+			if isinstance(data, dict):
+				component.set_many(entities, **data)
+			else:
+				component.set_many(entities, data)
+		return entities
+
+	def add_prefab(self, name, entity_class=Entity, shared=(), **component_data):
+		"""Define a :class:`Prefab` template for creating entities with
+		preset component data, and add it to :attr:`prefabs`. The 
+		components and fields of the template are validated and the 
+		values cast to the field types once, here, rather than for each
+		entity created.
+
+		Example::
+
+			world.add_prefab('rock', Asteroid, shared=['shape.verts'],
+				shape={'verts': rock_verts, 'closed': True},
+				collision={'radius': 20.0},
+				renderable={'color': (0.75, 0.75, 0.75)})
+			rocks = world.prefabs['rock'].spawn(10)
+
+		:param name: Name of the prefab in :attr:`prefabs`.
+
+		:param entity_class: The :class:`grease.Entity` subclass of the 
+			entities created.
+
+		:param shared: Sequence of ``'component.field'`` names whose 
+			values are shared by reference by all of the entities created,
+			rather than copied for each entity. Shared values must not be
+			changed in place.
+
+		:param component_data: Keyword arguments naming components, 
+			each with a dict mapping field names to values.
+
+		:rtype: :class:`Prefab`
+		"""
+		prefab = self.prefabs[name] = Prefab(
+			self, entity_class, shared, **component_data)
+		return prefab
+
 	def __getitem__(self, entity_class):
 		"""Return an :class:`EntityExtent` for the given entity class. This extent
 		can be used to access the set of entities of that class in the world
@@ -119,19 +320,22 @@ class World(mode.Mode):
 			returns an extent containing all entities in the world.  This allows
 			you to conveniently query all entities using ``world[...]``.
 		"""
-		if isinstance(entity_class, tuple):
-			entities = set()
-			for cls in entity_class:
-				if cls in self._extents:
-					entities |= self._extents[cls].entities
-			return EntityExtent(self, entities)
-		elif entity_class is Ellipsis:
+		if entity_class is Ellipsis:
 			return self._full_extent
 		try:
 			return self._extents[entity_class]
 		except KeyError:
+			pass
+		if isinstance(entity_class, tuple):
+			# Union extents are maintained along with the class extents
+			entities = set()
+			for cls in entity_class:
+				entities |= self[cls].entities
+			extent = self._extents[entity_class] = EntityExtent(self, entities)
+			self.entities.extents_changed()
+		else:
 			extent = self._extents[entity_class] = EntityExtent(self, set())
-			return extent
+		return extent
 		
 	def activate(self, manager):
 		"""Activate the world/mode for the given manager, if the world is already active, 
@@ -174,6 +378,10 @@ class World(mode.Mode):
 		"""Execute a time step for the world. Updates the world `time`
 		and invokes the world's systems.
 		
+		After all systems are stepped, the changes queued in the world's
+		:attr:`commands` buffer are applied. The ids of entities deleted 
+		before the step become available for reuse.
+
 		Note that the specified time delta will be pinned to 10x the
 		configured step rate. For example if the step rate is 60,
 		then dt will be pinned at a maximum of 0.1666. This avoids 
@@ -187,9 +395,24 @@ class World(mode.Mode):
 		for component in self.components:
 			if hasattr(component, "step"):
 				component.step(dt)
+		if self._released_indexes:
+			self._free_indexes.extend(self._released_indexes)
+			self._released_indexes = []
+		if self._expired_entities:
+			pools = self._entity_pools
+			for entity in self._expired_entities:
+				pool = pools.setdefault(entity.__class__, [])
+				if len(pool) < entity.POOL_SIZE:
+					pool.append(entity)
+		# Entities deleted before this step are reported in the
+		# components' deleted_entities during it, so they are pooled 
+		# at the next step, like the components' data records
+		self._expired_entities = self._released_entities
+		self._released_entities = []
 		for system in self.systems:
 			if hasattr(system, "step"):
 				system.step(dt)
+		self.commands.apply()
 
 	def on_draw(self, gl=pyglet.gl):
 		"""Clear the current OpenGL context, reset the model/view matrix and
@@ -201,35 +424,396 @@ class World(mode.Mode):
 			renderer.draw()
 
 
+class CommandBuffer(object):
+	"""Queue of structural changes to a world's entities and components
+	that are applied together at a well-defined point, the end of
+	:meth:`World.step`. Queueing changes instead of making them immediately
+	allows systems and event handlers to iterate entity sets without
+	copying them first, and lets similar changes be applied in bulk.
+
+	Commands are applied in the order they are queued. Commands
+	targeting an entity deleted before they are applied are ignored.
+
+	Example::
+
+		for entity in self.world[Debris].entities:
+			if entity.renderable.color.a < 0.2:
+				self.world.commands.delete(entity)
+	"""
+
+	def __init__(self, world):
+		self.world = world
+		self._commands = []
+	
+	def __len__(self):
+		return len(self._commands)
+
+	def create(self, entity_class, *args, **kw):
+		"""Queue the creation of an entity. The entity class is 
+		instantiated with the world and the arguments specified.
+		"""
+		self._commands.append((self._create, (entity_class, args, kw)))
+
+	def spawn(self, entity_class, count, **component_data):
+		"""Queue the bulk creation of entities, see :meth:`World.spawn`"""
+		self._commands.append(
+			(self._spawn, (entity_class, count, component_data)))
+	
+	def delete(self, entity):
+		"""Queue the deletion of an entity. Consecutive deletions are
+		applied together.
+		"""
+		self._commands.append((self._delete, entity))
+	
+	def set(self, entity, component_name, data=None, **data_kw):
+		"""Queue setting the data for an entity in the named component,
+		see :meth:`grease.component.Component.set`
+		"""
+		self._commands.append(
+			(self._set, (entity, component_name, data, data_kw)))
+	
+	def remove(self, entity, component_name):
+		"""Queue the removal of an entity from the named component"""
+		self._commands.append((self._remove, (entity, component_name)))
+
+	def clear(self):
+		"""Discard all queued commands"""
+		del self._commands[:]
+
+	def apply(self):
+		"""Apply all queued commands and clear the queue. Commands
+		queued while applying are also applied.
+		"""
+		delete = self._delete
+		while self._commands:
+			commands = self._commands
+			self._commands = []
+			deleted = []
+			for command, args in commands:
+				if command == delete:
+					deleted.append(args)
+				else:
+					if deleted:
+						delete(deleted)
+						deleted = []
+					command(args)
+			if deleted:
+				delete(deleted)
+
+	def _create(self, args):
+		entity_class, args, kw = args
+		entity_class(self.world, *args, **kw)
+	
+	def _spawn(self, args):
+		entity_class, count, component_data = args
+		self.world.spawn(entity_class, count, **component_data)
+	
+	def _delete(self, entities):
+		discard = self.world.entities.discard
+		for entity in entities:
+			discard(entity)
+	
+	def _set(self, args):
+		entity, component_name, data, data_kw = args
+		if entity in self.world.entities:
+			component = getattr(self.world.components, component_name)
+			component.set(entity, data, **data_kw)
+	
+	def _remove(self, args):
+		entity, component_name = args
+		component = getattr(self.world.components, component_name)
+		component.remove(entity)
+
+
+class Prefab(object):
+	"""Template for creating entities of a class with preset component
+	data. Prefabs are created with :meth:`World.add_prefab`.
+
+	:raises ComponentError: If a component or field of the template
+		does not exist.
+	"""
+
+	entity_class = None
+	"""The entity class of the entities created"""
+
+	def __init__(self, world, entity_class, shared=(), **component_data):
+		self.world = world
+		self.entity_class = entity_class
+		self._templates = []
+		shared_fields = {}
+		for path in shared:
+			component_name, field_name = path.split('.')
+			shared_fields.setdefault(component_name, []).append(field_name)
+		for component_name, values in component_data.items():
+			try:
+				component = getattr(world.components, component_name)
+			except AttributeError:
+				raise ComponentError('No component named %s' % component_name)
+			template = {}
+			for field_name, value in values.items():
+				if field_name not in component.fields:
+					raise ComponentError('No field %s in component %s' 
+						% (field_name, component_name))
+				template[field_name] = component.fields[field_name].cast(value)
+			self._templates.append((component_name, component, template, 
+				tuple(shared_fields.pop(component_name, ()))))
+		if shared_fields:
+			raise ComponentError('Shared fields not in template: %s' 
+				% ', '.join(sorted(shared_fields)))
+
+	def spawn(self, count=1, **component_data):
+		"""Create entities from the template. Like :meth:`World.spawn`,
+		the entity class's :meth:`__init__` method is not called.
+
+		:param count: The number of entities to create.
+
+		:param component_data: Keyword arguments naming components, each
+			with a dict mapping field names to sequences of values, one
+			per entity, that override the template values.
+
+		:return: A list of the new entities.
+		"""
+		entities = self.world.spawn(self.entity_class, count)
+		for name, component, template, shared in self._templates:
+			columns = component_data.pop(name, None)
+			if columns:
+				component.set_many(entities, 
+					types.SimpleNamespace(**template), **columns)
+			else:
+				component.set_template(entities, template, shared)
+		for name, columns in component_data.items():
+			getattr(self.world.components, name).set_many(entities, **columns)
+		return entities
+
+	def create(self, **component_data):
+		"""Create a single entity from the template, overriding
+		template values with any keyword arguments mapping component 
+		names to dicts of field values.
+		"""
+		columns = dict((name, dict((field, [value]) 
+			for field, value in values.items()))
+			for name, values in component_data.items())
+		return self.spawn(1, **columns)[0]
+
+
 class WorldEntitySet(set):
-	"""Entity set for a :class:`World`"""
+	"""Entity set for a :class:`World`
+	
+	The set tracks which components each entity belongs to as a bitmask,
+	so deleting an entity only needs to touch those components. Components
+	that cannot report their membership (i.e., that do not implement
+	``track_membership()``) are checked for every entity deleted.
+	"""
 
 	def __init__(self, world):
 		self.world = world
+		self._masks = {}
+		self._tracked = {}
+		self._bits = {}
+		self._untracked = []
+		self._class_extents = {}
+		self._views = {}
+		self._bit_views = {}
+		self._joins = {}
+		self._by_index = []
+	
+	def by_index(self, index):
+		"""Return the entity with the id index specified, or None if
+		there is no such entity in the set. See 
+		:func:`grease.entity.entity_index`.
+		"""
+		by_index = self._by_index
+		if index < len(by_index):
+			return by_index[index]
+		return None
+
+	def _index_entities(self, entities):
+		"""Add entities to the index by entity id index"""
+		by_index = self._by_index
+		for entity in entities:
+			index = entity.entity_id & ENTITY_INDEX_MASK
+			if index >= len(by_index):
+				by_index.extend([None] * (index + 1 - len(by_index)))
+			by_index[index] = entity
+
+	def _extents_for(self, entity_class):
+		"""Return the list of extent entity sets that entities of the
+		given class belong to
+		"""
+		try:
+			return self._class_extents[entity_class]
+		except KeyError:
+			extents = self._class_extents[entity_class] = [
+				self.world[cls].entities for cls in entity_class.__mro__
+				if issubclass(cls, Entity)]
+			for key, extent in list(self.world._extents.items()):
+				if isinstance(key, tuple) and issubclass(entity_class, key):
+					extents.append(extent.entities)
+			return extents
 	
+	def extents_changed(self):
+		"""Called when a union extent is added to the world"""
+		self._class_extents.clear()
+	
+	def view(self, entities, component):
+		"""Return a :class:`ComponentView` of the entities of an extent 
+		that are also in the component specified. The view is cached and
+		updated as entities are added to or removed from the component.
+
+		Return None if the component does not track its membership.
+		"""
+		bit = self._bits.get(id(component))
+		if bit is None:
+			return None
+		key = (id(entities), bit)
+		try:
+			return self._views[key]
+		except KeyError:
+			view = self._views[key] = ComponentView(
+				component, entities & component.entities)
+			self._bit_views.setdefault(bit, []).append((entities, view))
+			return view
+
+	def join_view(self, components):
+		"""Return the entities in all of the components specified as a
+		dict with the entities as keys. The dict is cached and updated as
+		entities are added to or removed from the components.
+
+		Return None if any of the components do not track their membership.
+		"""
+		mask = 0
+		for component in components:
+			bit = self._bits.get(id(component))
+			if bit is None:
+				return None
+			mask |= bit
+		try:
+			return self._joins[mask]
+		except KeyError:
+			components = sorted(components, key=lambda comp: len(comp.entities))
+			others = [comp.entities for comp in components[1:]]
+			view = self._joins[mask] = dict.fromkeys(
+				entity for entity in components[0].entities 
+				if all(entity in entities for entities in others))
+			return view
+	
+	def track(self, component):
+		"""Start tracking entity membership for a world component.
+		Components that support it are assigned a bit in the membership 
+		mask of each entity.
+		"""
+		if hasattr(component, 'track_membership'):
+			bit = 1
+			while bit in self._tracked:
+				bit <<= 1
+			self._tracked[bit] = component
+			self._bits[id(component)] = bit
+			masks = self._masks
+			for entity in component.entities:
+				if entity in masks:
+					masks[entity] |= bit
+			component.track_membership(self, bit)
+		else:
+			self._untracked.append(component)
+	
+	def untrack(self, component):
+		"""Stop tracking entity membership for a world component"""
+		for bit, tracked in list(self._tracked.items()):
+			if tracked is component:
+				del self._tracked[bit]
+				del self._bits[id(component)]
+				self._bit_views.pop(bit, None)
+				for key in list(self._views):
+					if key[1] == bit:
+						del self._views[key]
+				for mask in list(self._joins):
+					if mask & bit:
+						del self._joins[mask]
+				component.track_membership(None, 0)
+				masks = self._masks
+				for entity in masks:
+					masks[entity] &= ~bit
+				return
+		for i, untracked in enumerate(self._untracked):
+			if untracked is component:
+				del self._untracked[i]
+				return
+	
+	def component_added(self, entity, bit):
+		"""Called by a tracked component when an entity is added to it"""
+		masks = self._masks
+		if entity in masks:
+			mask = masks[entity] = masks[entity] | bit
+			views = self._bit_views.get(bit)
+			if views:
+				for entities, view in views:
+					if entity in entities:
+						set.add(view, entity)
+			if self._joins:
+				for join_mask, joined in self._joins.items():
+					if join_mask & bit and mask & join_mask == join_mask:
+						joined[entity] = None
+
+	def component_removed(self, entity, bit):
+		"""Called by a tracked component when an entity is removed from it"""
+		masks = self._masks
+		old_mask = masks.get(entity)
+		if old_mask is not None:
+			masks[entity] = old_mask & ~bit
+		views = self._bit_views.get(bit)
+		if views:
+			for entities, view in views:
+				set.discard(view, entity)
+		if self._joins:
+			for join_mask, joined in self._joins.items():
+				if join_mask & bit:
+					joined.pop(entity, None)
+
 	def add(self, entity):
 		"""Add the entity to the set and all necessary class sets
 		Return the unique entity id for the entity, creating one
 		as needed.
 		"""
 		super(WorldEntitySet, self).add(entity)
-		for cls in entity.__class__.__mro__:
-			if issubclass(cls, Entity):
-				self.world[cls].entities.add(entity)
+		if entity not in self._masks:
+			self._masks[entity] = 0
+			self._index_entities((entity,))
+		for entities in self._extents_for(entity.__class__):
+			entities.add(entity)
+
+	def add_many(self, entities):
+		"""Add a sequence of entities of the same class to the set and 
+		class sets at once
+		"""
+		if entities:
+			self.update(entities)
+			masks = self._masks
+			new = [entity for entity in entities if entity not in masks]
+			masks.update(dict.fromkeys(new, 0))
+			self._index_entities(new)
+			for extent_entities in self._extents_for(entities[0].__class__):
+				extent_entities.update(entities)
 
 	def remove(self, entity):
 		"""Remove the entity from the set and, world components,
 		and all necessary class sets
 		"""
 		super(WorldEntitySet, self).remove(entity)
-		for component in self.world.components:
+		mask = self._masks.pop(entity, 0)
+		tracked = self._tracked
+		while mask:
+			bit = mask & -mask
+			tracked[bit].remove(entity)
+			mask ^= bit
+		for component in self._untracked:
 			try:
 				del component[entity]
 			except KeyError:
 				pass
-		for cls in entity.__class__.__mro__:
-			if issubclass(cls, Entity):
-				self.world[cls].entities.discard(entity)
+		for entities in self._extents_for(entity.__class__):
+			entities.discard(entity)
+		self._by_index[entity.entity_id & ENTITY_INDEX_MASK] = None
+		self.world.release_entity(entity)
 	
 	def discard(self, entity):
 		"""Remove the entity from the set if it exists, if not,
@@ -264,11 +848,42 @@ class EntityExtent(object):
 
 		Returns a set of entities where the value of the :attr:`velocity` field
 		of the :attr:`movement` component is greater than ``(0, 0)``.
+
+		For world components, the set returned is a cached 
+		:class:`ComponentView` that is kept up to date as entities are
+		added and removed, and is read-only.
 		"""
 		component = getattr(self.__world.components, name)
+		view = self.__world.entities.view(self.entities, component)
+		if view is not None:
+			return view
 		return ComponentEntitySet(component, self.entities & component.entities)
 
 
+class ComponentView(ComponentEntitySet):
+	"""Cached set of the entities of an extent in a component, see
+	:meth:`EntityExtent.__getattr__`. Iterating the view iterates a snapshot
+	of its entities, so entities may be safely created or deleted while
+	iterating it.
+
+	Views are shared by all callers, so they are read-only. Set operations 
+	on a view return new sets, and methods that would modify the view in
+	place raise :class:`TypeError`. The world updates views with the
+	:class:`set` methods directly.
+	"""
+
+	def __iter__(self):
+		return iter(list(set.__iter__(self)))
+
+	def _read_only(self, *args):
+		raise TypeError('%s is read-only' % self.__class__.__name__)
+	
+	add = discard = remove = pop = clear = update = _read_only
+	difference_update = intersection_update = _read_only
+	symmetric_difference_update = _read_only
+	__ior__ = __iand__ = __isub__ = __ixor__ = _read_only
+
+
 class Parts(object):
 	"""Maps world parts to attributes. The parts are kept in the
 	order they are set. Parts may also be inserted out of order.
@@ -301,7 +916,9 @@ class Parts(object):
 			else:
 				old_part = getattr(self, name)
 				self._parts[self._parts.index(old_part)] = part
+				self._part_removed(old_part)
 			super(Parts, self).__setattr__(name, part)
+			self._part_added(name, part)
 			if hasattr(part, 'set_world'):
 				part.set_world(self._world)
 		elif name.startswith("_"):
@@ -314,6 +931,7 @@ class Parts(object):
 		part = getattr(self, name)
 		self._parts.remove(part)
 		super(Parts, self).__delattr__(name)
+		self._part_removed(part)
 
 	def insert(self, name, part, before=None, index=None):
 		"""Add a part with a particular name at a particular index.
@@ -343,11 +961,19 @@ class Parts(object):
 		if hasattr(self, name):
 			old_part = getattr(self, name)
 			self._parts.remove(old_part)
+			self._part_removed(old_part)
 		self._parts.insert(index, part)
 		super(Parts, self).__setattr__(name, part)
+		self._part_added(name, part)
 		if hasattr(part, 'set_world'):
 			part.set_world(self._world)
 
+	def _part_added(self, name, part):
+		"""Hook called after a part is added"""
+	
+	def _part_removed(self, part):
+		"""Hook called after a part is removed or replaced"""
+
 	def __iter__(self):
 		"""Iterate the parts in order"""
 		return iter(tuple(self._parts))
@@ -363,7 +989,14 @@ class ComponentParts(Parts):
 	Used for: :attr:`World.components`
 	"""
 
-	def join(self, *component_names):
+	def _part_added(self, name, part):
+		self._world.entities.track(part)
+		ComponentAttribute.install(name)
+	
+	def _part_removed(self, part):
+		self._world.entities.untrack(part)
+
+	def join(self, *component_names, optional=()):
 		"""Join and iterate entity data from multiple components together.
 
 		For each entity in all of the components named, yield a tuple containing
@@ -375,16 +1008,89 @@ class ComponentParts(Parts):
 
 			for position, movement in world.components.join("position", "movement"):
 				# Do something with each entity's position and movement data
+
+		:param optional: A sequence of additional component names to
+			left-join. The entity data for these components are appended 
+			to each tuple yielded, or None where the entity is not in
+			the component.
+
+		The smallest component is scanned first. Joins of world components
+		are cached and updated as entities are added and removed from the
+		components, so repeating a join costs only the iteration. Entities
+		may be safely created and deleted while iterating a join.
 		"""
 		if component_names:
 			components = [getattr(self, self._validate_name(name)) 
 				for name in component_names]
-			if len(components) > 1:
-				entities = components[0].entities & components[1].entities
-				for comp in components[2:]:
-					entities &= comp.entities
+			optional = [getattr(self, self._validate_name(name)) 
+				for name in optional]
+			entities = self._join_entities(components)
+			columns = [_get_many(comp, entities) for comp in components]
+			for comp in optional:
+				get = comp.get
+				columns.append([get(entity) for entity in entities])
+			for data in zip(*columns):
+				yield data
+
+	def join_rows(self, *component_names):
+		"""Join entities in multiple components, and return the entities
+		and the storage rows of their data in each component. This is 
+		useful for vectorized processing of columnar components,
+		see :meth:`grease.component.ColumnarComponent.array`.
+
+		:return: A tuple of the list of entities joined and a list with
+			a sequence of row indexes for each component named, in the
+			same order as the entities. The row index sequences are
+			NumPy arrays if NumPy is installed, otherwise lists.
+		"""
+		components = [getattr(self, self._validate_name(name)) 
+			for name in component_names]
+		entities = self._join_entities(components) if components else []
+		rows = [[comp.row(entity) for entity in entities] 
+			for comp in components]
+		if numpy is not None:
+			rows = [numpy.array(comp_rows, dtype=numpy.intp) 
+				for comp_rows in rows]
+		return entities, rows
+	
+	def join_ids(self, *component_names):
+		"""Return the ids of the entities in all of the components named.
+		This avoids creating tuples of entity data for bulk processing.
+		See also :meth:`join_rows`.
+
+		:return: A NumPy integer array if NumPy is installed, otherwise 
+			a list.
+		"""
+		components = [getattr(self, self._validate_name(name)) 
+			for name in component_names]
+		entities = self._join_entities(components) if components else []
+		ids = [entity.entity_id for entity in entities]
+		if numpy is not None:
+			return numpy.array(ids, dtype=numpy.int64)
+		return ids
+	
+	def _join_entities(self, components):
+		"""Return a list of the entities in all of the components"""
+		if len(components) == 1:
+			return list(components[0].entities)
+		view = self._world.entities.join_view(components)
+		if view is not None:
+			return list(view)
+		components = sorted(components, key=lambda comp: len(comp.entities))
+		others = [comp.entities for comp in components[1:]]
+		joined = []
+		for entity in components[0].entities:
+			for entities in others:
+				if entity not in entities:
+					break
 			else:
-				entities = components[0].entities
-			for entity in entities:
-				yield tuple(comp[entity] for comp in components)
+				joined.append(entity)
+		return joined
+
 
+def _get_many(component, entities):
+	"""Return a list of the component data of the entities"""
+	get_many = getattr(component, 'get_many', None)
+	if get_many is not None:
+		return get_many(entities)
+	return [component[entity] for entity in entities]
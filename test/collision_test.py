@@ -7,7 +7,7 @@ class TestCollisionComp(dict):
 		self.deleted_entities = set()
 
 	def set(self, entity, left=0, bottom=0, right=0, top=0, radius=0,
-		from_mask=0xffffffff, into_mask=0xffffffff,):
+		from_mask=0xffffffff, into_mask=0xffffffff, static=False):
 		if entity in self:
 			data = self[entity]
 		else:
@@ -17,6 +17,7 @@ class TestCollisionComp(dict):
 		data.radius = radius
 		data.from_mask = from_mask
 		data.into_mask = into_mask
+		data.static = static
 		return entity
 	
 class TestPositionComp(dict):
@@ -109,17 +110,19 @@ class PairTestCase(unittest.TestCase):
 
 class BroadSweepAndPruneTestCase(unittest.TestCase):
 
+	def broad_phase(self):
+		from grease.collision import BroadSweepAndPrune
+		return BroadSweepAndPrune()
+
 	def test_before_step(self):
 		# Queries should be well behaved even before the controller is run
-		from grease.collision import BroadSweepAndPrune
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		self.assertEqual(coll.collision_pairs, set())
 		self.assertEqual(coll.query_point(0,0), set())
 	
 	def test_collision_pairs_no_collision(self):
-		from grease.collision import BroadSweepAndPrune
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		set_entity = world.collision.set
 		set_entity(1, 10, 10, 20, 20)
 		set_entity(2, 0, 0, 3, 3)
@@ -138,9 +141,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 			"%r not found, %r not expected" % (tuple(pairs - set1), tuple(set1 - pairs)))
 	
 	def test_collision_pairs_static_collision(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -168,9 +171,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertEqual(coll.collision_pairs, pairs)
 	
 	def test_collision_pairs_no_collide_then_collide(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -206,9 +209,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertPairs(coll.collision_pairs, Pair(1,3))
 	
 	def test_collision_pairs_new_entities(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -236,9 +239,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertPairs(coll.collision_pairs, Pair(1,3), Pair(4,5))
 	
 	def test_collision_pairs_deleted_entities(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -263,9 +266,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertPairs(coll.collision_pairs, Pair(4,2))
 	
 	def test_collision_pairs_with_masks(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -279,9 +282,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 			Pair(1,3), Pair(1,5), Pair(2,3), Pair(2,5), Pair(3,1), Pair(3,5))
 
 	def test_query_point(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 
@@ -328,9 +331,9 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertEqual(coll.query_point(-200, 100), set())
 	
 	def test_query_point_with_mask(self):
-		from grease.collision import BroadSweepAndPrune, Pair
+		from grease.collision import Pair
 		world = TestWorld()
-		coll = BroadSweepAndPrune()
+		coll = self.broad_phase()
 		coll.set_world(world)
 		set_entity = world.collision.set
 		
@@ -347,6 +350,293 @@ class BroadSweepAndPruneTestCase(unittest.TestCase):
 		self.assertEqual(coll.query_point(1, 1, from_mask=8), set())
 
 
+class BroadSweepAndPruneArrayTestCase(BroadSweepAndPruneTestCase):
+
+	def broad_phase(self):
+		from grease import collision
+		if collision.numpy is None:
+			self.skipTest("NumPy not installed")
+		return collision.BroadSweepAndPruneArray()
+	
+	def test_pair_arrays(self):
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		first, second = coll.pair_ids()
+		self.assertEqual(len(first), 0)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 2, 2)
+		set_entity(2, 1, 1, 3, 3)
+		set_entity(3, 2.5, 0, 4, 0.5)
+		set_entity(4, 5, 0, 6, 1)
+		coll.step(0)
+		first, second = coll.pair_ids()
+		self.assertEqual([set(pair) for pair in zip(first.tolist(), second.tolist())],
+			[set([1, 2])])
+		first, second = coll.pair_indexes()
+		self.assertEqual([set((coll.entities[i], coll.entities[j])) 
+			for i, j in zip(first, second)], [set([1, 2])])
+
+	def test_sort_order_kept(self):
+		from grease.collision import Pair
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		for i in range(20):
+			set_entity(i, i, 0, i + 1.5, 1)
+		coll.step(0)
+		expected = set(Pair(i, i + 1) for i in range(19))
+		self.assertEqual(coll.collision_pairs, expected)
+		# Reverse the x order and delete some
+		for i in range(20):
+			set_entity(i, -i, 0, -i + 1.5, 1)
+		world.collision.deleted_entities.update([0, 7])
+		coll.step(0)
+		expected = set(Pair(i, i + 1) for i in range(1, 19) if i not in (6, 7))
+		self.assertEqual(coll.collision_pairs, expected)
+		world.collision.deleted_entities.clear()
+		set_entity(20, -3.2, 0, -2.9, 1)
+		world.collision.new_entities.add(20)
+		coll.step(0)
+		self.assertEqual(coll.collision_pairs, expected | set([Pair(20, 3), Pair(20, 4)]))
+
+
+class BroadSpatialHashTestCase(BroadSweepAndPruneTestCase):
+
+	def broad_phase(self):
+		from grease.collision import BroadSpatialHash
+		return BroadSpatialHash(cell_size=2.5)
+	
+	def test_large_cells(self):
+		from grease.collision import BroadSpatialHash, Pair
+		world = TestWorld()
+		coll = BroadSpatialHash(cell_size=100)
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 2, 2)
+		set_entity(2, 1, 1, 3, 3)
+		set_entity(3, 99, 99, 101, 101)
+		set_entity(4, 100, 100, 102, 102)
+		coll.step(0)
+		self.assertPairs(coll.collision_pairs, Pair(1,2), Pair(3,4))
+	
+	def test_rehash_moved(self):
+		from grease.collision import Pair
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 1, 1)
+		set_entity(2, 20, 20, 21, 21)
+		coll.step(0)
+		self.assertEqual(coll.collision_pairs, set())
+		self.assertEqual(coll.query_point(20.5, 20.5), set([2]))
+		# Teleport into collision
+		set_entity(2, 0.5, 0.5, 1.5, 1.5)
+		coll.step(0)
+		self.assertPairs(coll.collision_pairs, Pair(1,2))
+		self.assertEqual(coll.query_point(20.5, 20.5), set())
+		self.assertEqual(coll.query_point(1, 1), set([1, 2]))
+		set_entity(2, 30, 0.5, 31, 1.5)
+		coll.step(0)
+		self.assertEqual(coll.collision_pairs, set())
+		self.assertEqual(len(coll._cells), 2)
+	
+	def test_query_rect(self):
+		from grease.geometry import Rect
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 1, 1, into_mask=1)
+		set_entity(2, 5, 5, 6, 6, into_mask=2)
+		set_entity(3, 10, 0, 20, 1, into_mask=3)
+		self.assertEqual(coll.query_rect(0, 0, 100, 100), set())
+		coll.step(0)
+		self.assertEqual(coll.query_rect(0, 0, 100, 100), set([1, 2, 3]))
+		self.assertEqual(coll.query_rect(Rect(1, 1, 5, 5)), set([1, 2]))
+		self.assertEqual(coll.query_rect(Rect(1.1, 1.1, 4.9, 4.9)), set())
+		self.assertEqual(coll.query_rect(14, -1, 15, 0.5), set([3]))
+		self.assertEqual(coll.query_rect(-10, -10, 100, 100, from_mask=2), 
+			set([2, 3]))
+
+
+class BroadAABBTreeTestCase(BroadSweepAndPruneTestCase):
+
+	def broad_phase(self):
+		from grease.collision import BroadAABBTree
+		return BroadAABBTree(margin=0.5)
+	
+	def assertBalanced(self, node):
+		if node.child1 is None:
+			self.assertEqual(node.height, 0)
+			return
+		self.assertTrue(node.child1.parent is node)
+		self.assertTrue(node.child2.parent is node)
+		self.assertEqual(node.height, 
+			1 + max(node.child1.height, node.child2.height))
+		self.assertTrue(abs(node.child1.height - node.child2.height) <= 1)
+		for child in (node.child1, node.child2):
+			self.assertTrue(node.box[0] <= child.box[0] and node.box[1] <= child.box[1]
+				and child.box[2] <= node.box[2] and child.box[3] <= node.box[3])
+			self.assertBalanced(child)
+	
+	def test_balanced(self):
+		from grease.collision import Pair
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		for i in range(128):
+			set_entity(i, i * 2, 0, i * 2 + 1, 1)
+		coll.step(0)
+		self.assertBalanced(coll._root)
+		self.assertTrue(coll.height <= 10, coll.height)
+		self.assertEqual(coll.collision_pairs, set())
+		world.collision.deleted_entities.update(range(0, 128, 3))
+		for i in range(1, 128, 3):
+			set_entity(i, i * 2 + 1, 0, i * 2 + 2, 1)
+		coll.step(0)
+		self.assertBalanced(coll._root)
+		self.assertEqual(len(coll.collision_pairs), 42)
+	
+	def test_fat_bounds(self):
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 1, 1)
+		set_entity(2, 5, 5, 6, 6)
+		coll.step(0)
+		leaf = coll._leaves[1]
+		self.assertEqual(leaf.box, (-0.5, -0.5, 1.5, 1.5))
+		# A small move stays within the fat box
+		set_entity(1, 0.4, -0.2, 1.4, 0.8)
+		coll.step(0)
+		self.assertEqual(leaf.box, (-0.5, -0.5, 1.5, 1.5))
+		self.assertEqual(coll.query_point(0.2, 0.5), set())
+		self.assertEqual(coll.query_point(1.3, 0.5), set([1]))
+		set_entity(1, 0.75, 0, 1.75, 1)
+		coll.step(0)
+		self.assertEqual(leaf.box, (0.25, -0.5, 2.25, 1.5))
+
+	def test_query_rect(self):
+		from grease.geometry import Rect
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 1, 1, into_mask=1)
+		set_entity(2, 5, 5, 6, 6, into_mask=2)
+		set_entity(3, 10, 0, 20, 1, into_mask=3)
+		self.assertEqual(coll.query_rect(0, 0, 100, 100), set())
+		coll.step(0)
+		self.assertEqual(coll.query_rect(0, 0, 100, 100), set([1, 2, 3]))
+		self.assertEqual(coll.query_rect(Rect(1, 1, 5, 5)), set([1, 2]))
+		self.assertEqual(coll.query_rect(Rect(1.1, 1.1, 4.9, 4.9)), set())
+		self.assertEqual(coll.query_rect(14, -1, 15, 0.5), set([3]))
+		self.assertEqual(coll.query_rect(-10, -10, 100, 100, from_mask=2), 
+			set([2, 3]))
+	
+	def test_query_ray(self):
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		self.assertEqual(coll.query_ray((0, 0), (1, 1)), [])
+		set_entity(1, 0, 0, 2, 2, into_mask=1)
+		set_entity(2, 4, 0, 6, 2, into_mask=2)
+		set_entity(3, 8, -1, 10, 0.5, into_mask=1)
+		set_entity(4, 4, 4, 6, 6, into_mask=1)
+		coll.step(0)
+		self.assertEqual(coll.query_ray((-10, 1), (10, 1)), [(0.5, 1), (0.7, 2)])
+		self.assertEqual(coll.query_ray((10, 0), (-10, 0)), 
+			[(0.0, 3), (0.2, 2), (0.4, 1)])
+		self.assertEqual(coll.query_ray((1, 1), (5, 5)), [(0.0, 1), (0.75, 4)])
+		self.assertEqual(coll.query_ray((-10, 1), (10, 1), from_mask=2), [(0.7, 2)])
+		self.assertEqual(coll.query_ray((-10, 1), (-5, 1)), [])
+		self.assertEqual(coll.query_ray((5, 3), (5, 3.5)), [])
+
+
+class BroadPartitionedTestCase(BroadAABBTreeTestCase):
+
+	def broad_phase(self):
+		from grease.collision import BroadPartitioned
+		# Sleep as soon as possible to test sleeping entities
+		return BroadPartitioned(margin=0.5, sleep_steps=1)
+	
+	def test_balanced(self):
+		from grease.collision import BroadPartitioned
+		self.broad_phase = lambda: BroadPartitioned(margin=0.5, sleep_steps=0)
+		BroadAABBTreeTestCase.test_balanced(self)
+	
+	def test_fat_bounds(self):
+		from grease.collision import BroadPartitioned
+		self.broad_phase = lambda: BroadPartitioned(margin=0.5, sleep_steps=0)
+		BroadAABBTreeTestCase.test_fat_bounds(self)
+	
+	def test_static_entities(self):
+		from grease.collision import Pair
+		world = TestWorld()
+		coll = self.broad_phase()
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 10, 1, static=True)
+		set_entity(2, 5, 0, 15, 1, static=True)
+		set_entity(3, 2, 0.5, 3, 1.5)
+		set_entity(4, 20, 20, 21, 21)
+		coll.step(0)
+		self.assertTrue(coll.is_static(1))
+		self.assertFalse(coll.is_sleeping(1))
+		self.assertFalse(coll.is_static(3))
+		self.assertPairs(coll.collision_pairs, Pair(1,3))
+		# Static boxes are not read again
+		set_entity(1, 20, 20, 21, 21, static=True)
+		set_entity(3, 6, 0.5, 7, 1.5)
+		coll.step(0)
+		self.assertPairs(coll.collision_pairs, Pair(1,3), Pair(2,3))
+		self.assertEqual(coll.query_point(20.5, 20.5), set([4]))
+		self.assertEqual(coll.query_point(0.5, 0.5), set([1]))
+		self.assertEqual([hit[1] for hit in coll.query_ray((-1, 0.9), (30, 0.9))],
+			[1, 2, 3])
+		coll.wake(1)
+		coll.step(0)
+		self.assertFalse(coll.is_static(1))
+		self.assertPairs(coll.collision_pairs, Pair(2,3), Pair(1,4))
+	
+	def test_sleep_and_wake(self):
+		from grease.collision import BroadPartitioned, Pair
+		world = TestWorld()
+		coll = BroadPartitioned(sleep_steps=2)
+		coll.set_world(world)
+		set_entity = world.collision.set
+		set_entity(1, 0, 0, 10, 1, static=True)
+		set_entity(2, 2, 1, 3, 2)
+		set_entity(3, 2.5, 1.5, 3.5, 2.5)
+		coll.step(0)
+		self.assertPairs(coll.collision_pairs, Pair(1,2), Pair(2,3))
+		coll.step(0)
+		self.assertFalse(coll.is_sleeping(2))
+		coll.step(0)
+		self.assertTrue(coll.is_sleeping(2))
+		self.assertTrue(coll.is_sleeping(3))
+		self.assertPairs(coll.collision_pairs, Pair(1,2), Pair(2,3))
+		coll.step(0)
+		self.assertPairs(coll.collision_pairs, Pair(1,2), Pair(2,3))
+		# Moving wakes the entity
+		set_entity(3, 12, 1.5, 13, 2.5)
+		coll.step(0)
+		self.assertFalse(coll.is_sleeping(3))
+		self.assertTrue(coll.is_sleeping(2))
+		self.assertPairs(coll.collision_pairs, Pair(1,2))
+		# Deleting a sleeping entity removes its pairs
+		world.collision.deleted_entities.add(2)
+		coll.step(0)
+		self.assertEqual(coll.collision_pairs, set())
+		self.assertFalse(coll.is_static(2))
+
+
 class CircularTestCase(unittest.TestCase):
 
 	def test_defaults(self):
@@ -458,6 +748,30 @@ class CircularTestCase(unittest.TestCase):
 		self.assertEqual(col[2].aabb, Data(left=-0.5, top=0.5, right=0.5, bottom=-0.5))
 		self.assertEqual(col[3].aabb, Data(left=-10, top=3, right=0, bottom=-7))
 	
+	def test_update_static_aabbs(self):
+		from grease.collision import Circular
+		broad = TestCollisionSys()
+		world = TestWorld()
+		coll = Circular(broad_phase=broad)
+		coll.set_world(world)
+		pos = world.position
+		col = world.collision
+		pos.set(1, (0, 0))
+		col.set(1, radius=2, static=True)
+		pos.set(2, (2, -3))
+		col.set(2, radius=0.5)
+		col.new_entities.update([1, 2])
+		coll.step(0)
+		self.assertEqual(col[1].aabb, Data(left=-2, top=2, right=2, bottom=-2))
+		self.assertEqual(col[2].aabb, Data(left=1.5, top=-2.5, right=2.5, bottom=-3.5))
+		col.new_entities.clear()
+		pos.set(1, (2, 0))
+		pos.set(2, (0, 0))
+		coll.step(0)
+		# Static entity aabbs are only updated when they are added
+		self.assertEqual(col[1].aabb, Data(left=-2, top=2, right=2, bottom=-2))
+		self.assertEqual(col[2].aabb, Data(left=-0.5, top=0.5, right=0.5, bottom=-0.5))
+	
 	
 	def test_collision_pairs(self):
 		from grease.collision import Circular, Pair
@@ -486,6 +800,89 @@ class CircularTestCase(unittest.TestCase):
 		coll.step(0)
 		self.assertEqual(coll.collision_pairs, set([Pair(1,2), Pair(1, 3), Pair(4, 5)]))
 	
+	def test_contact_pairs(self):
+		from grease.collision import Circular, Pair
+		broad = TestCollisionSys()
+		world = TestWorld()
+		coll = Circular(broad_phase=broad)
+		coll.set_world(world)
+		pos_set = world.position.set
+		col_set = world.collision.set
+		for entity in range(1, 5):
+			pos_set(entity, (entity * 3, 0))
+			col_set(entity, radius=2)
+		broad.collision_pairs = set([Pair(1, 2), Pair(2, 3), Pair(3, 4)])
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set([Pair(1, 2), Pair(2, 3), Pair(3, 4)]))
+		self.assertEqual(coll.persist_pairs, set())
+		self.assertEqual(coll.end_pairs, set())
+		pair = coll.contacts[Pair(1, 2)]
+
+		# Pairs in contact are reported using the same pair objects
+		pos_set(4, (20, 0))
+		broad.collision_pairs = set([Pair(2, 1), Pair(2, 3), Pair(3, 4)])
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set())
+		self.assertEqual(coll.persist_pairs, set([Pair(1, 2), Pair(2, 3)]))
+		self.assertEqual(coll.end_pairs, set([Pair(3, 4)]))
+		self.assertEqual(coll.collision_pairs, set([Pair(1, 2), Pair(2, 3)]))
+		self.assertTrue(coll.contacts[Pair(1, 2)] is pair)
+		self.assertTrue([p for p in coll.collision_pairs if p == pair][0] is pair)
+		(entity1, point1, normal1), (entity2, point2, normal2) = pair.info
+		self.assertEqual((entity1, entity2), (1, 2))
+		self.assertEqual(tuple(normal1), (1, 0))
+
+		pos_set(2, (5, 0))
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set())
+		self.assertEqual(coll.end_pairs, set())
+		self.assertEqual(tuple(pair.info[0][1]), (5, 0))
+
+		broad.collision_pairs = set([Pair(3, 4)])
+		pos_set(4, (12, 0))
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set([Pair(3, 4)]))
+		self.assertEqual(coll.persist_pairs, set())
+		self.assertEqual(coll.end_pairs, set([Pair(1, 2), Pair(2, 3)]))
+		coll.step(0)
+		self.assertEqual(coll.end_pairs, set())
+		self.assertEqual(coll.persist_pairs, set([Pair(3, 4)]))
+	
+	def test_contacts_of_deleted_entities_removed(self):
+		from grease.collision import Circular, Pair
+		broad = TestCollisionSys()
+		world = TestWorld()
+		coll = Circular(broad_phase=broad)
+		coll.set_world(world)
+		for entity in range(1, 4):
+			world.position.set(entity, (entity * 3, 0))
+			world.collision.set(entity, radius=2)
+		broad.collision_pairs = set([Pair(1, 2), Pair(2, 3)])
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set([Pair(1, 2), Pair(2, 3)]))
+		pair = coll.contacts[Pair(2, 3)]
+		# Entity 3 is deleted, and collision_pairs is not read this step
+		del world.collision[3]
+		del world.position[3]
+		world.collision.deleted_entities = set([3])
+		broad.collision_pairs = set([Pair(1, 2)])
+		coll.step(0)
+		self.assertEqual(list(coll.contacts), [Pair(1, 2)])
+		# Entity 3 is reused for a new entity in contact with entity 2
+		world.collision.deleted_entities = set()
+		world.position.set(3, (8, 0))
+		world.collision.set(3, radius=2)
+		broad.collision_pairs = set([Pair(1, 2), Pair(2, 3)])
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set([Pair(2, 3)]))
+		self.assertEqual(coll.persist_pairs, set([Pair(1, 2)]))
+		self.assertEqual(coll.end_pairs, set([Pair(2, 3)]))
+		self.assertFalse(coll.contacts[Pair(2, 3)] is pair)
+		self.assertTrue([p for p in coll.end_pairs][0] is pair)
+		coll.step(0)
+		self.assertEqual(coll.begin_pairs, set())
+		self.assertEqual(coll.end_pairs, set())
+	
 	def test_collision_point_and_normal(self):
 		from grease.collision import Circular, Pair
 		broad = TestCollisionSys()
@@ -559,6 +956,21 @@ class TestEntity(object):
 		self.collisions.add((other, point, normal))
 
 
+class TestContactEntity(object):
+
+	def __init__(self):
+		self.events = []
+
+	def on_collide_begin(self, other, point, normal):
+		self.events.append(('begin', other))
+
+	def on_collide_persist(self, other, point, normal):
+		self.events.append(('persist', other))
+
+	def on_collide_end(self, other, point, normal):
+		self.events.append(('end', other))
+
+
 class CollisionHandlerTestCase(unittest.TestCase):
 
 	def test_dispatch_events_all_pairs(self):
@@ -632,6 +1044,113 @@ class CollisionHandlerTestCase(unittest.TestCase):
 			set([(entities[0], None, None), (entities[1], None, None)]))
 		self.assertEqual(entities[3].collisions, set())
 
+	def test_dispatch_contact_events(self):
+		from grease.collision import dispatch_contact_events, Circular, Pair
+		world = TestWorld()
+		broad = TestCollisionSys()
+		coll = Circular(broad_phase=broad, handlers=[dispatch_contact_events])
+		coll.set_world(world)
+		entities = []
+		for x, into_mask in [(0, 1), (1, 1), (2, 0)]:
+			entity = world.collision.set(TestContactEntity(), radius=1, into_mask=into_mask)
+			world.position.set(entity, (x, 0))
+			entities.append(entity)
+		a, b, c = entities
+		class NoEventEntity(object):
+			pass
+		d = world.collision.set(NoEventEntity(), radius=1)
+		world.position.set(d, (0, 1))
+		broad.collision_pairs = set([Pair(a, b), Pair(b, c), Pair(a, d)])
+		coll.step(0)
+		self.assertEqual(set(a.events), set([('begin', b), ('begin', d)]))
+		self.assertEqual(set(b.events), set([('begin', a), ('begin', c)]))
+		self.assertEqual(c.events, [])
+		for entity in entities:
+			del entity.events[:]
+
+		coll.step(0)
+		self.assertEqual(set(a.events), set([('persist', b), ('persist', d)]))
+		self.assertEqual(set(b.events), set([('persist', a), ('persist', c)]))
+		self.assertEqual(c.events, [])
+		for entity in entities:
+			del entity.events[:]
+
+		# Contacts end when entities are deleted
+		del world.collision[b]
+		broad.collision_pairs = set([Pair(a, d)])
+		coll.step(0)
+		self.assertEqual(set(a.events), set([('end', b), ('persist', d)]))
+		self.assertEqual(set(b.events), set([('end', a), ('end', c)]))
+		self.assertEqual(c.events, [])
+		for entity in entities:
+			del entity.events[:]
+		coll.step(0)
+		self.assertEqual(a.events, [('persist', d)])
+		self.assertEqual(b.events, [])
+
+
+class SameStepCreateDeleteTestCase(unittest.TestCase):
+	"""Entities created and deleted within one time step are in the
+	collision component's new_entities, but not in the component
+	"""
+
+	def step_created_and_deleted(self, broad_phase, static=False):
+		from grease import World, Entity, component
+		from grease.collision import Circular, Pair
+		world = World()
+		world.components.position = component.Position()
+		world.components.collision = component.Collision()
+		collision = world.systems.collision = Circular(broad_phase=broad_phase)
+		def make_entity():
+			entity = Entity(world)
+			entity.position.position = (0, 0)
+			entity.collision.radius = 1
+			return entity
+		entity1 = make_entity()
+		world.step(0.01)
+		entity2 = make_entity()
+		entity2.collision.static = static
+		entity2.delete()
+		world.step(0.01)
+		world.step(0.01)
+		self.assertEqual(collision.collision_pairs, set())
+		entity3 = make_entity()
+		world.step(0.01)
+		self.assertEqual(collision.collision_pairs, set([Pair(entity1, entity3)]))
+		return entity2
+
+	def test_sweep_and_prune(self):
+		from grease.collision import BroadSweepAndPrune
+		self.step_created_and_deleted(BroadSweepAndPrune())
+
+	def test_sweep_and_prune_array(self):
+		from grease import collision
+		if collision.numpy is None:
+			self.skipTest("NumPy not installed")
+		self.step_created_and_deleted(collision.BroadSweepAndPruneArray())
+
+	def test_spatial_hash(self):
+		from grease.collision import BroadSpatialHash
+		broad_phase = BroadSpatialHash(cell_size=4)
+		self.step_created_and_deleted(broad_phase)
+		self.assertEqual(len(broad_phase._data), 2)
+
+	def test_aabb_tree(self):
+		from grease.collision import BroadAABBTree
+		broad_phase = BroadAABBTree()
+		self.step_created_and_deleted(broad_phase)
+		self.assertEqual(len(broad_phase._leaves), 2)
+
+	def test_partitioned(self):
+		from grease.collision import BroadPartitioned
+		for static in (False, True):
+			broad_phase = BroadPartitioned()
+			deleted = self.step_created_and_deleted(broad_phase, static)
+			self.assertEqual(len(broad_phase._leaves), 2)
+			self.assertFalse(deleted in broad_phase.static_tree._leaves)
+			self.assertFalse(deleted in broad_phase._still)
+			self.assertFalse(deleted in broad_phase._asleep)
+
 
 if __name__ == '__main__':
 	unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import pickle
+
+
+class RGBATestCase(unittest.TestCase):
+
+	def test_create(self):
+		from grease.color import RGBA
+		self.assertEqual(tuple(RGBA(1, 0.5, 0)), (1, 0.5, 0, 1.0))
+		self.assertEqual(tuple(RGBA((0, 1, 0, 0.5))), (0, 1, 0, 0.5))
+		self.assertEqual(tuple(RGBA("#f00")), (1, 0, 0, 1))
+		self.assertEqual(tuple(RGBA("#0000ff80")), (0, 0, 1, 128 / 255.0))
+		self.assertRaises(ValueError, RGBA, "f00")
+		self.assertRaises(ValueError, RGBA, "nocolor")
+
+	def test_named_colors(self):
+		from grease.color import RGBA, NAMED_COLORS
+		self.assertEqual(RGBA("white"), RGBA(1, 1, 1, 1))
+		self.assertEqual(RGBA("Red"), RGBA("#f00"))
+		self.assertEqual(RGBA("transparent").a, 0)
+		for name in NAMED_COLORS:
+			RGBA(name)
+
+	def test_parse_cache(self):
+		from grease.color import parse_color
+		self.assertTrue(parse_color("#123") is parse_color("#123"))
+
+	def test_bytes(self):
+		from grease.color import RGBA
+		color = RGBA(1, 0.5, 0, 1)
+		self.assertEqual(color.bytes, b'\xff\x7f\x00\xff')
+		self.assertTrue(color.bytes is color.bytes)
+		self.assertEqual(color.packed, 0xff7f00ff)
+		color.g = 1.0
+		self.assertEqual(color.bytes, b'\xff\xff\x00\xff')
+		color.a = 2.0
+		color.r = -1
+		self.assertEqual(color.bytes, b'\x00\xff\x00\xff')
+
+	def test_from_packed(self):
+		from grease.color import RGBA
+		color = RGBA.from_packed(0x00ff0080)
+		self.assertEqual(tuple(color), (0, 1, 0, 128 / 255.0))
+		self.assertEqual(color.packed, 0x00ff0080)
+
+	def test_pickle(self):
+		from grease.color import RGBA
+		color = pickle.loads(pickle.dumps(RGBA(0, 0.5, 1, 0.25)))
+		self.assertEqual(color, RGBA(0, 0.5, 1, 0.25))
+
+
+if __name__ == '__main__':
+	unittest.main()
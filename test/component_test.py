@@ -1,4 +1,11 @@
 import unittest
+import operator
+import ctypes
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 world = object()
 
@@ -205,6 +212,650 @@ class GeneralTestCase(unittest.TestCase):
 		self.assertFalse(entity2 in c.entities)
 		self.assertTrue(entity3 in c.entities)
 
+	
+	def test_data_slots(self):
+		from grease.component import Component
+		c = Component(x=float, name=str)
+		c.set_world(world)
+		ed = c.set(TestEntity(), x=2)
+		self.assertFalse(hasattr(ed, '__dict__'))
+		self.assertEqual(ed.x, 2.0)
+		self.assertTrue(isinstance(ed.x, float))
+		ed.name = 42
+		self.assertEqual(ed.name, "42")
+		self.assertRaises(AttributeError, setattr, ed, 'y', 1)
+		self.assertRaises(AttributeError, c.set, TestEntity(), z=1)
+	
+	def test_data_class_per_component(self):
+		from grease.component import Component
+		c1 = Component(x=float)
+		c2 = Component(x=float)
+		c1.set_world(world)
+		c2.set_world(world)
+		e = TestEntity()
+		self.assertTrue(type(c1.set(e)) is type(c1.set(TestEntity())))
+		self.assertFalse(type(c1.set(e)) is type(c2.set(e)))
+	
+	def test_mutable_defaults_not_shared(self):
+		from grease.component import Component
+		from grease.geometry import Vec2d
+		c = Component(pos=Vec2d, stuff=object)
+		c.set_world(world)
+		ed1 = c.set(TestEntity())
+		ed2 = c.set(TestEntity())
+		self.assertFalse(ed1.pos is ed2.pos)
+		ed1.pos.x = 5
+		self.assertEqual(ed2.pos, (0, 0))
+		self.assertEqual(ed1.stuff, None)
+	
+	def test_changed_default(self):
+		from grease.component import Component
+		c = Component(speed=int)
+		c.set_world(world)
+		c.fields['speed'].default = lambda: 7
+		self.assertEqual(c.set(TestEntity()).speed, 7)
+	
+	def test_unchecked_setter(self):
+		from grease.component import Component
+		c = Component(speed=int)
+		c.set_world(world)
+		ed = c.set(TestEntity())
+		set_speed = c.unchecked_setter('speed')
+		set_speed(ed, 12)
+		self.assertEqual(ed.speed, 12)
+
+	
+	def test_removed_data_readable_until_step(self):
+		from grease.component import Component
+		c = Component(x=int)
+		c.set_world(world)
+		e1, e2, e3 = TestEntity(), TestEntity(), TestEntity()
+		c.set(e1, x=1)
+		c.set(e2, x=2)
+		c.set(e3, x=3)
+		c.remove(e1)
+		self.assertEqual(c[e1].x, 1)
+		self.assertEqual(c[e3].x, 3)
+		self.assertEqual(list(c.entities), [e2, e3])
+		self.assertEqual([c.row(e) for e in (e1, e2, e3)], [0, 1, 2])
+		c.step(0)
+		self.assertEqual(list(c.entities), [e3, e2])
+		self.assertRaises(KeyError, c.__getitem__, e1)
+		self.assertEqual(c[e2].x, 2)
+		self.assertEqual(c[e3].x, 3)
+		self.assertEqual(sorted(d.x for d in c.values()), [2, 3])
+	
+	def test_readd_before_step(self):
+		from grease.component import Component
+		c = Component(x=int)
+		c.set_world(world)
+		e1, e2 = TestEntity(), TestEntity()
+		c.set(e1, x=1)
+		c.set(e2, x=2)
+		c.step(0)
+		c.remove(e1)
+		c.set(e1, x=10)
+		c.step(0)
+		self.assertEqual(list(c.deleted_entities), [])
+		self.assertEqual(list(c.new_entities), [e1])
+		self.assertTrue(e1 in c.entities)
+		self.assertEqual(c[e1].x, 10)
+		self.assertEqual(c[e2].x, 2)
+
+	
+	def test_set_many(self):
+		from grease.component import Component
+		from grease.geometry import Vec2d
+		c = Component(x=float, pos=Vec2d, name=str)
+		c.set_world(world)
+		class Data: pass
+		d = Data()
+		d.name = "debris"
+		d.x = 100
+		entities = [TestEntity() for i in range(3)]
+		result = c.set_many(entities, d, x=[1, 2, 3])
+		self.assertEqual(result, [c[e] for e in entities])
+		self.assertEqual(list(c.entities), entities)
+		self.assertEqual(list(c.new_entities), [])
+		self.assertEqual([c[e].x for e in entities], [1.0, 2.0, 3.0])
+		self.assertEqual([c[e].name for e in entities], ["debris"] * 3)
+		self.assertFalse(c[entities[0]].pos is c[entities[1]].pos)
+		c.step(0)
+		self.assertEqual(list(c.new_entities), entities)
+		self.assertRaises(AssertionError, c.set_many, entities, x=[1])
+
+
+class ColumnarTestCase(unittest.TestCase):
+
+	def test_fields(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(f1=int, f2=float, f3=str)
+		self.assertEqual(len(c.fields), 3)
+		self.assertEqual(c.fields['f1'].type, int)
+		self.assertTrue(c.fields['f2'].component is c)
+		self.assertRaises(AssertionError, ColumnarComponent, t=tuple)
+
+	def test_add_kw_data(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(x=float, y=float, name=str, alive=bool)
+		c.set_world(world)
+		entity = TestEntity()
+		self.assertFalse(entity in c)
+		ed = c.set(entity, x=10, y=-1, name="timmy!", alive=1)
+		self.assertTrue(entity in c)
+		self.assertTrue(entity in c.entities)
+		self.assertEqual(ed.x, 10)
+		self.assertEqual(ed.y, -1)
+		self.assertEqual(ed.name, "timmy!")
+		self.assertTrue(ed.alive is True)
+		self.assertTrue(ed.entity is entity)
+		self.assertRaises(AttributeError, setattr, ed, 'bogus', 1)
+	
+	def test_add_with_data_object_and_kw(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(state=str, time=float)
+		c.set_world(world)
+		class Data: pass
+		d = Data()
+		d.state = "grimey"
+		d.time = 12.5
+		entity = TestEntity()
+		ed = c.set(entity, d, state="greasy")
+		self.assertEqual(ed.state, "greasy")
+		self.assertEqual(ed.time, 12.5)
+		other = TestEntity()
+		c.set(other, ed)
+		self.assertEqual(c[other].state, "greasy")
+		self.assertEqual(c[other].time, 12.5)
+
+	def test_data_defaults(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d
+		c = ColumnarComponent(speed=int, accel=Vec2d, state=str)
+		c.fields['speed'].default = lambda: 3
+		c.set_world(world)
+		ed = c.set(TestEntity(), accel=(10,5))
+		self.assertEqual(ed.speed, 3)
+		self.assertEqual(ed.accel, (10,5))
+		self.assertEqual(ed.state, "")
+
+	def test_structured_fields_are_views(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d, Rect
+		from grease.color import RGBA
+		c = ColumnarComponent(pos=Vec2d, box=Rect, color=RGBA)
+		c.set_world(world)
+		entity = TestEntity()
+		ed = c.set(entity, pos=(1, 2), box=Rect(0, 0, 4, 4), color=(1, 0, 0))
+		ed.pos.x = 5
+		ed.pos += (1, 1)
+		ed.box.right = 10
+		ed.color.a = 0.5
+		self.assertEqual(c[entity].pos, (6, 3))
+		self.assertEqual(c[entity].box.right, 10)
+		self.assertEqual(c[entity].box.width, 10)
+		self.assertEqual(c[entity].color, RGBA(1, 0, 0, 0.5))
+		ed.color = "#fff"
+		self.assertEqual(c[entity].color, RGBA(1, 1, 1, 1))
+	
+	def test_color_view_bytes(self):
+		from grease.component import ColumnarComponent
+		from grease.color import RGBA
+		c = ColumnarComponent(color=RGBA)
+		c.set_world(world)
+		entity = TestEntity()
+		color = c.set(entity, color=(1, 0, 0, 1)).color
+		self.assertEqual(color.bytes, b'\xff\x00\x00\xff')
+		c.column('color')[c.entities.slot(entity)][1] = 1.0
+		self.assertEqual(color.bytes, b'\xff\xff\x00\xff')
+	
+	def test_growth_preserves_data(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d
+		c = ColumnarComponent(pos=Vec2d, n=int, obj=object)
+		c.set_world(world)
+		entities = [TestEntity() for i in range(100)]
+		for i, e in enumerate(entities):
+			c.set(e, pos=(i, -i), n=i, obj=e)
+		self.assertEqual(len(c), 100)
+		for i, e in enumerate(entities):
+			self.assertEqual(c[e].pos, (i, -i))
+			self.assertEqual(c[e].n, i)
+			self.assertTrue(c[e].obj is e)
+
+	def test_remove_compacts_at_step(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(n=int)
+		c.set_world(world)
+		entities = [TestEntity() for i in range(5)]
+		for i, e in enumerate(entities):
+			c.set(e, n=i)
+		self.assertTrue(c.remove(entities[1]))
+		self.assertFalse(c.remove(entities[1]))
+		self.assertTrue(entities[1] in c)
+		self.assertFalse(entities[1] in c.entities)
+		self.assertEqual(len(c), 5)
+		c.step(0)
+		self.assertEqual(list(c.deleted_entities), [entities[1]])
+		self.assertFalse(entities[1] in c)
+		self.assertEqual(len(c), 4)
+		self.assertRaises(KeyError, lambda: c[entities[1]])
+		self.assertEqual(sorted(c[e].n for e in c), [0, 2, 3, 4])
+		for i, e in enumerate(entities):
+			if i != 1:
+				self.assertEqual(c[e].n, i)
+				self.assertEqual(c.column('n')[c.row(e)], i)
+
+	def test_views_valid_after_remove_until_step(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d
+		c = ColumnarComponent(pos=Vec2d, n=int)
+		c.set_world(world)
+		entities = [TestEntity() for i in range(3)]
+		for i, e in enumerate(entities):
+			c.set(e, pos=(i, i), n=i)
+		pos = c[entities[2]].pos
+		row = c.row(entities[2])
+		c.remove(entities[0])
+		pos.x = 10
+		self.assertEqual(c.row(entities[2]), row)
+		self.assertEqual(c[entities[2]].pos, (10, 2))
+		self.assertEqual(c[entities[1]].pos, (1, 1))
+		self.assertEqual(c[entities[0]].pos, (0, 0))
+		c.step(0)
+		self.assertEqual(c[entities[2]].pos, (10, 2))
+		self.assertEqual(c[entities[1]].n, 1)
+
+	def test_readd_before_step(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(n=int)
+		c.set_world(world)
+		entity = TestEntity()
+		c.set(entity, n=1)
+		c.step(0)
+		c.remove(entity)
+		c.set(entity, n=2)
+		c.step(0)
+		self.assertTrue(entity in c)
+		self.assertEqual(c[entity].n, 2)
+		self.assertEqual(list(c.deleted_entities), [])
+
+	def test_columnar_predefined_component(self):
+		from grease.component import Transform, ColumnarComponent
+		class ColumnarTransform(Transform, ColumnarComponent):
+			pass
+		c = ColumnarTransform()
+		c.set_world(world)
+		ed = c.set(TestEntity(), rotation=90)
+		self.assertEqual(ed.scale, 1.0)
+		self.assertEqual(ed.rotation, 90)
+		self.assertEqual(ed.offset, (0, 0))
+	
+	def test_set_many(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d
+		c = ColumnarComponent(x=float, pos=Vec2d, name=str)
+		c.set_world(world)
+		class Data: pass
+		d = Data()
+		d.name = "debris"
+		d.pos = Vec2d(1, 2)
+		c.set(TestEntity(), x=-1)
+		entities = [TestEntity() for i in range(40)]
+		result = c.set_many(entities, d, x=list(range(40)))
+		self.assertEqual(len(result), 40)
+		self.assertEqual(len(c), 41)
+		self.assertEqual([c[e].x for e in entities], list(range(40)))
+		self.assertEqual([c[e].name for e in entities], ["debris"] * 40)
+		self.assertEqual(c[entities[5]].pos, (1, 2))
+		c[entities[5]].pos.x = 10
+		self.assertEqual(c[entities[6]].pos, (1, 2))
+		self.assertEqual(c.set_many([]), [])
+
+	def make_vector_component(self):
+		from grease.component import ColumnarComponent
+		from grease.geometry import Vec2d
+		c = ColumnarComponent(pos=Vec2d, hp=int, radius=float, name=str)
+		c.set_world(world)
+		entities = [TestEntity() for i in range(5)]
+		for i, entity in enumerate(entities):
+			c.set(entity, pos=(i, i * 2), hp=i * 10, radius=i / 2.0)
+		return c, entities
+
+	@unittest.skipIf(numpy is None, "requires numpy")
+	def test_array_views(self):
+		c, entities = self.make_vector_component()
+		c.remove(entities[0])
+		# Rows of removed entities remain until the next step
+		self.assertEqual(c.array('hp').tolist(), [c[e].hp for e in c])
+		self.assertEqual(c.array('pos').shape, (5, 2))
+		c.step(0)
+		self.assertEqual(c.array('hp').tolist(), 
+			[c[e].hp for e in c.entities])
+		self.assertEqual(c.array('pos').shape, (4, 2))
+		self.assertEqual(c.array('pos', 'y').tolist(), 
+			[c[e].pos.y for e in c.entities])
+		self.assertEqual(c.array('name'), None)
+		c.array('radius')[:] = 3
+		self.assertEqual([c[e].radius for e in c.entities], [3.0] * 4)
+
+	@unittest.skipIf(numpy is None, "requires numpy")
+	def test_vectorized_mutators(self):
+		from grease.geometry import Vec2d
+		c, entities = self.make_vector_component()
+		pos = c.entities.pos
+		pos += Vec2d(1, 1)
+		self.assertEqual([tuple(c[e].pos) for e in entities], 
+			[(1, 1), (2, 3), (3, 5), (4, 7), (5, 9)])
+		pos_x = c.entities.pos.x
+		pos_x *= 2
+		self.assertEqual([c[e].pos.x for e in entities], [2, 4, 6, 8, 10])
+		hp = c.entities.hp
+		hp /= 4
+		self.assertEqual([c[e].hp for e in entities], [0, 2, 5, 7, 10])
+		subset = c.fields['hp'].accessor(set(entities[:2]))
+		subset += 100
+		self.assertEqual([c[e].hp for e in entities], [100, 102, 5, 7, 10])
+
+	@unittest.skipIf(numpy is None, "requires numpy")
+	def test_vectorized_comparisons(self):
+		c, entities = self.make_vector_component()
+		self.assertEqual(c.entities.radius > 1, set(entities[3:]))
+		self.assertEqual(c.entities.hp == 20, set(entities[2:3]))
+		self.assertEqual(c.entities.pos.y <= 2, set(entities[:2]))
+		subset = c.fields['hp'].accessor(set(entities[1:4]))
+		self.assertEqual(subset != 20, set([entities[1], entities[3]]))
+		c.remove(entities[4])
+		self.assertEqual(c.entities.hp >= 30, set(entities[3:4]))
+
+	@unittest.skipIf(numpy is None, "requires numpy")
+	def test_vectorized_mutators_update_indexes(self):
+		c, entities = self.make_vector_component()
+		c.add_index('hp', sorted=True)
+		hp = c.entities.hp
+		hp += 100
+		self.assertEqual(c.entities.hp > 120, set(entities[3:]))
+
+	def test_column_buffer(self):
+		from grease.component import ColumnarComponent
+		c = ColumnarComponent(x=float)
+		c.set_world(world)
+		for i in range(3):
+			c.set(TestEntity(), x=i * 1.5)
+		view = memoryview(c.column('x')).cast('B').cast('d')
+		self.assertEqual(list(view[:len(c)]), [0.0, 1.5, 3.0])
+
+
+class IndexTestCase(unittest.TestCase):
+
+	def make_component(self, cls=None, count=5):
+		from grease.component import Component
+		from grease.geometry import Rect
+		c = (cls or Component)(firing=bool, size=int, box=Rect)
+		c.set_world(world)
+		entities = [TestEntity() for i in range(count)]
+		for i, entity in enumerate(entities):
+			c.set(entity, firing=(i % 2 == 0), size=i, 
+				box=Rect(i, -i, i + 1, -i + 1))
+		return c, entities
+	
+	def test_hash_index_query(self):
+		c, entities = self.make_component()
+		index = c.add_index('firing')
+		self.assertEqual(len(index), 5)
+		self.assertEqual(c.entities.firing == True, 
+			set([entities[0], entities[2], entities[4]]))
+		self.assertEqual(c.find(('firing',), operator.eq, False),
+			set([entities[1], entities[3]]))
+		self.assertEqual(c.find(('firing',), operator.lt, True), None)
+		self.assertEqual(c.find(('size',), operator.eq, 1), None)
+	
+	def test_sorted_index_query(self):
+		c, entities = self.make_component()
+		c.add_index('size', sorted=True)
+		sizes = c.entities.size
+		self.assertEqual(sizes < 2, set(entities[:2]))
+		self.assertEqual(sizes <= 2, set(entities[:3]))
+		self.assertEqual(sizes > 2, set(entities[3:]))
+		self.assertEqual(sizes >= 2, set(entities[2:]))
+		self.assertEqual(sizes == 2, set(entities[2:3]))
+		self.assertEqual(sizes != 2, set(entities) - set(entities[2:3]))
+
+	def test_find_ids(self):
+		c, entities = self.make_component()
+		c.add_index('size', sorted=True)
+		c.add_index('firing')
+		# Test entities have no entity_id, so their hashes are their ids
+		ids = [hash(entity) for entity in entities]
+		self.assertEqual(list(c.find_ids(('size',), operator.ge, 2)), ids[2:])
+		self.assertEqual(list(c.find_ids(('size',), operator.lt, 0)), [])
+		self.assertEqual(sorted(c.find_ids(('firing',), operator.eq, True)),
+			sorted([ids[0], ids[2], ids[4]]))
+		self.assertEqual(c.find_ids(('firing',), operator.lt, True), None)
+		c.remove(entities[2])
+		self.assertEqual(list(c.find_ids(('size',), operator.ge, 2)), ids[3:])
+	
+	def test_plain_entities(self):
+		from grease.component.index import HashIndex, SortedIndex
+		class Data(object):
+			def __init__(self, size):
+				self.size = size
+		items = [(entity, Data(entity % 3)) for entity in range(1, 7)]
+		hash_index = HashIndex(('size',))
+		sorted_index = SortedIndex(('size',))
+		for index in (hash_index, sorted_index):
+			index.rebuild(items)
+			self.assertEqual(index.find(operator.eq, 1), set([1, 4]))
+			self.assertEqual(sorted(index.find_ids(operator.eq, 2)), [2, 5])
+		self.assertEqual(list(sorted_index.find_ids(operator.gt, 0)), [1, 4, 2, 5])
+		items[0][1].size = 2
+		sorted_index.update(items)
+		self.assertEqual(list(sorted_index.find_ids(operator.ge, 2)), [1, 2, 5])
+		sorted_index.discard(1)
+		hash_index.discard(1)
+		self.assertEqual(sorted_index.find(operator.ge, 2), set([2, 5]))
+		self.assertEqual(hash_index.find(operator.eq, 1), set([4]))
+	
+	def test_index_updated_on_assignment(self):
+		c, entities = self.make_component()
+		c.add_index('size', sorted=True)
+		c.add_index('firing')
+		c[entities[0]].size = 10
+		c[entities[0]].firing = False
+		self.assertEqual(c.entities.size > 3, set([entities[0], entities[4]]))
+		self.assertEqual(c.entities.firing == True, set([entities[2], entities[4]]))
+		c.entities.size += 1
+		self.assertEqual(c.entities.size > 3, 
+			set([entities[0], entities[3], entities[4]]))
+		setter = c.unchecked_setter('size')
+		setter(c[entities[1]], 20)
+		self.assertEqual(c.entities.size > 11, set([entities[1]]))
+	
+	def test_index_add_remove(self):
+		c, entities = self.make_component()
+		index = c.add_index('size', sorted=True)
+		c.remove(entities[4])
+		self.assertEqual(len(index), 4)
+		self.assertEqual(c.entities.size > 2, set([entities[3]]))
+		c[entities[4]].size = 1 # pending removal, not reindexed
+		self.assertEqual(len(index), 4)
+		new = TestEntity()
+		c.set(new, size=100)
+		self.assertEqual(c.entities.size > 2, set([entities[3], new]))
+		c.set_many([TestEntity(), TestEntity()], size=[50, 0])
+		self.assertEqual(len(index), 7)
+		self.assertEqual(len(c.entities.size > 2), 3)
+	
+	def test_nested_index_reindex(self):
+		c, entities = self.make_component()
+		c.add_index('box.right', sorted=True)
+		self.assertEqual(c.entities.box.right < 3, set(entities[:2]))
+		c[entities[4]].box.right = 0
+		self.assertEqual(c.entities.box.right < 3, set(entities[:2]))
+		c.reindex()
+		self.assertEqual(c.entities.box.right < 3, 
+			set([entities[0], entities[1], entities[4]]))
+		self.assertEqual(c.entities.box.left == 2, set([entities[2]]))
+
+	def test_sorted_index_update(self):
+		c, entities = self.make_component(count=20)
+		index = c.add_index('box.right', sorted=True)
+		c[entities[5]].box.right = -10
+		c.reindex('box')
+		self.assertEqual(c.entities.box.right < 0, set([entities[5]]))
+		self.assertEqual(c.entities.box.right == 1, set([entities[0]]))
+		# Many changes are resorted at once
+		for entity in entities[:10]:
+			c[entity].box.right = -c[entity].box.right
+		c.reindex('box')
+		self.assertEqual(len(index), 20)
+		self.assertEqual(c.entities.box.right < -5,
+			set(entities[6:10]) - set([entities[5]]))
+		self.assertEqual(c.entities.box.right == 10, set([entities[5]]))
+		self.assertEqual(c.entities.box.right >= 11, set(entities[10:]))
+
+	def test_index_query_subset(self):
+		c, entities = self.make_component()
+		c.add_index('size', sorted=True)
+		accessor = c.fields['size'].accessor(set(entities[1:3]))
+		self.assertEqual(accessor < 10, set(entities[1:3]))
+	
+	def test_columnar_index(self):
+		from grease.component import ColumnarComponent
+		c, entities = self.make_component(ColumnarComponent)
+		c.add_index('size', sorted=True)
+		c.add_index('firing')
+		self.assertEqual(c.entities.size >= 3, set(entities[3:]))
+		c[entities[0]].size = 7
+		self.assertEqual(c.entities.size >= 3, 
+			set([entities[0], entities[3], entities[4]]))
+		c.remove(entities[3])
+		self.assertEqual(c.entities.size >= 3, set([entities[0], entities[4]]))
+		c.step(0)
+		self.assertEqual(c.entities.firing == True, 
+			set([entities[0], entities[2], entities[4]]))
+
+
+class ShapeLibraryTestCase(unittest.TestCase):
+
+	def test_library(self):
+		from grease.geometry import ShapeLibrary, Vec2d
+		library = ShapeLibrary()
+		tri = library.add([(0, 1), (1, 0), (0, 0)], name='tri')
+		line = library.add([(0, 0), (1, 1)])
+		self.assertEqual(len(library), 2)
+		self.assertEqual(library.shape_id('tri'), tri)
+		self.assertEqual(library.shape_id(line), line)
+		self.assertTrue('tri' in library)
+		self.assertFalse('square' in library)
+		self.assertFalse(5 in library)
+		self.assertRaises(KeyError, library.verts, 'square')
+		self.assertEqual(library.coords(tri), ((0.0, 1.0), (1.0, 0.0), (0.0, 0.0)))
+		verts1 = library.verts('tri')
+		verts2 = library.verts(tri)
+		self.assertEqual(verts1.tolist(), [(0, 1), (1, 0), (0, 0)])
+		self.assertEqual(verts1, [Vec2d(0, 1), Vec2d(1, 0), Vec2d(0, 0)])
+		self.assertEqual(verts1.shape_id, tri)
+		self.assertFalse(verts1 is verts2)
+		self.assertTrue(verts1._buffer is verts2._buffer)
+	
+	def test_copy_on_write(self):
+		from grease.geometry import ShapeLibrary, Vec2d, Vec2dArray
+		library = ShapeLibrary()
+		tri = library.add([(0, 1), (1, 0), (0, 0)])
+		verts1 = library.verts(tri)
+		verts2 = library.verts(tri)
+		verts1[1] = (5, 5)
+		self.assertEqual(verts1.shape_id, None)
+		self.assertEqual(verts1.coords, None)
+		self.assertEqual(list(verts1), [Vec2d(0, 1), Vec2d(5, 5), Vec2d(0, 0)])
+		self.assertEqual(list(verts2), [Vec2d(0, 1), Vec2d(1, 0), Vec2d(0, 0)])
+		self.assertNotEqual(
+			ctypes.addressof(verts1[0]), ctypes.addressof(verts2[0]))
+		verts1[0].x = 3
+		self.assertEqual(verts2[0], Vec2d(0, 1))
+		self.assertEqual(list(library.verts(tri)), list(verts2))
+		verts2.append((2, 2))
+		self.assertEqual(verts2.shape_id, None)
+		self.assertEqual(len(verts2), 4)
+		self.assertEqual(len(library.verts(tri)), 3)
+		self.assertTrue(isinstance(verts2, Vec2dArray))
+
+	def test_element_views_copy_shared_verts(self):
+		from grease.geometry import ShapeLibrary, Vec2d
+		library = ShapeLibrary()
+		tri = library.add([(0, 1), (1, 0), (0, 0)])
+		verts1 = library.verts(tri)
+		verts2 = library.verts(tri)
+		vec = verts1[0]
+		self.assertEqual(verts1.shape_id, None)
+		vec.x = 3
+		self.assertEqual(verts1[0], Vec2d(3, 1))
+		self.assertEqual(verts2.tolist(), [(0, 1), (1, 0), (0, 0)])
+		self.assertEqual(library.verts(tri).tolist(), verts2.tolist())
+		for vec in verts2:
+			vec.y += 1
+		self.assertEqual(verts2.shape_id, None)
+		self.assertEqual(verts2.tolist(), [(0, 2), (1, 1), (0, 1)])
+		self.assertEqual(library.coords(tri), ((0, 1), (1, 0), (0, 0)))
+		self.assertEqual(library.verts(tri).tolist(), [(0, 1), (1, 0), (0, 0)])
+		# Slices are copies, so do not detach the array
+		verts3 = library.verts(tri)
+		self.assertEqual(verts3[1:], [(1, 0), (0, 0)])
+		self.assertEqual(verts3.shape_id, tri)
+
+	def test_shared_verts_buffer_views_read_only(self):
+		from grease.geometry import ShapeLibrary
+		library = ShapeLibrary()
+		tri = library.add([(0, 1), (1, 0), (0, 0)])
+		verts1 = library.verts(tri)
+		verts2 = library.verts(tri)
+		self.assertTrue(verts1.buffer().readonly)
+		verts1.detach()
+		self.assertEqual(verts1.shape_id, None)
+		self.assertFalse(verts1.buffer().readonly)
+		self.assertFalse(verts1._buffer is verts2._buffer)
+		self.assertEqual(verts1, verts2)
+		if numpy is not None:
+			array = verts2.array()
+			self.assertFalse(array.flags.writeable)
+			self.assertRaises(ValueError, array.__setitem__, (0, 0), 7.0)
+			verts2.detach()
+			verts2.array()[0, 0] = 7.0
+			self.assertEqual(verts2.tolist()[0], (7, 1))
+		self.assertEqual(library.verts(tri).tolist()[0], (0, 1))
+
+	def test_shape_component(self):
+		from grease.component import Shape
+		from grease.geometry import ShapeLibrary, Vec2d
+		shape = Shape()
+		shape.set_world(world)
+		self.assertTrue(isinstance(shape.library, ShapeLibrary))
+		library = ShapeLibrary()
+		shape = Shape(library)
+		shape.set_world(world)
+		self.assertTrue(shape.library is library)
+		rock = library.add([(0, 1), (1, 0), (0, 0)], name='rock')
+		entities = [TestEntity() for i in range(3)]
+		for entity in entities[:2]:
+			shape.set_shape(entity, 'rock', closed=0)
+		shape.set(entities[2], verts=[(0, 0), (1, 1)])
+		self.assertEqual(shape.shape_id(entities[0]), rock)
+		self.assertEqual(shape.shape_id(entities[2]), None)
+		self.assertEqual(shape[entities[1]].closed, 0)
+		self.assertTrue(shape[entities[0]].verts._buffer 
+			is shape[entities[1]].verts._buffer)
+		shape[entities[0]].verts[0] = (2, 2)
+		self.assertEqual(shape.shape_id(entities[0]), None)
+		self.assertEqual(shape.shape_id(entities[1]), rock)
+		self.assertEqual(shape[entities[1]].verts[0], Vec2d(0, 1))
+		# Assigning shared verts copies them
+		shape[entities[2]].verts = shape[entities[1]].verts
+		self.assertEqual(shape.shape_id(entities[2]), None)
+		shape.set_shape(entities[2], rock)
+		self.assertEqual(shape.shape_id(entities[2]), rock)
+		self.assertEqual(shape[entities[2]].closed, 1)
+
 
 if __name__ == '__main__':
 	unittest.main()
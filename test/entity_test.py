@@ -224,6 +224,197 @@ class EntityComponentAccessorTestCase(unittest.TestCase):
 		self.assertFalse(accessor)
 		component[entity] = 456
 		self.assertTrue(accessor)
+	
+	def test_accessor_has_no_dict(self):
+		from grease.entity import EntityComponentAccessor
+		from grease import Entity
+		world = TestWorld()
+		entity = Entity(world)
+		accessor = EntityComponentAccessor({entity: TestData(foo=1)}, entity)
+		self.assertRaises(AttributeError, object.__getattribute__, accessor, '__dict__')
+		accessor.foo = 2
+		self.assertEqual(accessor.foo, 2)
+	
+	def test_component_attribute(self):
+		from grease.entity import ComponentAttribute, EntityComponentAccessor
+		from grease import Entity
+		comp = TestComponent()
+		world = TestWorld(attr_test=comp)
+		ComponentAttribute.install('attr_test')
+		self.assertTrue(isinstance(Entity.__dict__['attr_test'], ComponentAttribute))
+		entity = Entity(world)
+		accessor = entity.attr_test
+		self.assertTrue(isinstance(accessor, EntityComponentAccessor))
+		self.assertFalse(accessor)
+		entity.attr_test.foo = 5
+		self.assertEqual(comp[entity].foo, 5)
+		self.assertEqual(entity.attr_test.foo, 5)
+		# Existing entity attributes are not replaced
+		delete = Entity.delete
+		ComponentAttribute.install('delete')
+		self.assertTrue(Entity.delete is delete)
+		# Subclass attributes take precedence
+		class Sub(Entity):
+			attr_test = 'sub'
+		self.assertEqual(Sub(world).attr_test, 'sub')
+		# Worlds without the component raise AttributeError
+		self.assertRaises(AttributeError, getattr, Entity(TestWorld()), 'attr_test')
+
+	def test_component_attribute_disjoint_worlds(self):
+		from grease.entity import ComponentAttribute
+		from grease import Entity
+		world1 = TestWorld(attr_alpha=TestComponent())
+		world2 = TestWorld(attr_beta=TestComponent())
+		self.assertTrue(ComponentAttribute.install('attr_alpha'))
+		self.assertTrue(ComponentAttribute.install('attr_beta'))
+		self.assertTrue(ComponentAttribute.install('attr_beta'))
+		entity1 = Entity(world1)
+		entity2 = Entity(world2)
+		entity1.attr_alpha.foo = 1
+		entity2.attr_beta.foo = 2
+		self.assertEqual(world1.attr_alpha[entity1].foo, 1)
+		self.assertEqual(world2.attr_beta[entity2].foo, 2)
+		self.assertFalse(hasattr(entity1, 'attr_beta'))
+		self.assertFalse(hasattr(entity2, 'attr_alpha'))
+		self.assertRaises(AttributeError, getattr, entity2, 'attr_alpha')
+		self.assertRaises(AttributeError, setattr, entity2, 'attr_alpha', 
+			TestData(foo=3))
+		self.assertFalse(entity2 in world1.attr_alpha)
+		# Names of other entity attributes are refused
+		delete = Entity.__dict__['delete']
+		self.assertFalse(ComponentAttribute.install('delete'))
+		self.assertFalse(ComponentAttribute.install('exists'))
+		self.assertTrue(Entity.__dict__['delete'] is delete)
+	
+	def test_component_attribute_reuses_accessor(self):
+		from grease.entity import ComponentAttribute
+		from grease.component import Component
+		from grease import Entity
+		comp = Component(foo=int)
+		world = TestWorld(attr_reuse=comp)
+		comp.set_world(world)
+		ComponentAttribute.install('attr_reuse')
+		entity = Entity(world)
+		self.assertFalse(entity.attr_reuse)
+		self.assertFalse(entity.attr_reuse is entity.attr_reuse)
+		entity.attr_reuse.foo = 5
+		accessor = entity.attr_reuse
+		self.assertTrue(entity.attr_reuse is accessor)
+		self.assertEqual(accessor.foo, 5)
+		# Replacing the data replaces the accessor
+		comp.set(entity, foo=6)
+		self.assertFalse(entity.attr_reuse is accessor)
+		self.assertEqual(entity.attr_reuse.foo, 6)
+		accessor = entity.attr_reuse
+		comp.remove(entity)
+		self.assertFalse(entity.attr_reuse is accessor)
+		comp.set(entity, foo=7)
+		self.assertEqual(entity.attr_reuse.foo, 7)
+
+
+class TestSlotComponent(object):
+
+	def __init__(self):
+		self.fields = {}
+		self.swaps = []
+
+	def _swap_slots(self, slot1, slot2):
+		self.swaps.append((slot1, slot2))
+
+
+class SparseEntitySetTestCase(unittest.TestCase):
+
+	def test_add_contains_len(self):
+		from grease.entity import SparseEntitySet
+		s = SparseEntitySet(TestSlotComponent())
+		self.assertEqual(len(s), 0)
+		self.assertEqual(s.add('a'), 0)
+		self.assertEqual(s.add('b'), 1)
+		self.assertEqual(s.add('a'), 0)
+		self.assertEqual(len(s), 2)
+		self.assertTrue('a' in s)
+		self.assertTrue('b' in s)
+		self.assertFalse('c' in s)
+		self.assertEqual(list(s), ['a', 'b'])
+	
+	def test_remove_pending_until_purge(self):
+		from grease.entity import SparseEntitySet
+		comp = TestSlotComponent()
+		s = SparseEntitySet(comp)
+		for e in 'abcd':
+			s.add(e)
+		s.remove('b')
+		self.assertEqual(comp.swaps, [])
+		self.assertEqual(list(s), ['a', 'c', 'd'])
+		self.assertFalse('b' in s)
+		self.assertTrue(s.pending('b'))
+		self.assertEqual([s.slot(e) for e in 'abcd'], [0, 1, 2, 3])
+		self.assertEqual(s.slots(), 4)
+		self.assertRaises(KeyError, s.remove, 'b')
+		self.assertRaises(KeyError, s.remove, 'x')
+		s.discard('b')
+		s.discard('x')
+		s.purge()
+		self.assertEqual(comp.swaps, [(1, 3)])
+		self.assertEqual(list(s), ['a', 'd', 'c'])
+		self.assertEqual(s.slot('d'), 1)
+		self.assertEqual(s.slots(), 3)
+		self.assertFalse(s.pending('b'))
+		self.assertRaises(KeyError, s.slot, 'b')
+	
+	def test_purge_fills_holes_from_tail(self):
+		from grease.entity import SparseEntitySet
+		comp = TestSlotComponent()
+		s = SparseEntitySet(comp)
+		for e in 'abcdef':
+			s.add(e)
+		for e in 'aef':
+			s.remove(e)
+		s.purge()
+		self.assertEqual(comp.swaps, [(0, 3)])
+		self.assertEqual(list(s), ['d', 'b', 'c'])
+		self.assertEqual([s.slot(e) for e in 'dbc'], [0, 1, 2])
+		self.assertEqual(s.slots(), 3)
+		s.purge()
+		self.assertEqual(comp.swaps, [(0, 3)])
+	
+	def test_add_pending_restores(self):
+		from grease.entity import SparseEntitySet
+		comp = TestSlotComponent()
+		s = SparseEntitySet(comp)
+		for e in 'abc':
+			s.add(e)
+		s.remove('a')
+		self.assertEqual(s.add('d'), 3)
+		self.assertEqual(s.slot('a'), 0)
+		self.assertEqual(s.add('a'), 0)
+		self.assertEqual(list(s), ['a', 'b', 'c', 'd'])
+		s.remove('a')
+		s.add('a')
+		s.purge()
+		self.assertEqual(comp.swaps, [])
+		self.assertEqual(s.slots(), 4)
+	
+	def test_set_operations(self):
+		from grease.entity import SparseEntitySet
+		s = SparseEntitySet(TestSlotComponent())
+		for e in 'abc':
+			s.add(e)
+		self.assertEqual(s, set('abc'))
+		self.assertEqual(set('abc'), s)
+		self.assertEqual(s & set('bcd'), set('bc'))
+		self.assertEqual(set('bcd') & s, set('bc'))
+		self.assertEqual(s | set('d'), set('abcd'))
+		self.assertEqual(s - set('a'), set('bc'))
+	
+	def test_iterate_while_removing(self):
+		from grease.entity import SparseEntitySet
+		s = SparseEntitySet(TestSlotComponent())
+		for e in 'abc':
+			s.add(e)
+		for e in s:
+			s.remove(e)
+		self.assertEqual(len(s), 0)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,172 @@
+import unittest
+import pickle
+
+
+class Vec2dTestCase(unittest.TestCase):
+
+	def implementations(self):
+		from grease.geometry import CVec2d, PyVec2d
+		return CVec2d, PyVec2d
+
+	def test_operators(self):
+		for cls in self.implementations():
+			v = cls(3, 4)
+			self.assertEqual(v + cls(1, 1), (4, 5))
+			self.assertEqual(v * 2, (6, 8))
+			self.assertEqual(v - (1, 2), (2, 2))
+			self.assertEqual(v.length, 5)
+			self.assertEqual(list(v), [3, 4])
+
+	def test_multiply_by_vector(self):
+		for cls in self.implementations():
+			v = cls(3, 4)
+			self.assertEqual(v * cls(2, 3), (6, 12))
+			self.assertEqual(cls(2, 3) * v, (6, 12))
+			self.assertEqual(v * (2, 3), (6, 12))
+			v *= cls(2, 3)
+			self.assertEqual(v, (6, 12))
+
+	def test_inplace_true_division(self):
+		for cls in self.implementations():
+			v = cls(3, 4)
+			v /= 2
+			self.assertEqual(v, (1.5, 2))
+			self.assertEqual(v, cls(3, 4) / 2)
+			v /= (3, 4)
+			self.assertEqual(v, (0.5, 0.5))
+			v = cls(3, 4)
+			v //= 2
+			self.assertEqual(v, (1, 2))
+
+	def test_truth(self):
+		for cls in self.implementations():
+			self.assertTrue(cls(3, 4))
+			self.assertTrue(cls(0, -1))
+			self.assertTrue(cls(0.5, 0))
+			self.assertFalse(cls(0, 0))
+			self.assertTrue(bool(cls(3, 4)) is True)
+			self.assertTrue(bool(cls(0.0, 0.0)) is False)
+
+	def test_pickle(self):
+		from grease.geometry import CVec2d, Vec2dArray
+		for cls in self.implementations():
+			v = pickle.loads(pickle.dumps(cls(5, 0.3)))
+			self.assertTrue(v.__class__ is cls)
+			self.assertEqual(v, (5, 0.3))
+		view = Vec2dArray([(1, 2)])[0]
+		v = pickle.loads(pickle.dumps(view))
+		self.assertEqual(v, (1, 2))
+		v.x = 3
+		self.assertEqual(view, (1, 2))
+
+	def test_instances(self):
+		from grease.geometry import CVec2d, PyVec2d, Vec2d
+		self.assertTrue(Vec2d in (CVec2d, PyVec2d))
+		self.assertTrue(isinstance(CVec2d(1, 2), PyVec2d))
+		self.assertTrue(isinstance(PyVec2d(1, 2), PyVec2d))
+		self.assertFalse(isinstance((1, 2), PyVec2d))
+		self.assertTrue(isinstance(PyVec2d(1, 2) + CVec2d(1, 1), Vec2d))
+		self.assertEqual(PyVec2d(1, 2) + CVec2d(1, 1), (2, 3))
+
+
+class Vec2dArrayTestCase(unittest.TestCase):
+
+	def test_list_compatible(self):
+		from grease.geometry import Vec2d, Vec2dArray
+		verts = Vec2dArray([(0, 0), (1, 2)])
+		self.assertEqual(len(verts), 2)
+		self.assertEqual(verts, [(0, 0), (1, 2)])
+		self.assertEqual(verts[-1], Vec2d(1, 2))
+		self.assertRaises(IndexError, lambda: verts[2])
+		verts.append((3, 4))
+		verts.insert(0, Vec2d(-1, -1))
+		verts.extend([(5, 6)])
+		self.assertEqual(verts.tolist(), [(-1, -1), (0, 0), (1, 2), (3, 4), (5, 6)])
+		self.assertEqual(verts.pop(), Vec2d(5, 6))
+		del verts[0]
+		self.assertEqual(verts.tolist(), [(0, 0), (1, 2), (3, 4)])
+		self.assertEqual(verts[1:].tolist(), [(1, 2), (3, 4)])
+		self.assertEqual(verts[::-2].tolist(), [(3, 4), (0, 0)])
+		verts[0] = (7, 8)
+		verts[1].x = 9
+		self.assertEqual(verts.tolist(), [(7, 8), (9, 2), (3, 4)])
+		verts[1:] = [(1, 1)]
+		self.assertEqual(verts.tolist(), [(7, 8), (1, 1)])
+		verts.sort()
+		self.assertEqual(verts.tolist(), [(1, 1), (7, 8)])
+		verts.reverse()
+		self.assertEqual(verts.tolist(), [(7, 8), (1, 1)])
+		self.assertEqual((verts + verts).tolist(), [(7, 8), (1, 1)] * 2)
+		self.assertTrue(Vec2d(1, 1) in verts)
+		self.assertEqual(verts.index((1, 1)), 1)
+		copy = verts.copy()
+		copy.clear()
+		self.assertEqual(len(copy), 0)
+		self.assertEqual(len(verts), 2)
+
+	def test_append_grows_buffer(self):
+		from grease.geometry import Vec2dArray
+		verts = Vec2dArray()
+		for i in range(100):
+			verts.append((i, -i))
+		self.assertEqual(verts.tolist(), [(i, -i) for i in range(100)])
+		self.assertEqual(len(verts.buffer()), 200)
+
+	def test_pickle(self):
+		from grease.geometry import Vec2dArray
+		verts = Vec2dArray([(0, 1), (2, 3)])
+		self.assertEqual(pickle.loads(pickle.dumps(verts)), verts)
+
+	def test_transform(self):
+		from grease.geometry import Vec2d, Vec2dArray
+		verts = Vec2dArray([(1, 0), (0, 2)])
+		xformed = verts.transform(offset=(1, 1), angle=90, scale=2)
+		for vec, expected in zip(xformed, [(1, -1), (5, 1)]):
+			self.assertAlmostEqual(vec.x, expected[0])
+			self.assertAlmostEqual(vec.y, expected[1])
+		self.assertEqual(verts.tolist(), [(1, 0), (0, 2)])
+		self.assertEqual(len(Vec2dArray().transform(angle=10)), 0)
+
+	def test_transform_vectorized(self):
+		from grease.geometry import Vec2d, Vec2dArray
+		verts = Vec2dArray((i, i * 2) for i in range(Vec2dArray.VECTORIZE_THRESHOLD * 2))
+		xformed = verts.transform(offset=(3, -1), angle=-45, scale=0.5)
+		for vec, xvec in zip(verts, xformed):
+			expected = vec.rotated(-45) * 0.5 + (3, -1)
+			self.assertAlmostEqual(xvec.x, expected.x)
+			self.assertAlmostEqual(xvec.y, expected.y)
+
+	def test_segments(self):
+		from grease.geometry import Vec2dArray
+		verts = Vec2dArray([(0, 0), (1, 0), (1, 1)])
+		self.assertEqual([seg.tolist() for seg in verts.segments()], 
+			[[(0, 0), (1, 0)], [(1, 0), (1, 1)], [(1, 1), (0, 0)]])
+		self.assertEqual(len(list(verts.segments(closed=False))), 2)
+		self.assertEqual(list(Vec2dArray().segments()), [])
+
+	def test_bounds_and_centroid(self):
+		from grease.geometry import Vec2d, Vec2dArray, Rect
+		verts = Vec2dArray([(0, 1), (4, -1), (2, 3)])
+		bounds = verts.bounds()
+		self.assertTrue(isinstance(bounds, Rect))
+		self.assertEqual((bounds.left, bounds.bottom, bounds.right, bounds.top), 
+			(0, -1, 4, 3))
+		self.assertEqual(verts.centroid(), Vec2d(2, 1))
+		self.assertRaises(ValueError, Vec2dArray().bounds)
+		self.assertRaises(ValueError, Vec2dArray().centroid)
+
+	def test_array_view(self):
+		try:
+			import numpy
+		except ImportError:
+			return
+		from grease.geometry import Vec2dArray
+		verts = Vec2dArray([(0, 1), (2, 3)])
+		array = verts.array()
+		self.assertEqual(array.shape, (2, 2))
+		array[1, 0] = 5
+		self.assertEqual(verts[1].x, 5)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -241,6 +241,24 @@ class VectorTestCase(unittest.TestCase):
 		self.assertEqual(list(i_array[14:20]), [7, 8, 8, 9, 9, 10]) 
 		self.assertEqual(self.get_rgba(v_array[:11]), [(255,255,255,255)] * 11)
 	
+	def test_generate_verts_library_shapes(self):
+		from grease.renderer import Vector
+		from grease.geometry import Vec2d, ShapeLibrary
+		world = self.make_world()
+		library = ShapeLibrary()
+		square = library.add([(-1, -1), (1, -1), (1, 1), (-1, 1)])
+		world.shapes[1].verts = library.verts(square)
+		world.shapes[2].verts = library.verts(square)
+		world.positions[2].angle = 90
+		renderer = Vector(scale=2.0)
+		renderer.set_world(world)
+		v_array, i_size, i_array, i_count = renderer._generate_verts()
+		self.assertEqual(i_count, 20)
+		self.assertArrayEqual(self.get_verts(v_array[3:7]), 
+			[(2, 1), (6, 1), (6, 5), (2, 5)]) 
+		self.assertArrayEqual(self.get_verts(v_array[7:11]), 
+			[(-2, 2), (-2, -2), (2, -2), (2, 2)]) 
+	
 	def test_draw_empty(self):
 		from grease.renderer import Vector
 		world = TestWorld()
@@ -4,6 +4,9 @@ from world_test import *
 from entity_test import *
 from component_test import *
 from field_test import *
+from color_test import *
+from geometry_test import *
+from vecops_test import *
 from renderer_test import *
 from collision_test import *
 from mode_test import *
@@ -0,0 +1,113 @@
+import unittest
+import operator
+
+
+class VecOpsTestCase(unittest.TestCase):
+
+	def test_add_scaled(self):
+		from grease.geometry import Vec2d
+		from grease.vecops import add_scaled
+		v = Vec2d(1, 2)
+		self.assertTrue(add_scaled(v, Vec2d(2, -1), 0.5) is v)
+		self.assertEqual(v, (2, 1.5))
+		out = Vec2d(0, 0)
+		self.assertTrue(add_scaled(v, Vec2d(1, 1), 2, out) is out)
+		self.assertEqual(out, (4, 3.5))
+		self.assertEqual(v, (2, 1.5))
+
+	def test_sub_and_scale(self):
+		from grease.geometry import Vec2d
+		from grease.vecops import sub, scale
+		v = Vec2d(3, 4)
+		self.assertEqual(sub(v, Vec2d(1, 1)), (2, 3))
+		self.assertEqual(scale(v, 2), (4, 6))
+		out = Vec2d(0, 0)
+		scale(v, 0.5, out)
+		self.assertEqual(out, (2, 3))
+		self.assertEqual(v, (4, 6))
+
+	def test_rotate(self):
+		from grease.geometry import Vec2d
+		from grease.vecops import rotate, rotate_unit
+		v = Vec2d(1, 0)
+		rotate(v, 90)
+		self.assertAlmostEqual(v.x, 0)
+		self.assertAlmostEqual(v.y, -1)
+		expected = Vec2d(2, 1).rotated(-30)
+		out = rotate(Vec2d(2, 1), -30, Vec2d(0, 0))
+		self.assertAlmostEqual(out.x, expected.x)
+		self.assertAlmostEqual(out.y, expected.y)
+		self.assertEqual(rotate_unit(Vec2d(2, 1), 0, 1), (-1, 2))
+
+	def test_normalize(self):
+		from grease.geometry import Vec2d
+		from grease.vecops import normalize, dist_sqrd
+		v = Vec2d(3, 4)
+		self.assertEqual(normalize(v), 5)
+		self.assertAlmostEqual(v.x, 0.6)
+		self.assertAlmostEqual(v.y, 0.8)
+		v = Vec2d(0, 0)
+		self.assertEqual(normalize(v), 0)
+		self.assertEqual(v, (0, 0))
+		self.assertEqual(dist_sqrd(Vec2d(1, 1), Vec2d(4, 5)), 25)
+
+	def test_array_views(self):
+		from grease.geometry import Vec2d, Vec2dArray
+		from grease.vecops import add_scaled
+		verts = Vec2dArray([(1, 1), (2, 2)])
+		add_scaled(verts[1], Vec2d(1, 0), 3)
+		self.assertEqual(verts.tolist(), [(1, 1), (5, 2)])
+
+
+class EulerMovementTestCase(unittest.TestCase):
+
+	def test_step(self):
+		from grease import World, Entity
+		from grease.component import Position, Movement
+		from grease.controller import EulerMovement
+		world = World()
+		world.components.position = Position()
+		world.components.movement = Movement()
+		world.components.position.add_index('position.x', sorted=True)
+		world.systems.movement = EulerMovement()
+		entity = Entity(world)
+		entity.position.position = (1, 1)
+		entity.movement.velocity = (2, 0)
+		entity.movement.accel = (0, 4)
+		entity.movement.rotation = 10
+		world.step(0.125)
+		self.assertEqual(entity.movement.velocity, (2, 0.5))
+		self.assertEqual(entity.position.position, (1.25, 1.0625))
+		self.assertEqual(entity.position.angle, 1.25)
+		self.assertEqual(
+			world.components.position.find(('position', 'x'), operator.eq, 1.25),
+			set([entity]))
+
+	def test_step_components_without_reindex(self):
+		from grease import World, Entity
+		from grease.geometry import Vec2d
+		from grease.controller import EulerMovement
+		class Data(object):
+			def __init__(self, **kw):
+				self.__dict__.update(kw)
+		class PlainComponent(dict):
+			def set_world(self, world):
+				self.entities = set()
+			def __setitem__(self, entity, data):
+				self.entities.add(entity)
+				dict.__setitem__(self, entity, data)
+		world = World()
+		world.components.position = PlainComponent()
+		world.components.movement = PlainComponent()
+		world.systems.movement = EulerMovement()
+		entity = Entity(world)
+		world.components.position[entity] = Data(
+			position=Vec2d(1, 1), angle=0.0)
+		world.components.movement[entity] = Data(
+			velocity=Vec2d(2, 0), accel=Vec2d(0, 0), rotation=0.0)
+		world.step(0.125)
+		self.assertEqual(world.components.position[entity].position, (1.25, 1))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import operator
 
 class TestComponent(dict):
 	
@@ -195,6 +196,98 @@ class WorldTestCase(unittest.TestCase):
 		self.assertFalse(entity in comp2)
 		self.assertFalse(entity in comp3)
 	
+	def test_remove_entity_only_touches_member_components(self):
+		from grease import World, Entity
+		from grease.component import Component
+		class CountingComponent(Component):
+			removes = 0
+			def remove(self, entity):
+				self.removes += 1
+				return Component.remove(self, entity)
+		world = World()
+		comp1 = world.components.one = CountingComponent()
+		comp2 = world.components.two = CountingComponent()
+		comp3 = world.components.three = CountingComponent()
+		entity = Entity(world)
+		other = Entity(world)
+		comp1.set(entity)
+		comp2.set(entity)
+		comp3.set(entity)
+		comp3.set(other)
+		del comp2[entity]
+		comp2.removes = 0
+		world.entities.remove(entity)
+		self.assertEqual(comp1.removes, 1)
+		self.assertEqual(comp2.removes, 0)
+		self.assertEqual(comp3.removes, 1)
+		self.assertFalse(entity in comp1.entities)
+		self.assertFalse(entity in comp3.entities)
+		self.assertTrue(other in comp3.entities)
+		world.entities.remove(other)
+		self.assertEqual(comp1.removes, 1)
+		self.assertEqual(comp3.removes, 2)
+	
+	def test_remove_entity_after_component_replaced(self):
+		from grease import World, Entity
+		from grease.component import Component
+		world = World()
+		entity = Entity(world)
+		old = world.components.one = Component()
+		old.set(entity)
+		new = Component()
+		new.set_world(world)
+		new.set(entity)
+		world.components.one = new
+		world.components.two = Component()
+		world.components.two.set(entity)
+		world.entities.remove(entity)
+		self.assertTrue(entity in old.entities)
+		self.assertFalse(entity in new.entities)
+		self.assertFalse(entity in world.components.two.entities)
+	
+	def test_command_buffer(self):
+		from grease import World, Entity
+		from grease.component import Component
+		class Thing(Entity):
+			def __init__(self, world, x):
+				self.pos.x = x
+		world = World()
+		world.components.pos = Component(x=int)
+		world.components.tag = Component()
+		e1 = Thing(world, 1)
+		e2 = Thing(world, 2)
+		commands = world.commands
+		commands.delete(e1)
+		commands.set(e1, 'tag')
+		commands.set(e2, 'tag')
+		commands.remove(e2, 'pos')
+		commands.create(Thing, 3)
+		commands.spawn(Thing, 2, pos={'x': [4, 5]})
+		self.assertEqual(len(commands), 6)
+		self.assertTrue(e1 in world.entities)
+		self.assertFalse(e2 in world.components.tag.entities)
+		world.step(0)
+		self.assertEqual(len(commands), 0)
+		self.assertFalse(e1 in world.entities)
+		self.assertFalse(e1 in world.components.tag.entities)
+		self.assertTrue(e2 in world.components.tag.entities)
+		self.assertFalse(e2 in world.components.pos.entities)
+		self.assertEqual(len(world[Thing].entities), 4)
+		self.assertEqual(sorted(e.pos.x for e in world[Thing].entities 
+			if e in world.components.pos.entities), [3, 4, 5])
+
+	def test_command_buffer_delete_while_iterating(self):
+		from grease import World, Entity
+		world = World()
+		for i in range(10):
+			Entity(world)
+		for entity in world.entities:
+			world.commands.delete(entity)
+			world.commands.delete(entity)
+		self.assertEqual(len(world.entities), 10)
+		world.commands.apply()
+		self.assertEqual(len(world.entities), 0)
+	
 	def test_entity_extent_component_access(self):
 		from grease import World, Entity
 		from grease.entity import ComponentEntitySet
@@ -271,6 +364,249 @@ class WorldTestCase(unittest.TestCase):
 		self.assertFalse(subsub in subsub_extent.entities)
 		self.assertFalse(subsub in another_extent.entities)
 	
+	def test_spawn_entities(self):
+		from grease import World, Entity
+		from grease.component import Component
+		class Debris(Entity):
+			def __init__(self, world):
+				raise AssertionError("__init__ should not be called")
+		class Template:
+			pass
+		template = Template()
+		template.color = "red"
+		world = World()
+		world.components.pos = Component(x=float, color=str)
+		world.components.tag = Component(name=str)
+		first = Entity(world)
+		entities = world.spawn(Debris, 3, 
+			pos={'x': [1, 2, 3]}, tag=template)
+		self.assertEqual(len(entities), 3)
+		self.assertEqual(len(set(e.entity_id for e in entities + [first])), 4)
+		for entity in entities:
+			self.assertTrue(isinstance(entity, Debris))
+			self.assertTrue(entity.world is world)
+			self.assertTrue(entity in world.entities)
+			self.assertTrue(entity in world[Debris].entities)
+			self.assertTrue(entity in world[Entity].entities)
+		self.assertEqual([e.pos.x for e in entities], [1.0, 2.0, 3.0])
+		self.assertEqual([e.pos.color for e in entities], ["", "", ""])
+		self.assertEqual(world.components.tag.entities, set(entities))
+		self.assertEqual(world.spawn(Debris, 0), [])
+	
+	def test_new_entity_ids(self):
+		from grease import World
+		world = World()
+		first = world.new_entity_id()
+		self.assertEqual(world.new_entity_ids(3), 
+			[first + 1, first + 2, first + 3])
+		self.assertEqual(world.new_entity_id(), first + 4)
+	
+	def test_recycle_entity_ids(self):
+		from grease import World, Entity
+		from grease.entity import entity_index, entity_generation
+		world = World()
+		entities = [Entity(world) for i in range(3)]
+		ids = [entity.entity_id for entity in entities]
+		self.assertEqual([entity_generation(id) for id in ids], [0, 0, 0])
+		entities[1].delete()
+		entities[0].delete()
+		# Ids are not reused until after the next step
+		fresh = Entity(world)
+		self.assertEqual(entity_index(fresh.entity_id), ids[2] + 1)
+		world.step(0)
+		reused = Entity(world)
+		self.assertEqual(entity_index(reused.entity_id), entity_index(ids[1]))
+		self.assertEqual(entity_generation(reused.entity_id), 1)
+		self.assertNotEqual(reused, entities[1])
+		self.assertFalse(entities[1].exists)
+		self.assertTrue(reused.exists)
+		new_ids = world.new_entity_ids(2)
+		self.assertEqual(new_ids[0], 1 << 32 | entity_index(ids[0]))
+		self.assertEqual(new_ids[1], fresh.entity_id + 1)
+		reused.delete()
+		world.step(0)
+		self.assertEqual(world.new_entity_id(), 2 << 32 | entity_index(ids[1]))
+	
+	def test_entity_by_id(self):
+		from grease import World, Entity
+		from grease.component import Component
+		world = World()
+		pos = world.components.pos = Component(x=int)
+		vel = world.components.vel = Component(dx=int)
+		entities = [Entity(world) for i in range(4)]
+		spawned = world.spawn(Entity, 2)
+		for entity in entities + spawned:
+			self.assertTrue(world.entity(entity.entity_id) is entity)
+		self.assertRaises(KeyError, world.entity, spawned[1].entity_id + 1)
+		pos.set_many(entities)
+		vel.set_many(entities[1:3])
+		self.assertEqual(list(pos.ids()), [e.entity_id for e in entities])
+		self.assertEqual(sorted(world.components.join_ids('pos', 'vel')), 
+			[entities[1].entity_id, entities[2].entity_id])
+		self.assertEqual(world.entities_for(vel.ids()), entities[1:3])
+		stale_id = entities[1].entity_id
+		entities[1].delete()
+		self.assertRaises(KeyError, world.entity, stale_id)
+		world.step(0)
+		entity = Entity(world)
+		self.assertRaises(KeyError, world.entity, stale_id)
+		self.assertTrue(world.entity(entity.entity_id) is entity)
+		self.assertRaises(KeyError, world.entities_for, [entity.entity_id, stale_id])
+		self.assertEqual(list(world.components.join_ids('vel')), 
+			[entities[2].entity_id])
+	
+	def test_entity_pooling(self):
+		from grease import World, Entity
+		from grease.component import Component
+		from grease.geometry import Vec2d
+		class Debris(Entity):
+			POOL_SIZE = 2
+		world = World()
+		pos = world.components.pos = Component(position=Vec2d, angle=float)
+		debris = [Debris(world) for i in range(3)]
+		for d in debris:
+			d.pos.angle = 45
+			d.pos.position = (1, 1)
+		records = [pos[d] for d in debris]
+		ids = [d.entity_id for d in debris]
+		for d in debris:
+			d.delete()
+		# Entities and records are reused only after their deletion
+		# has been reported for a step
+		fresh = Debris(world)
+		self.assertFalse(fresh in debris)
+		world.step(0)
+		self.assertEqual(world._entity_pools, {})
+		fresh = Debris(world)
+		self.assertFalse(any(fresh is d for d in debris))
+		world.step(0)
+		self.assertEqual(len(world._entity_pools[Debris]), 2)
+		reused = Debris(world)
+		self.assertTrue(any(reused is d for d in debris))
+		self.assertFalse(reused.entity_id in ids)
+		self.assertTrue(reused.exists)
+		reused2 = Debris(world)
+		reused2.pos.angle = 20
+		self.assertTrue(any(pos[reused2] is r for r in records))
+		self.assertEqual(pos[reused2].angle, 20)
+		self.assertEqual(pos[reused2].position, Vec2d(0, 0))
+		self.assertTrue(pos[reused2].entity is reused2)
+		spawned = world.spawn(Debris, 2, pos={'angle': [1, 2]})
+		self.assertFalse(any(s in debris for s in spawned))
+		self.assertEqual([pos[s].angle for s in spawned], [1, 2])
+	
+	def test_pooled_entity_not_reused_while_deletion_reported(self):
+		from grease import World, Entity, component
+		from grease.collision import Circular, BroadSpatialHash
+		class Rock(Entity):
+			POOL_SIZE = 4
+		world = World()
+		world.components.position = component.Position()
+		world.components.collision = component.Collision()
+		def make_rock(x):
+			rock = Rock(world)
+			rock.position.position = (x, 0)
+			rock.collision.radius = 1
+			return rock
+		class Spawner(object):
+			def step(self, dt):
+				deleted = world.components.collision.deleted_entities
+				self.deleted = [(rock, rock.entity_id) for rock in deleted]
+				self.spawned = make_rock(100)
+		spawner = world.systems.spawner = Spawner()
+		world.systems.collision = Circular(
+			broad_phase=BroadSpatialHash(cell_size=10))
+		rocks = [make_rock(i * 5) for i in range(3)]
+		world.step(0)
+		rocks[0].delete()
+		world.step(0)
+		self.assertEqual(spawner.deleted, [(rocks[0], rocks[0].entity_id)])
+		self.assertFalse(spawner.spawned is rocks[0])
+		self.assertFalse(rocks[0].exists)
+		world.step(0)
+		self.assertTrue(spawner.spawned is rocks[0])
+		self.assertTrue(rocks[0].exists)
+		world.step(0)
+	
+	def test_unpooled_entities_not_reused(self):
+		from grease import World, Entity
+		from grease.component import Component
+		world = World()
+		pos = world.components.pos = Component(x=int)
+		entity = Entity(world)
+		entity.pos.x = 1
+		data = pos[entity]
+		entity.delete()
+		world.step(0)
+		world.step(0)
+		entity2 = Entity(world)
+		entity2.pos.x = 2
+		self.assertFalse(entity2 is entity)
+		self.assertFalse(pos[entity2] is data)
+		self.assertEqual(world._entity_pools, {})
+	
+	def test_prefab_spawn(self):
+		from grease import World, Entity
+		from grease.component import Component, ColumnarComponent, ComponentError
+		from grease.geometry import Vec2d, Vec2dArray
+		class Rock(Entity):
+			pass
+		world = World()
+		shape = world.components.shape = Component(verts=Vec2dArray, closed=int)
+		pos = world.components.pos = ColumnarComponent(
+			position=Vec2d, angle=float, tag=object)
+		tag = []
+		prefab = world.add_prefab('rock', Rock, shared=['shape.verts'],
+			shape={'verts': [(0, 1), (1, 0), (0, 0)], 'closed': True},
+			pos={'position': (2, 3), 'tag': tag})
+		self.assertTrue(world.prefabs['rock'] is prefab)
+		rocks = prefab.spawn(3)
+		self.assertEqual(len(rocks), 3)
+		for rock in rocks:
+			self.assertTrue(isinstance(rock, Rock))
+			self.assertTrue(rock in world[Rock].entities)
+			self.assertEqual(list(shape[rock].verts), [(0, 1), (1, 0), (0, 0)])
+			self.assertEqual(shape[rock].closed, 1)
+			self.assertEqual(pos[rock].position, Vec2d(2, 3))
+			self.assertEqual(pos[rock].angle, 0.0)
+		# verts are shared, positions are copied
+		self.assertTrue(shape[rocks[0]].verts is shape[rocks[1]].verts)
+		pos[rocks[0]].position.x = 10
+		self.assertEqual(pos[rocks[1]].position, Vec2d(2, 3))
+		rocks = prefab.spawn(2, pos={'angle': [90, 180]})
+		self.assertEqual([pos[r].angle for r in rocks], [90.0, 180.0])
+		self.assertEqual([pos[r].position for r in rocks], [Vec2d(2, 3)] * 2)
+		rock = prefab.create(pos={'position': (4, 5)})
+		self.assertEqual(pos[rock].position, Vec2d(4, 5))
+		self.assertEqual(shape[rock].closed, 1)
+		self.assertRaises(ComponentError, world.add_prefab, 'bad', Rock, 
+			nope={'x': 1})
+		self.assertRaises(ComponentError, world.add_prefab, 'bad', Rock, 
+			shape={'nope': 1})
+		self.assertRaises(ComponentError, world.add_prefab, 'bad', Rock, 
+			shared=['pos.position'], shape={'closed': 0})
+	
+	def test_set_template(self):
+		from grease import World, Entity
+		from grease.component import Component
+		from grease.geometry import Vec2d
+		world = World()
+		comp = world.components.comp = Component(
+			position=Vec2d, velocity=Vec2d, name=str)
+		comp.add_index('name')
+		entities = [Entity(world) for i in range(2)]
+		position = Vec2d(1, 2)
+		records = comp.set_template(entities, {'position': position, 'name': 'a'})
+		self.assertEqual(records, [comp[e] for e in entities])
+		self.assertEqual([r.position for r in records], [position] * 2)
+		self.assertFalse(records[0].position is position)
+		self.assertFalse(records[0].velocity is records[1].velocity)
+		self.assertEqual(comp.find(('name',), operator.eq, 'a'), set(entities))
+		records = comp.set_template(entities, {'position': position}, 
+			shared=['position'])
+		self.assertTrue(records[0].position is position)
+		self.assertTrue(records[1].position is position)
+	
 	def test_union_extent(self):
 		from grease import World, Entity
 		class Entity1(Entity):
@@ -288,6 +624,64 @@ class WorldTestCase(unittest.TestCase):
 		union_extent_1_3 = world[Entity1, Entity3]
 		self.assertEqual(union_extent_1_3.entities, set(entities))
 
+	def test_union_extent_maintained(self):
+		from grease import World, Entity
+		class Entity1(Entity):
+			pass
+		class Entity2(Entity1):
+			pass
+		class Entity3(Entity):
+			pass
+		world = World()
+		e1 = Entity1(world)
+		union = world[Entity2, Entity3]
+		self.assertTrue(world[Entity2, Entity3] is union)
+		self.assertEqual(union.entities, set())
+		e2 = Entity2(world)
+		e3 = Entity3(world)
+		Entity1(world)
+		self.assertEqual(union.entities, set([e2, e3]))
+		e3.delete()
+		self.assertEqual(union.entities, set([e2]))
+		spawned = world.spawn(Entity3, 2)
+		self.assertEqual(union.entities, set([e2] + spawned))
+
+	def test_extent_component_views_maintained(self):
+		from grease import World, Entity
+		from grease.component import Component
+		class Rock(Entity):
+			pass
+		world = World()
+		comp = world.components.size = Component(size=int)
+		r1 = Rock(world)
+		other = Entity(world)
+		comp.set(r1, size=1)
+		comp.set(other, size=2)
+		view = world[Rock].size
+		self.assertTrue(world[Rock].size is view)
+		self.assertEqual(view, set([r1]))
+		r2 = Rock(world)
+		comp.set(r2, size=3)
+		self.assertEqual(view, set([r1, r2]))
+		self.assertEqual(view.size > 1, set([r2]))
+		self.assertRaises(TypeError, view.add, other)
+		self.assertRaises(TypeError, view.discard, r1)
+		self.assertRaises(TypeError, view.clear)
+		def ior():
+			v = world[Rock].size
+			v |= set([other])
+		self.assertRaises(TypeError, ior)
+		self.assertEqual(view - set([r1]), set([r2]))
+		self.assertEqual(world[Rock].size, set([r1, r2]))
+		del r1.size
+		self.assertEqual(view, set([r2]))
+		for entity in view:
+			entity.delete()
+		self.assertEqual(view, set())
+		self.assertEqual(world[...].size, set([other]))
+		world.components.size = Component(size=int)
+		self.assertFalse(world[Rock].size is view)
+		
 	def test_full_extent(self):
 		from grease import World, Entity
 		class Entity1(Entity):
@@ -394,6 +788,77 @@ class WorldTestCase(unittest.TestCase):
 		self.assertEqual(sorted(world.components.join('baz')), [
 			(0,), (100,), (200,)])
 
+	def test_join_optional_components(self):
+		from grease import World, Entity
+		world = World()
+		comp1 = world.components.foo = TestComponent()
+		comp2 = world.components.bar = TestComponent()
+		for i in range(4):
+			entity = object()
+			comp1.add(entity, i)
+			if i % 2:
+				comp2.add(entity, i * 10)
+		self.assertEqual(sorted(world.components.join('foo', optional=['bar']), 
+			key=lambda t: t[0]), [(0, None), (1, 10), (2, None), (3, 30)])
+
+	def test_cached_join(self):
+		from grease import World, Entity
+		from grease.component import Component
+		world = World()
+		pos = world.components.pos = Component(x=int)
+		vel = world.components.vel = Component(dx=int)
+		entities = [Entity(world) for i in range(6)]
+		for i, entity in enumerate(entities):
+			pos.set(entity, x=i)
+			if i % 2 == 0:
+				vel.set(entity, dx=i * 10)
+		def joined():
+			return sorted((p.x, v.dx) for p, v in world.components.join('pos', 'vel'))
+		self.assertEqual(joined(), [(0, 0), (2, 20), (4, 40)])
+		vel.set(entities[1], dx=10)
+		self.assertEqual(joined(), [(0, 0), (1, 10), (2, 20), (4, 40)])
+		del entities[2].pos
+		entities[4].delete()
+		self.assertEqual(joined(), [(0, 0), (1, 10)])
+		for p, v in world.components.join('pos', 'vel'):
+			p.entity.delete()
+		self.assertEqual(joined(), [])
+		world.components.vel = Component(dx=int)
+		world.components.vel.set(entities[3], dx=5)
+		self.assertEqual(joined(), [(3, 5)])
+
+	def test_join_rows(self):
+		from grease import World, Entity
+		from grease.component import Component, ColumnarComponent
+		world = World()
+		pos = world.components.pos = ColumnarComponent(x=int)
+		vel = world.components.vel = Component(dx=int)
+		entities = [Entity(world) for i in range(4)]
+		for i, entity in enumerate(entities):
+			pos.set(entity, x=i)
+		vel.set(entities[3], dx=3)
+		vel.set(entities[1], dx=1)
+		joined, (pos_rows, vel_rows) = world.components.join_rows('pos', 'vel')
+		self.assertEqual(sorted(joined, key=lambda e: e.entity_id), 
+			[entities[1], entities[3]])
+		for entity, pos_row, vel_row in zip(joined, pos_rows, vel_rows):
+			self.assertEqual(pos.column('x')[pos_row], pos[entity].x)
+			self.assertEqual(vel._records[vel_row], vel[entity])
+
+	def test_components_installed_as_entity_attributes(self):
+		from grease import World, Entity
+		from grease.entity import ComponentAttribute
+		from grease.component import Component
+		world = World()
+		world.components.installed_pos = Component(x=int)
+		world.components.insert('installed_vel', Component(dx=int), index=0)
+		self.assertTrue(isinstance(Entity.__dict__['installed_pos'], ComponentAttribute))
+		self.assertTrue(isinstance(Entity.__dict__['installed_vel'], ComponentAttribute))
+		entity = Entity(world)
+		entity.installed_pos.x = 3
+		self.assertEqual(world.components.installed_pos[entity].x, 3)
+		self.assertFalse(entity.installed_vel)
+
 	def test_illegal_part_name(self):
 		from grease import World
 		from grease.component import ComponentError